@@ -1,45 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import time
+_inicio_execucao = time.perf_counter() # Mede quanto tempo cada execução (rerun) do script leva
+
 import streamlit as st
-from chatbot_core import gerar_post_completo
+import threading
+import uuid
+from chatbot_core import (
+    etapas_dependentes, preparar_agentes,
+    coletor_metricas, TEMPO_IMPORTACAO_S, ETAPAS_DAS_VARIANTES, SEPARADOR_VARIANTE, estado_sessoes,
+    auditoria_conformidade
+)
+from saidas import interpretar_resultados, limpar_texto_para_copiar
+from tarefas import CONCLUIDA, EXECUTANDO, criar_gerenciador
 import streamlit.components.v1 as components
 
 # --- Funções Auxiliares para Copiar (JavaScript - VERSÃO FINAL DE LIMPEZA) ---
-def copy_button_js(text_to_copy, button_label, key_suffix=""):
-    # Lógica aprimorada para limpar o texto antes de copiar
-    # 1. Manter quebras de linha visíveis (para posts)
-    # 2. Remover marcadores Markdown (negrito, itálico, título)
-    # 3. Remover frases de subtítulo que o LLM pode ter gerado (ex: "Título Sugerido:")
-
-    cleaned_text_lines = []
-    lines = text_to_copy.splitlines() # Divide o texto em linhas
-
-    for line in lines:
-        temp_line = line.strip() # Remove espaços em branco do início/fim da linha
+def copy_button_js(text_to_copy, button_label, key_suffix="", limpar=True):
+    # Por padrão, limpa o texto antes de copiar (ver saidas.limpar_texto_para_copiar):
+    # mantém as quebras de linha e remove marcadores Markdown e rótulos como "Título Sugerido:".
+    # As saídas estruturadas já trazem o texto limpo; nesse caso, use limpar=False.
+    final_cleaned_text = limpar_texto_para_copiar(text_to_copy) if limpar else text_to_copy
 
-        # Remover marcadores de Markdown
-        temp_line = temp_line.replace('**', '').replace('*', '') # Remove negrito e itálico
-        temp_line = temp_line.lstrip('# ') # Remove '#' e espaço se for um título
-        
-        # Remover frases de subtítulo que o LLM pode ter incluído
-        if temp_line.startswith("Título Sugerido:"):
-            temp_line = temp_line.replace("Título Sugerido:", "").strip()
-        if temp_line.startswith("Corpo do Post:"):
-            temp_line = temp_line.replace("Corpo do Post:", "").strip()
-        if temp_line.startswith("Chamada Sutil para Ação:"):
-            temp_line = temp_line.replace("Chamada Sutil para Ação:", "").strip()
-        if temp_line.startswith("Hashtags:"):
-            temp_line = temp_line.replace("Hashtags:", "").strip()
-        if temp_line.startswith("Assunto:"): # Se o agente imagem ainda colocar isso
-            temp_line = temp_line.replace("Assunto:", "").strip()
-        
-        # Adiciona a linha limpa, mas apenas se não for uma linha vazia após a limpeza
-        if temp_line: # Garante que não adicione linhas vazias extras
-            cleaned_text_lines.append(temp_line)
-    
-    # Junta as linhas de volta com quebras de linha
-    final_cleaned_text = '\n'.join(cleaned_text_lines).strip()
-    
     # Garante que o texto seja seguro para JS (escapa aspas duplas)
     safe_text = final_cleaned_text.replace('"', '\\"')
 
@@ -88,19 +70,168 @@ def copy_button_js(text_to_copy, button_label, key_suffix=""):
     # Renderiza o HTML e JS no Streamlit
     components.html(js_code, height=50) # Altura para o botão aparecer
 
+# Rótulos das seções exibidas enquanto o post está sendo gerado, na ordem do pipeline
+ROTULOS_ETAPAS = {
+    'lancamentos_buscados': "🔍 Pesquisa de Tendências (Agente Pesquisador Jurídico)",
+    'plano_de_post': "💡 Plano de Conteúdo (Agente Estrategista de Conteúdo)",
+    'reels_conteudo_completo': "🎥 Roteiro e Detalhes do Reels Completo",
+    'rascunho_de_post': "📝 Rascunho do Post (Agente Redator Legal)",
+    'post_final': "✅ Revisão Final (Agente Revisor Final)",
+    'legenda_post': "💬 Legenda do Post (Agente Criador de Legendas)",
+    'imagem_gerada_prompt': "🖼️ Sugestão de Imagem (Agente Gerador Visual)",
+}
+
+def guardar_resultados(resultados):
+    """Guarda os resultados da geração e já os interpreta uma única vez (post, legenda e reels estruturados)."""
+    st.session_state['resultados_chatbot'] = resultados
+    st.session_state['estruturados'] = {} if "erro" in resultados else interpretar_resultados(resultados)
+    if "variantes" in resultados:
+        st.session_state['estruturados']['variantes'] = [interpretar_resultados(variante) for variante in resultados['variantes']]
+
+# Intervalo, em segundos, entre as consultas ao progresso das gerações em andamento
+INTERVALO_ATUALIZACAO_S = 1.0
+
 # --- NOVA FUNÇÃO AUXILIAR PARA GERAR O POST ---
 def executar_geracao_post():
+    """Coloca a geração na fila de segundo plano; a página acompanha o progresso sem ficar presa."""
     if st.session_state['topico_usuario']:
-        with st.spinner("🧠 Nossos especialistas em IA estão trabalhando para criar seu post..."):
-            try:
-                st.session_state['resultados_chatbot'] = None
-                st.session_state['resultados_chatbot'] = gerar_post_completo(st.session_state['topico_usuario'])
-            except Exception as e:
-                st.session_state['resultados_chatbot'] = {"erro": f"Ocorreu um erro inesperado: {e}. Por favor, verifique sua chave de API e tente novamente."}
+        # "Refazer com Mesmo Tema" pede uma versão nova, então não reaproveita respostas guardadas
+        usar_cache = not st.session_state.pop('ignorar_cache', False)
+        historico = gerenciador_tarefas.historico
+        # Antes de gerar, avisa se um tema parecido já foi gerado há pouco (a não ser que o usuário já tenha confirmado)
+        if usar_cache and historico is not None and not st.session_state.pop('gerar_mesmo_assim', False):
+            parecidas = historico.parecidas(st.session_state['topico_usuario'])
+            if parecidas:
+                st.session_state['geracoes_parecidas'] = parecidas
+                return
+        st.session_state['geracoes_parecidas'] = []
+        st.session_state['resultados_chatbot'] = None
+        st.session_state['tarefa_atual'] = gerenciador_tarefas.enviar(
+            st.session_state['topico_usuario'],
+            user_id=st.session_state['id_usuario'],
+            usar_cache=usar_cache,
+            variantes=st.session_state.get('num_variantes', 1)
+        )
     else:
         st.warning("Por favor, digite o tópico do post para que eu possa começar.")
         st.session_state['resultados_chatbot'] = None
 
+def exibir_progresso(tarefa):
+    """Mostra a geração em andamento: uma seção por etapa com o texto que já chegou de cada agente."""
+    if tarefa.status == EXECUTANDO:
+        st.info(f"🧠 Nossos especialistas em IA estão trabalhando para criar seu post sobre \"{tarefa.topico}\"...")
+    else:
+        st.info(f"⏳ Seu post sobre \"{tarefa.topico}\" está na fila e começa assim que uma geração anterior terminar.")
+    st.progress(tarefa.progresso)
+    for chave, rotulo in ROTULOS_ETAPAS.items():
+        if tarefa.variantes > 1 and chave in ETAPAS_DAS_VARIANTES:
+            continue
+        with st.expander(rotulo, expanded=True):
+            exibir_texto_parcial(tarefa, chave)
+    if tarefa.variantes > 1:
+        # Cada versão do post em uma coluna, com as etapas do seu ramo
+        for numero, coluna in enumerate(st.columns(tarefa.variantes), start=1):
+            with coluna:
+                st.markdown(f"**Versão {numero}**")
+                for chave in ETAPAS_DAS_VARIANTES:
+                    with st.expander(ROTULOS_ETAPAS[chave], expanded=chave == 'post_final'):
+                        exibir_texto_parcial(tarefa, f"{chave}{SEPARADOR_VARIANTE}{numero}")
+
+def exibir_texto_parcial(tarefa, chave):
+    texto = tarefa.etapas.get(chave)
+    if texto is None:
+        st.caption("Aguardando...")
+    else:
+        st.markdown(texto if chave in tarefa.concluidas else texto + " ▌")
+
+def abrir_tarefa(tarefa):
+    """Leva o resultado de uma geração terminada para a exibição principal."""
+    if tarefa.status != CONCLUIDA and tarefa.etapa_regenerada:
+        # Mantém o post anterior; só a regeneração falhou
+        st.error(f"Não foi possível regenerar esta etapa: {tarefa.erro}")
+        guardar_resultados(tarefa.resultados_anteriores)
+    else:
+        guardar_resultados(tarefa.resultados if tarefa.status == CONCLUIDA else {"erro": tarefa.erro})
+    # Tópico que originou estes resultados (usado ao regenerar uma etapa, mesmo se o campo for editado)
+    st.session_state['topico_gerado'] = tarefa.topico
+    # Guarda o id da geração para mostrar o tempo de cada etapa na barra lateral
+    st.session_state['ultimo_request_id'] = tarefa.request_id
+    st.session_state['tarefa_atual'] = None
+
+def abrir_do_historico(id_geracao, topico):
+    """Exibe uma geração anterior guardada no histórico (ver historico.py), sem gerar de novo."""
+    guardar_resultados(gerenciador_tarefas.historico.obter(id_geracao) or {"erro": "Geração não encontrada no histórico."})
+    st.session_state['topico_gerado'] = topico
+    st.session_state['tarefa_atual'] = None
+    st.session_state['geracoes_parecidas'] = []
+
+def exibir_parecidas(parecidas):
+    """Aviso de tema já gerado, com a opção de abrir o post anterior ou gerar um novo mesmo assim."""
+    st.warning("Já existe um post recente sobre um tema parecido. Você pode reaproveitá-lo em vez de gerar outro.")
+    for geracao in parecidas:
+        coluna_tema, coluna_botao = st.columns([4, 1])
+        quando = time.strftime("%d/%m/%Y %H:%M", time.localtime(geracao.criada_em))
+        coluna_tema.write(f"**{geracao.topico}** — {quando} (semelhança {geracao.semelhanca:.0%})")
+        if coluna_botao.button("Abrir", key=f"abrir_parecida_{geracao.id}"):
+            abrir_do_historico(geracao.id, geracao.topico)
+            st.rerun()
+    if st.button("🚀 Gerar mesmo assim"):
+        st.session_state['geracoes_parecidas'] = []
+        st.session_state['gerar_mesmo_assim'] = True
+        st.session_state['gerar_novamente'] = True
+        st.rerun()
+
+# --- Regeneração de uma Etapa ---
+def botao_regenerar(chave):
+    """Botão que refaz só esta etapa (e as que dependem dela), mantendo o restante do post."""
+    if "variantes" in st.session_state['resultados_chatbot']:
+        return # Com várias versões, refaz-se a geração inteira ("Refazer com Mesmo Tema")
+    dependentes = [ROTULOS_ETAPAS[etapa] for etapa in etapas_dependentes(chave)[1:]]
+    ajuda = "Refaz só esta etapa." if not dependentes else "Refaz esta etapa e também: " + "; ".join(dependentes)
+    if st.button("🔁 Regenerar", key=f"regenerar_{chave}", help=ajuda):
+        st.session_state['etapa_a_regenerar'] = chave
+        st.rerun()
+
+def executar_regeneracao_etapa(chave):
+    """Coloca a regeneração na fila de segundo plano, como uma geração; a página acompanha o progresso."""
+    st.session_state['tarefa_atual'] = gerenciador_tarefas.enviar_regeneracao(
+        st.session_state.get('topico_gerado') or st.session_state['topico_usuario'],
+        st.session_state['resultados_chatbot'],
+        chave,
+        user_id=st.session_state['id_usuario']
+    )
+    st.session_state['resultados_chatbot'] = None
+
+# --- Versões do Post Lado a Lado ---
+def exibir_variantes(variantes, estruturados_variantes):
+    """Mostra as versões do post em colunas, cada uma com post final, legenda, prompt de imagem e rascunho."""
+    st.subheader("🗂️ Versões do Post")
+    colunas = st.columns(len(variantes))
+    for numero, (coluna, variante, estruturados_variante) in enumerate(zip(colunas, variantes, estruturados_variantes), start=1):
+        with coluna:
+            st.markdown(f"#### Versão {numero}")
+            post_final = estruturados_variante.get('post_final')
+            if post_final:
+                st.markdown(post_final.texto)
+                st.caption(post_final.nota_revisao)
+                copy_button_js(post_final.texto_para_copiar, "📋 Copiar Post", key_suffix=f"post_v{numero}", limpar=False)
+            else:
+                st.markdown(variante['post_final'])
+                copy_button_js(variante['post_final'], "📋 Copiar Post", key_suffix=f"post_v{numero}")
+
+            with st.expander("💬 Legenda"):
+                legenda = estruturados_variante.get('legenda_post')
+                legenda_post = legenda.texto if legenda else variante['legenda_post'].strip()
+                st.text_area("Legenda gerada:", value=legenda_post, height=150, key=f"legenda_v{numero}")
+                copy_button_js(legenda_post, "📋 Copiar Legenda", key_suffix=f"legenda_v{numero}")
+
+            with st.expander("🖼️ Prompt de Imagem"):
+                st.text_area("Prompt gerado para IA de Imagem:", value=variante['imagem_gerada_prompt'], height=150, key=f"imagem_v{numero}")
+                copy_button_js(variante['imagem_gerada_prompt'], "📋 Copiar Prompt", key_suffix=f"imagem_v{numero}")
+
+            with st.expander("📝 Rascunho"):
+                st.markdown(variante['rascunho_de_post'])
+
 # --- Configurações da Página ---
 st.set_page_config(
     page_title="JuriPost - Gerador de Conteúdo Jurídico",
@@ -109,6 +240,25 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# --- Aquecimento dos Agentes ---
+# Uma única vez por processo (st.cache_resource), importa o ADK e constrói os agentes em
+# segundo plano, para que nem a abertura da página nem a primeira geração esperem por isso.
+@st.cache_resource
+def aquecer_agentes():
+    threading.Thread(target=preparar_agentes, name="juripost-aquecimento", daemon=True).start()
+    return True
+
+aquecer_agentes()
+
+# --- Gerenciador de Gerações ---
+# Compartilhado por todas as sessões do processo: as gerações continuam rodando mesmo se o
+# usuário recarregar a página, e o resultado fica esperando por ele.
+@st.cache_resource
+def obter_gerenciador_tarefas():
+    return criar_gerenciador()
+
+gerenciador_tarefas = obter_gerenciador_tarefas()
+
 # --- Título e Descrição da Aplicação ---
 st.title("⚖️ JuriPost: Seu Assistente de Marketing Jurídico com IA")
 st.markdown(
@@ -126,8 +276,20 @@ if 'topico_usuario' not in st.session_state:
     st.session_state['topico_usuario'] = ""
 if 'resultados_chatbot' not in st.session_state:
     st.session_state['resultados_chatbot'] = None
+if 'estruturados' not in st.session_state:
+    # Post, legenda e reels já interpretados (ver saidas.py), para não reprocessar o texto a cada rerun
+    st.session_state['estruturados'] = {}
 if 'gerar_novamente' not in st.session_state:
     st.session_state['gerar_novamente'] = False
+if 'id_usuario' not in st.session_state:
+    # Identificador único deste usuário, para que usuários simultâneos não compartilhem sessões dos agentes.
+    # Fica também na URL, para que as gerações dele continuem visíveis depois de recarregar a página.
+    st.session_state['id_usuario'] = st.query_params.get("usuario") or uuid.uuid4().hex
+    st.query_params["usuario"] = st.session_state['id_usuario']
+if 'tarefa_atual' not in st.session_state:
+    st.session_state['tarefa_atual'] = None
+if 'geracoes_parecidas' not in st.session_state:
+    st.session_state['geracoes_parecidas'] = []
 
 # --- Entrada do Usuário ---
 st.header("Qual tópico jurídico você gostaria de explorar para o post?")
@@ -139,6 +301,10 @@ st.session_state['topico_usuario'] = st.text_input(
 )
 
 # --- Botão para Gerar o Post ---
+st.number_input(
+    "Quantas versões do post?", min_value=1, max_value=4, value=1, key="num_variantes",
+    help="Com mais de uma, a pesquisa e o plano são feitos uma só vez e as versões são exibidas lado a lado."
+)
 gerar_botao = st.button("🚀 Gerar Post Completo")
 
 # Lógica para ativar a geração
@@ -147,9 +313,26 @@ if gerar_botao or st.session_state['gerar_novamente']:
     st.session_state['gerar_novamente'] = False # Reseta a flag
     executar_geracao_post() # Chama a nova função
 
+# Tema parecido com uma geração recente: o usuário escolhe entre abrir a anterior ou gerar mesmo assim
+if st.session_state['geracoes_parecidas']:
+    exibir_parecidas(st.session_state['geracoes_parecidas'])
+
+# Regenera uma única etapa, se o usuário clicou em "Regenerar" em alguma seção
+if st.session_state.get('etapa_a_regenerar') and st.session_state['resultados_chatbot']:
+    executar_regeneracao_etapa(st.session_state.pop('etapa_a_regenerar'))
+
+# Acompanha a geração atual: enquanto roda, mostra o progresso; ao terminar, exibe o resultado
+tarefa_atual = gerenciador_tarefas.obter(st.session_state['tarefa_atual']) if st.session_state['tarefa_atual'] else None
+if tarefa_atual is not None:
+    if tarefa_atual.ativa:
+        exibir_progresso(tarefa_atual)
+    else:
+        abrir_tarefa(tarefa_atual)
+
 # Exibir resultados somente se houverem resultados gerados (ou carregados da sessão)
 if st.session_state['resultados_chatbot']:
     resultados_chatbot = st.session_state['resultados_chatbot']
+    estruturados = st.session_state['estruturados']
 
     if "erro" in resultados_chatbot:
         st.error(resultados_chatbot["erro"])
@@ -161,9 +344,11 @@ if st.session_state['resultados_chatbot']:
         # Exibe os resultados de cada agente em seções expander
         with st.expander("🔍 Pesquisa de Tendências (Agente Pesquisador Jurídico)", expanded=False):
             st.markdown(resultados_chatbot.get('lancamentos_buscados', 'Nenhum lançamento encontrado.'))
+            botao_regenerar('lancamentos_buscados')
 
         with st.expander("💡 Plano de Conteúdo (Agente Estrategista de Conteúdo)", expanded=False):
             st.markdown(resultados_chatbot.get('plano_de_post', 'Nenhum plano gerado.'))
+            botao_regenerar('plano_de_post')
         
         # NOVO BLOCO AQUI: Conteúdo para Reels COMPLETO
         st.subheader("🎬 Conteúdo para Reels")
@@ -172,66 +357,70 @@ if st.session_state['resultados_chatbot']:
             reels_conteudo_completo = resultados_chatbot.get('reels_conteudo_completo', 'Nenhum conteúdo para Reels gerado.')
             if reels_conteudo_completo and reels_conteudo_completo.strip(): # Verifica se há conteúdo real
                 st.markdown(reels_conteudo_completo) # Usar st.markdown para renderizar a formatação do Reels
-                # O botão de copiar já usará a função copy_button_js que limpa o texto
-                copy_button_js(reels_conteudo_completo, "📋 Copiar Conteúdo Completo do Reels", key_suffix="reels_completo_button")
+                reels = estruturados.get('reels_conteudo_completo')
+                if reels:
+                    st.caption(f"{len(reels.slides)} slides · {len(reels.hashtags)} hashtags")
+                    copy_button_js(reels.texto_para_copiar, "📋 Copiar Conteúdo Completo do Reels", key_suffix="reels_completo_button", limpar=False)
+                else:
+                    # O roteiro fugiu do formato; o botão de copiar limpa o texto bruto
+                    copy_button_js(reels_conteudo_completo, "📋 Copiar Conteúdo Completo do Reels", key_suffix="reels_completo_button")
             else:
                 st.write("Conteúdo para Reels não gerado.")
+            botao_regenerar('reels_conteudo_completo')
 
-        with st.expander("📝 Rascunho do Post (Agente Redator Legal)", expanded=False):
-            st.markdown(resultados_chatbot.get('rascunho_de_post', 'Nenhum rascunho gerado.'))
+        if "variantes" in resultados_chatbot:
+            exibir_variantes(resultados_chatbot['variantes'], estruturados['variantes'])
+        else:
+            with st.expander("📝 Rascunho do Post (Agente Redator Legal)", expanded=False):
+                st.markdown(resultados_chatbot.get('rascunho_de_post', 'Nenhum rascunho gerado.'))
+                botao_regenerar('rascunho_de_post')
 
-        # Agente Revisor - Sempre aberto, e exibe o post final JÁ REVISADO
-        with st.expander("✅ Revisão Final (Agente Revisor Final)", expanded=True):
-            post_revisado_completo = resultados_chatbot.get('post_final', 'Nenhuma revisão realizada.')
-            texto_do_post_para_exibir = post_revisado_completo # O texto bruto do LLM
-            nota_da_revisao = ""
+            # Agente Revisor - Sempre aberto, e exibe o post final JÁ REVISADO
+            with st.expander("✅ Revisão Final (Agente Revisor Final)", expanded=True):
+                post_revisado_completo = resultados_chatbot.get('post_final', 'Nenhuma revisão realizada.')
+                post_final = estruturados.get('post_final')
 
-            # Tenta separar a nota de revisão do corpo do post
-            if 'Post revisado e pronto para publicar!' in post_revisado_completo:
-                partes = post_revisado_completo.rsplit('Post revisado e pronto para publicar!', 1) 
-                texto_do_post_para_exibir = partes[0].strip()
-                nota_da_revisao = 'Post revisado e pronto para publicar!' + partes[1].strip()
-            else:
-                st.warning("O revisor não seguiu o formato esperado para a nota final. Exibindo o texto completo da revisão.")
-                st.markdown(post_revisado_completo) # Exibe o que veio do revisor como markdown
+                if post_final:
+                    # Exibe o post final formatado e a nota da revisão, já separados na geração
+                    st.subheader("Post Final Revisado:")
+                    st.markdown(post_final.texto)
+                    st.markdown(f"*{post_final.nota_revisao}*")
+                    copy_button_js(post_final.texto_para_copiar, "📋 Copiar Post Final para Publicação", key_suffix="final_post_display", limpar=False)
+                elif post_revisado_completo != 'Nenhuma revisão realizada.':
+                    st.warning("O revisor não seguiu o formato esperado para a nota final. Exibindo o texto completo da revisão.")
+                    st.markdown(post_revisado_completo) # Exibe o que veio do revisor como markdown
+                    copy_button_js(post_revisado_completo, "📋 Copiar Post Final para Publicação", key_suffix="final_post_display")
+                else:
+                    st.markdown(post_revisado_completo)
+                botao_regenerar('post_final')
 
-            # Exibe o post final formatado
-            if texto_do_post_para_exibir and texto_do_post_para_exibir != 'Nenhuma revisão realizada.':
-                st.subheader("Post Final Revisado:")
-                st.markdown(texto_do_post_para_exibir)
-            
-            # Exibe a nota da revisão se ela existir
-            if nota_da_revisao:
-                st.markdown(f"*{nota_da_revisao}*")
-            
-            # Botão de copiar Post Final usando a nova função JS
-            if texto_do_post_para_exibir and texto_do_post_para_exibir != 'Nenhuma revisão realizada.':
-                copy_button_js(texto_do_post_para_exibir, "📋 Copiar Post Final para Publicação", key_suffix="final_post_display")
-
-        # NOVO BLOCO AQUI: Agente de Legenda
-        with st.expander("💬 Legenda do Post (Agente Criador de Legendas)", expanded=True): # Pode ser expandido por padrão se quiser
-            legenda_post = resultados_chatbot.get('legenda_post', '').strip() #Pega a legenda e remove espaços extras
-            st.info("Copie a legenda abaixo para usar em suas redes sociais:")
-            # Usar text_area para facilitar a cópia
-            if legenda_post: #Apenas verifica se a string não está vazia após strip()
-                st.text_area("Legenda gerada:", value=legenda_post, height=80, key="legenda_display", help="Legenda concisa e atraente para o 			post.")
-                copy_button_js(legenda_post, "📋 Copiar Legenda", key_suffix="legenda_button")
-            else:
-                st.write("Legenda não gerada.")
+            # NOVO BLOCO AQUI: Agente de Legenda
+            with st.expander("💬 Legenda do Post (Agente Criador de Legendas)", expanded=True): # Pode ser expandido por padrão se quiser
+                legenda = estruturados.get('legenda_post')
+                # A legenda estruturada já vem sem linhas em branco; senão, usa o texto bruto sem espaços extras
+                legenda_post = legenda.texto if legenda else resultados_chatbot.get('legenda_post', '').strip()
+                st.info("Copie a legenda abaixo para usar em suas redes sociais:")
+                # Usar text_area para facilitar a cópia
+                if legenda_post: #Apenas verifica se a string não está vazia após strip()
+                    st.text_area("Legenda gerada:", value=legenda_post, height=80, key="legenda_display", help="Legenda concisa e atraente para o 			post.")
+                    copy_button_js(legenda_post, "📋 Copiar Legenda", key_suffix="legenda_button")
+                else:
+                    st.write("Legenda não gerada.")
+                botao_regenerar('legenda_post')
 
-        # Agente Gerador Visual - Sempre aberto
-        with st.expander("🖼️ Sugestão de Imagem (Agente Gerador Visual)", expanded=True):
-            st.info("Use o prompt abaixo em sua ferramenta de IA preferida (Ex: Google Gemini Advanced, Midjourney, DALL-E):")
+            # Agente Gerador Visual - Sempre aberto
+            with st.expander("🖼️ Sugestão de Imagem (Agente Gerador Visual)", expanded=True):
+                st.info("Use o prompt abaixo em sua ferramenta de IA preferida (Ex: Google Gemini Advanced, Midjourney, DALL-E):")
 
-            imagem_prompt = resultados_chatbot.get('imagem_gerada_prompt', 'Nenhum prompt gerado.')
+                imagem_prompt = resultados_chatbot.get('imagem_gerada_prompt', 'Nenhum prompt gerado.')
             
-            # Exibir o prompt da imagem em um text_area para visualização e cópia fácil
-            if imagem_prompt != 'Nenhum prompt gerado.':
-                st.text_area("Prompt gerado para IA de Imagem:", value=imagem_prompt, height=200, key="image_prompt_display", help="Copie este prompt completo para a sua IA geradora de imagens.")
-                copy_button_js(imagem_prompt, "📋 Copiar Prompt da Imagem", key_suffix="image_prompt_button")
-            else:
-                st.write("Prompt da imagem não gerado.")
-
+                # Exibir o prompt da imagem em um text_area para visualização e cópia fácil
+                if imagem_prompt != 'Nenhum prompt gerado.':
+                    st.text_area("Prompt gerado para IA de Imagem:", value=imagem_prompt, height=200, key="image_prompt_display", help="Copie este prompt completo para a sua IA geradora de imagens.")
+                    copy_button_js(imagem_prompt, "📋 Copiar Prompt da Imagem", key_suffix="image_prompt_button")
+                else:
+                    st.write("Prompt da imagem não gerado.")
+                botao_regenerar('imagem_gerada_prompt')
 
         st.markdown("---")
         st.write("✨ Pronto para a próxima publicação!")
@@ -242,13 +431,51 @@ if st.session_state['resultados_chatbot']:
             if st.button("🔄 Gerar Novo Post"):
                 st.session_state['topico_usuario'] = ""
                 st.session_state['resultados_chatbot'] = None
-                st.rerun() 
+                st.session_state['tarefa_atual'] = None
+                st.rerun()
         with col_actions2:
             if st.button("🔁 Refazer com Mesmo Tema"):
                 # Mantém o tópico, limpa resultados e seta a flag para gerar novamente
                 st.session_state['resultados_chatbot'] = None
                 st.session_state['gerar_novamente'] = True
+                st.session_state['ignorar_cache'] = True
+                st.rerun()
+
+# --- Gerações do Usuário na Barra Lateral ---
+# Todas as gerações enviadas por este usuário, inclusive as que estão na fila: dá para
+# enfileirar vários tópicos e abrir cada resultado quando ficar pronto.
+tarefas_usuario = gerenciador_tarefas.listar(st.session_state['id_usuario'])
+if tarefas_usuario:
+    st.sidebar.header("📋 Suas Gerações")
+    icones_status = {"na_fila": "⏳", "executando": "🧠", "concluida": "✅", "erro": "⚠️"}
+    for tarefa in reversed(tarefas_usuario[-10:]):
+        coluna_tarefa, coluna_botao = st.sidebar.columns([3, 1])
+        tipo = " (regeneração)" if tarefa.etapa_regenerada else ""
+        coluna_tarefa.write(f"{icones_status[tarefa.status]} {tarefa.topico}{tipo}")
+        if tarefa.ativa:
+            coluna_tarefa.progress(tarefa.progresso)
+        if tarefa.id != st.session_state['tarefa_atual'] and coluna_botao.button("Abrir", key=f"abrir_{tarefa.id}"):
+            st.session_state['tarefa_atual'] = tarefa.id
+            st.rerun()
+    st.sidebar.markdown("---")
+
+# --- Busca no Histórico na Barra Lateral ---
+# Busca de texto completo nos tópicos e posts já gerados por todo o escritório
+if gerenciador_tarefas.historico is not None:
+    st.sidebar.header("🔎 Buscar Posts Anteriores")
+    consulta_historico = st.sidebar.text_input("Termos da busca", key="consulta_historico", label_visibility="collapsed",
+                                               placeholder="Ex: usucapião, LGPD")
+    if consulta_historico:
+        encontradas = gerenciador_tarefas.historico.buscar(consulta_historico, limite=5)
+        if not encontradas:
+            st.sidebar.caption("Nenhum post encontrado.")
+        for id_geracao, topico, _, trecho in encontradas:
+            coluna_tema, coluna_botao = st.sidebar.columns([3, 1])
+            coluna_tema.markdown(f"**{topico}**  \n{trecho}")
+            if coluna_botao.button("Abrir", key=f"abrir_historico_{id_geracao}"):
+                abrir_do_historico(id_geracao, topico)
                 st.rerun()
+    st.sidebar.markdown("---")
 
 # --- Seção para Dicas na Barra Lateral ---
 st.sidebar.header("Dicas Rápidas")
@@ -260,6 +487,53 @@ st.sidebar.info(
     """
 )
 
+# --- Tempo de cada etapa da última geração ---
+if st.session_state.get('ultimo_request_id'):
+    resumo_etapas = coletor_metricas.resumo_por_etapa(st.session_state['ultimo_request_id'])
+    if resumo_etapas:
+        st.sidebar.markdown("---")
+        st.sidebar.header("⏱️ Tempo por Etapa")
+        st.sidebar.dataframe(
+            [
+                {
+                    "Etapa": resumo["etapa"],
+                    "Duração (s)": round(resumo["duracao_s"], 1),
+                    "Fila (s)": round(resumo["espera_s"], 1),
+                    "Tokens": resumo["tokens_total"],
+                    "Entrada (tokens)": (f"{resumo['tokens_entrada_antes']} → {resumo['tokens_entrada_depois']}"
+                                         if resumo["tokens_entrada_antes"] else ""),
+                    "Cache": "sim" if resumo["cache"] else "",
+                }
+                for resumo in resumo_etapas
+            ],
+            hide_index=True,
+        )
+        st.sidebar.download_button("⬇️ Métricas (JSON Lines)", coletor_metricas.texto_jsonl(), file_name="juripost_metricas.jsonl")
+        st.sidebar.download_button("⬇️ Métricas (Prometheus)", coletor_metricas.texto_prometheus(), file_name="juripost_metricas.prom")
+
+    # --- Verificação de conformidade da última geração ---
+    verificacoes = auditoria_conformidade.registros(st.session_state['ultimo_request_id'])
+    if verificacoes:
+        st.sidebar.header("⚖️ Conformidade OAB")
+        for verificacao in verificacoes:
+            problemas = "; ".join(violacao.detalhe for violacao in verificacao.violacoes) or "sem violações"
+            st.sidebar.caption(f"**{verificacao.etapa}** · {verificacao.acao}: {problemas}")
+
 st.sidebar.markdown("---")
 st.sidebar.header("Configurações de Exibição")
-st.sidebar.write("Você pode alternar entre os temas claro e escuro clicando no ícone de configurações no canto superior direito da tela.")
\ No newline at end of file
+st.sidebar.write("Você pode alternar entre os temas claro e escuro clicando no ícone de configurações no canto superior direito da tela.")
+
+# --- Desempenho da Página ---
+st.sidebar.caption(
+    f"⚡ Importação do núcleo: {TEMPO_IMPORTACAO_S * 1000:.0f} ms · "
+    f"Esta execução da página: {(time.perf_counter() - _inicio_execucao) * 1000:.0f} ms"
+)
+sessoes = estado_sessoes()
+st.sidebar.caption(f"🧠 Sessões do ADK em memória: {sessoes['sessoes']} (~{sessoes['bytes'] / 1024:.0f} kB)")
+
+# --- Atualização das Gerações em Andamento ---
+# Enquanto houver geração deste usuário rodando ou na fila, a página se atualiza sozinha.
+# Qualquer clique interrompe a espera, então a interface continua livre para uso.
+if any(tarefa.ativa for tarefa in tarefas_usuario):
+    time.sleep(INTERVALO_ATUALIZACAO_S)
+    st.rerun()
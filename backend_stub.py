@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import math
+import random
+import threading
+import time
+
+# --- Backend Simulado ---
+# Substitui o Gemini por respostas locais com latência e tamanho configuráveis, para
+# medir a orquestração e a concorrência sem chave de API nem rede.
+# Ativado com JURIPOST_BACKEND=stub ou com chatbot_core.definir_backend(BackendStub(...)).
+
+class _Parte:
+    def __init__(self, text):
+        self.text = text
+
+class _Conteudo:
+    def __init__(self, textos):
+        self.role = "model"
+        self.parts = [_Parte(text) for text in textos]
+
+class UsoSimulado:
+    def __init__(self, tokens_entrada, tokens_saida, tokens_total=None):
+        self.prompt_token_count = tokens_entrada
+        self.candidates_token_count = tokens_saida
+        self.total_token_count = tokens_total if tokens_total is not None else tokens_entrada + tokens_saida
+
+class EventoSimulado:
+    """
+    Evento com os mesmos atributos que call_agent lê de um evento do ADK.
+    `text` pode ser um texto ou a lista de textos das partes; `final` sobrescreve is_final_response().
+    """
+
+    def __init__(self, author, text, partial=False, usage_metadata=None, final=None):
+        self.author = author
+        self.content = _Conteudo(text if isinstance(text, list) else [text])
+        self.partial = partial
+        self.usage_metadata = usage_metadata
+        self._final = final
+
+    def is_final_response(self):
+        return not self.partial if self._final is None else self._final
+
+class Latencia:
+    """
+    Distribuição de latência, em segundos.
+    `tipo` pode ser 'fixa' (sempre `media`), 'uniforme' (entre media-desvio e media+desvio),
+    'normal' ou 'lognormal' (com a média e o desvio padrão informados).
+    """
+
+    def __init__(self, tipo: str = "lognormal", media: float = 1.0, desvio: float = 0.3):
+        if tipo not in ("fixa", "uniforme", "normal", "lognormal"):
+            raise ValueError(f"Distribuição de latência desconhecida: {tipo}")
+        self.tipo = tipo
+        self.media = media
+        self.desvio = desvio
+
+    def sortear(self, gerador: random.Random) -> float:
+        if self.tipo == "fixa" or self.media <= 0:
+            return max(self.media, 0.0)
+        if self.tipo == "uniforme":
+            return max(gerador.uniform(self.media - self.desvio, self.media + self.desvio), 0.0)
+        if self.tipo == "normal":
+            return max(gerador.gauss(self.media, self.desvio), 0.0)
+        # Lognormal com a média e o desvio pedidos (cauda longa, como as chamadas reais)
+        variancia = math.log(1 + (self.desvio / self.media) ** 2)
+        return gerador.lognormvariate(math.log(self.media) - variancia / 2, math.sqrt(variancia))
+
+class BackendStub:
+    # Não chama o Gemini: os agentes podem ser descrições leves (chatbot_core.DescricaoAgente), sem o ADK
+    usa_adk = False
+
+    def __init__(self, latencia: Latencia = None, caracteres_saida: int = 1500, fracao_primeiro_evento: float = 0.2,
+                 partes_streaming: int = 10, por_agente: dict = None, semente: int = None):
+        """
+        `latencia` é a distribuição do tempo total de cada chamada e `caracteres_saida` o tamanho
+        da resposta. `fracao_primeiro_evento` é a parte da latência até o primeiro trecho em streaming.
+        `por_agente` permite sobrescrever esses valores por nome de agente, por exemplo:
+        {"agente_imagem": {"latencia": Latencia("fixa", 3.0), "caracteres_saida": 800}}.
+        """
+        self.latencia = latencia or Latencia()
+        self.caracteres_saida = caracteres_saida
+        self.fracao_primeiro_evento = fracao_primeiro_evento
+        self.partes_streaming = max(partes_streaming, 1)
+        self.por_agente = por_agente or {}
+        self._gerador = random.Random(semente)
+        self._trava = threading.Lock()
+        self.chamadas = 0
+
+    def _configuracao(self, nome_agente: str):
+        ajustes = self.por_agente.get(nome_agente, {})
+        return ajustes.get("latencia", self.latencia), ajustes.get("caracteres_saida", self.caracteres_saida)
+
+    def executar(self, agent, message_text: str, contexto, streaming: bool):
+        latencia, caracteres = self._configuracao(agent.name)
+        with self._trava:
+            self.chamadas += 1
+            duracao = latencia.sortear(self._gerador)
+        # Agentes com ajustes de geração (variantes) produzem textos diferentes para a mesma entrada
+        configuracao = getattr(agent, "generate_content_config", None)
+        variante = ""
+        if configuracao is not None and (configuracao.seed is not None or configuracao.temperature is not None):
+            variante = f"|{configuracao.seed}|{configuracao.temperature}"
+        texto = formatar_saida(agent.name, gerar_texto(agent.name, message_text + variante, caracteres))
+        # Como o modelo, a resposta não passa do limite de tokens de saída do agente (~4 caracteres por token)
+        limite = getattr(configuracao, "max_output_tokens", None)
+        if limite:
+            texto = texto[:limite * 4]
+        uso = UsoSimulado(len(message_text) // 4, len(texto) // 4)
+
+        if not streaming:
+            time.sleep(duracao)
+            yield EventoSimulado(agent.name, texto, usage_metadata=uso)
+            return
+
+        # Em streaming, o primeiro trecho chega após uma fração da latência e o resto é dividido igualmente
+        time.sleep(duracao * self.fracao_primeiro_evento)
+        tamanho_parte = math.ceil(len(texto) / self.partes_streaming) or 1
+        intervalo = duracao * (1 - self.fracao_primeiro_evento) / self.partes_streaming
+        for inicio in range(0, len(texto), tamanho_parte):
+            yield EventoSimulado(agent.name, texto[inicio:inicio + tamanho_parte], partial=True)
+            time.sleep(intervalo)
+        yield EventoSimulado(agent.name, texto, usage_metadata=uso)
+
+_PALAVRAS = (
+    "direito nacionalidade portuguesa cidadania processo prazo documento residência lei "
+    "alteração requisito tribunal registo certidão advogado orientação jurídica informação"
+).split()
+
+def gerar_texto(nome_agente: str, entrada: str, caracteres: int) -> str:
+    """Texto determinístico (depende só do agente e da entrada) com aproximadamente `caracteres` caracteres."""
+    gerador = random.Random(f"{nome_agente}|{entrada}")
+    palavras = [f"[{nome_agente}]"]
+    total = len(palavras[0])
+    while total < caracteres:
+        palavra = gerador.choice(_PALAVRAS)
+        palavras.append(palavra)
+        total += len(palavra) + 1
+    return " ".join(palavras)
+
+def formatar_saida(nome_agente: str, texto: str) -> str:
+    """Envolve o texto simulado no formato que as instruções exigem (ver saidas.py), para não provocar retentativas."""
+    hashtags = "#Direito #Nacionalidade #Cidadania #Portugal #Advocacia"
+    if nome_agente == "agente_revisor":
+        return f"{texto}\n\nPost revisado e pronto para publicar! (Detalhes da revisão: simulado)"
+    if nome_agente == "agente_legenda":
+        return f"{texto}\n\n{hashtags}\nEste post tem caráter informativo e não substitui uma consulta jurídica especializada."
+    if nome_agente == "agente_reels_completo":
+        palavras = texto.split()
+        slides = "\n".join(
+            f"{numero} | {(numero - 1) * 5}–{numero * 5}s | {' '.join(palavras[numero * 3:numero * 3 + 3]) or 'Texto'} | Fundo escuro | Fade"
+            for numero in range(1, 7)
+        )
+        return (f"🎞️ Reels: {' '.join(palavras[1:4])}\n🎬 Roteiro Slide a Slide\n"
+                f"Slide | Duração | Texto | Fundo sugerido | Animação sugerida\n---|---|---|---|---\n{slides}\n\n"
+                f"✍️ Legenda para o Reels\n{texto}\n\n🏷️ Hashtags\n{hashtags}")
+    return texto
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline do pipeline de agentes.
+
+Usa o backend simulado (backend_stub) no lugar do Gemini e mede, para cada nível de
+concorrência (quantos posts são gerados ao mesmo tempo), a vazão em posts por segundo,
+as latências p50/p95/p99 de um post completo e a memória usada. Não precisa de chave
+de API nem de rede, então pode rodar na CI. Com --cassetes, as respostas e latências vêm
+de chamadas reais gravadas (ver cassetes.py) em vez do backend simulado.
+
+Uso:
+    python benchmark.py --concorrencias 1,4,16 --posts 32 --latencia-media 0.5
+    python benchmark.py --latencia-media 0 --posts 200    # mede só o custo da orquestração
+    python benchmark.py --importacao 10 --concorrencias ""  # mede só o tempo de importação
+    python benchmark.py --cassetes cassetes --escala-tempo 0.5  # reproduz chamadas gravadas, 2x mais rápido
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil pelo método do posto mais próximo."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = max(int(round(p / 100 * len(ordenados) + 0.5)) - 1, 0)
+    return ordenados[min(posicao, len(ordenados) - 1)]
+
+def medir_importacao(repeticoes: int) -> dict:
+    """Tempo de importar o chatbot_core num processo novo (início a frio), repetido algumas vezes."""
+    codigo = "import time; inicio = time.perf_counter(); import chatbot_core; print(time.perf_counter() - inicio)"
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    tempos = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, "-c", codigo], cwd=pasta, capture_output=True, text=True, check=True)
+        tempos.append(float(saida.stdout.strip().splitlines()[-1]))
+    return {
+        "repeticoes": repeticoes,
+        "mediana_ms": round(statistics.median(tempos) * 1000, 1),
+        "maximo_ms": round(max(tempos) * 1000, 1),
+    }
+
+def medir_nivel(core, concorrencia: int, posts: int) -> dict:
+    """Gera `posts` posts com `concorrencia` gerações simultâneas e devolve as estatísticas."""
+    latencias = []
+
+    def gerar(indice):
+        # Tópicos distintos e sem cache, para que toda etapa passe pelo backend
+        contexto = core.ContextoRequisicao(user_id="benchmark", usar_cache=False)
+        inicio = time.perf_counter()
+        core.gerar_post_completo(f"Tópico de benchmark {concorrencia}-{indice}", contexto=contexto)
+        latencias.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(gerar, range(posts)))
+    duracao = time.perf_counter() - inicio
+    _, pico_memoria = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "concorrencia": concorrencia,
+        "posts": posts,
+        "duracao_s": round(duracao, 3),
+        "posts_por_s": round(posts / duracao, 3) if duracao else None,
+        "p50_s": round(percentil(latencias, 50), 3),
+        "p95_s": round(percentil(latencias, 95), 3),
+        "p99_s": round(percentil(latencias, 99), 3),
+        "pico_memoria_python_mb": round(pico_memoria / 1024 / 1024, 2),
+        # ru_maxrss é em KB no Linux
+        "rss_maximo_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline do JuriPost com backend simulado.")
+    parser.add_argument("--concorrencias", default="1,2,4,8", help="Níveis de concorrência separados por vírgula.")
+    parser.add_argument("--posts", type=int, default=16, help="Posts gerados em cada nível.")
+    parser.add_argument("--distribuicao", default="lognormal", choices=["fixa", "uniforme", "normal", "lognormal"])
+    parser.add_argument("--latencia-media", type=float, default=0.5, help="Latência média de cada chamada, em segundos.")
+    parser.add_argument("--latencia-desvio", type=float, default=0.15, help="Desvio padrão da latência, em segundos.")
+    parser.add_argument("--caracteres", type=int, default=1500, help="Tamanho de cada resposta simulada.")
+    parser.add_argument("--max-concorrencia", type=int, default=64, help="Tamanho do pool de chamadas de agentes.")
+    parser.add_argument("--rpm", type=float, default=1_000_000,
+                        help="Limite de chamadas por minuto por modelo (padrão: praticamente sem limite, já que não há cota).")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--importacao", type=int, default=0, help="Mede o tempo de importação a frio N vezes (0 desativa).")
+    parser.add_argument("--cassetes", default=None, help="Reproduz os cassetes desta pasta no lugar do backend simulado.")
+    parser.add_argument("--escala-tempo", type=float, default=1.0,
+                        help="Multiplica as latências gravadas nos cassetes (0 = sem espera).")
+    parser.add_argument("--json", default=None, help="Grava os resultados neste arquivo JSON.")
+    args = parser.parse_args(argv)
+
+    # Configura o chatbot_core antes de importá-lo: pool maior, sem cache em disco e limite de requisições próprio
+    os.environ["JURIPOST_MAX_CONCORRENCIA"] = str(args.max_concorrencia)
+    os.environ["JURIPOST_CACHE_DIR"] = ""
+    os.environ["JURIPOST_LIMITE_RPM_PADRAO"] = str(args.rpm)
+    os.environ["JURIPOST_LIMITES_RPM"] = ""
+    os.environ.setdefault("JURIPOST_BACKEND", "stub")
+
+    importacao = None
+    if args.importacao:
+        importacao = medir_importacao(args.importacao)
+        print(f"Importação do chatbot_core: mediana {importacao['mediana_ms']} ms, máximo {importacao['maximo_ms']} ms "
+              f"({importacao['repeticoes']} repetições)")
+
+    import chatbot_core as core
+    from backend_stub import BackendStub, Latencia
+
+    if args.cassetes:
+        from cassetes import BackendReproducao
+        core.definir_backend(BackendReproducao(args.cassetes, escala_tempo=args.escala_tempo))
+    else:
+        core.definir_backend(BackendStub(
+            latencia=Latencia(args.distribuicao, args.latencia_media, args.latencia_desvio),
+            caracteres_saida=args.caracteres,
+            semente=args.semente,
+        ))
+    # Monta as descrições dos agentes antes de medir. O simulado e a reprodução de cassetes não usam o ADK,
+    # então o benchmark roda sem os pacotes do Google e sem chave de API (ver DescricaoAgente)
+    core.preparar_agentes()
+
+    resultados = []
+    concorrencias = [int(valor) for valor in args.concorrencias.split(",") if valor.strip()]
+    if concorrencias:
+        print(f"{'conc.':>5} {'posts':>5} {'duração':>9} {'posts/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'pico MB':>8} {'RSS MB':>7}")
+    for concorrencia in concorrencias:
+        nivel = medir_nivel(core, concorrencia, args.posts)
+        resultados.append(nivel)
+        print(f"{nivel['concorrencia']:>5} {nivel['posts']:>5} {nivel['duracao_s']:>8.2f}s {nivel['posts_por_s']:>8.2f} "
+              f"{nivel['p50_s']:>6.2f}s {nivel['p95_s']:>6.2f}s {nivel['p99_s']:>6.2f}s "
+              f"{nivel['pico_memoria_python_mb']:>8.2f} {nivel['rss_maximo_mb']:>7.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump({"parametros": vars(args), "importacao": importacao, "resultados": resultados}, arquivo, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+
+# --- Cache de Respostas dos Agentes ---
+# As respostas são endereçadas pelo conteúdo: a chave é um hash do nome do agente,
+# do modelo, da instrução e do texto de entrada. Se nada disso mudou, a resposta
+# guardada é devolvida sem chamar o modelo de novo.
+# Há duas camadas: uma LRU em memória e uma pasta no disco com tamanho máximo,
+# de onde os arquivos usados há mais tempo são removidos primeiro.
+
+def calcular_chave(nome_agente: str, modelo: str, instrucao: str, entrada: str, configuracao: str = "") -> str:
+    """
+    Gera a chave (hash SHA-256) que identifica uma chamada de agente.
+    `configuracao` (ajustes de geração, ex.: semente) só entra na chave quando informada.
+    """
+    partes = [nome_agente or "", modelo or "", instrucao or "", entrada or ""]
+    if configuracao:
+        partes.append(configuracao)
+    conteudo = "\x1f".join(partes)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+def chave_da_chamada(agent, message_text: str) -> str:
+    """A chave de uma chamada ao agente: nome, modelo, instrução, entrada e ajustes de geração (se houver)."""
+    configuracao = getattr(agent, "generate_content_config", None)
+    return calcular_chave(agent.name, agent.model, agent.instruction, message_text,
+                          configuracao.model_dump_json(exclude_none=True) if configuracao is not None else "")
+
+class CacheRespostas:
+    def __init__(self, diretorio: str = None, max_itens_memoria: int = 256, max_bytes_disco: int = 50 * 1024 * 1024):
+        """
+        `diretorio` é a pasta da camada em disco (None desativa o disco).
+        `max_itens_memoria` limita a LRU em memória e `max_bytes_disco` o tamanho total da pasta.
+        """
+        self.diretorio = diretorio
+        self.max_itens_memoria = max_itens_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+        self._bytes_disco = None # Calculado na primeira escrita
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.txt")
+
+    def obter(self, chave: str):
+        """Retorna a resposta guardada para a chave, ou None se não houver."""
+        with self._trava:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+
+        if not self.diretorio:
+            return None
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                texto = arquivo.read()
+            os.utime(caminho) # Marca como usado recentemente para a remoção por idade
+        except OSError:
+            return None
+
+        with self._trava:
+            self._guardar_em_memoria(chave, texto)
+        return texto
+
+    def guardar(self, chave: str, texto: str):
+        """Guarda a resposta nas duas camadas."""
+        with self._trava:
+            self._guardar_em_memoria(chave, texto)
+            if self.diretorio:
+                self._guardar_em_disco(chave, texto)
+
+    def limpar(self):
+        """Apaga todas as respostas guardadas, em memória e no disco."""
+        with self._trava:
+            self._memoria.clear()
+            if self.diretorio and os.path.isdir(self.diretorio):
+                for nome in os.listdir(self.diretorio):
+                    if nome.endswith(".txt"):
+                        os.remove(os.path.join(self.diretorio, nome))
+            self._bytes_disco = 0
+
+    def _guardar_em_memoria(self, chave: str, texto: str):
+        self._memoria[chave] = texto
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    def _guardar_em_disco(self, chave: str, texto: str):
+        os.makedirs(self.diretorio, exist_ok=True)
+        if self._bytes_disco is None:
+            self._bytes_disco = sum(tamanho for _, tamanho, _ in self._arquivos_em_disco())
+
+        caminho = self._caminho(chave)
+        dados = texto.encode("utf-8")
+        tamanho_anterior = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        # Escreve num arquivo temporário e troca de uma vez, para nunca deixar um arquivo pela metade
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+        self._bytes_disco += len(dados) - tamanho_anterior
+
+        if self._bytes_disco > self.max_bytes_disco:
+            self._remover_mais_antigos()
+
+    def _arquivos_em_disco(self):
+        """Lista (caminho, tamanho, último uso) de cada resposta guardada no disco."""
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".txt"):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((caminho, info.st_size, info.st_mtime))
+        return arquivos
+
+    def _remover_mais_antigos(self):
+        # Remove os arquivos usados há mais tempo até voltar a 90% do limite
+        arquivos = sorted(self._arquivos_em_disco(), key=lambda item: item[2])
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        alvo = self.max_bytes_disco * 0.9
+        for caminho, tamanho, _ in arquivos:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+        self._bytes_disco = total
+
+# --- Cache de Resultados de Busca ---
+# O resultado do agente buscador depende só do tópico e da data. Aqui ele é guardado
+# por tópico normalizado e por janela de tempo (o dia, ou blocos de N horas), e expira
+# após um TTL. Buscas simultâneas pelo mesmo tópico esperam a primeira em vez de
+# chamarem o modelo de novo.
+
+def normalizar_topico(topico: str) -> str:
+    """Minúsculas, sem acentos, sem pontuação e com espaços simples."""
+    sem_acentos = unicodedata.normalize("NFKD", topico or "").encode("ascii", "ignore").decode("ascii")
+    apenas_palavras = "".join(caractere if caractere.isalnum() else " " for caractere in sem_acentos.casefold())
+    return " ".join(apenas_palavras.split())
+
+class CacheBusca:
+    def __init__(self, janela_horas: float = 24, ttl_horas: float = None, max_itens: int = 512):
+        """
+        `janela_horas` define o intervalo em que buscas pelo mesmo tópico são compartilhadas
+        (24 usa o dia do calendário). `ttl_horas` é a validade de cada resultado (padrão: a janela).
+        """
+        self.janela_horas = janela_horas
+        self.ttl_segundos = (ttl_horas if ttl_horas is not None else janela_horas) * 3600
+        self.max_itens = max_itens
+        self._itens = OrderedDict() # chave -> (expira_em, texto)
+        self._em_andamento = {} # chave -> Future da busca em curso
+        self._trava = threading.Lock()
+
+    def chave(self, topico: str, agora: float = None) -> str:
+        agora = time.time() if agora is None else agora
+        if self.janela_horas == 24:
+            janela = datetime.fromtimestamp(agora).date().isoformat()
+        else:
+            janela = str(int(agora // (self.janela_horas * 3600)))
+        return f"{normalizar_topico(topico)}|{janela}"
+
+    def obter(self, topico: str):
+        """Retorna o resultado ainda válido para o tópico na janela atual, ou None."""
+        chave = self.chave(topico)
+        with self._trava:
+            return self._obter_valido(chave)
+
+    def obter_ou_buscar(self, topico: str, buscar, forcar: bool = False) -> str:
+        """
+        Retorna o resultado guardado para o tópico ou executa `buscar()` e guarda o resultado.
+        Com `forcar=True` a busca é sempre refeita (e o resultado novo substitui o guardado).
+        """
+        chave = self.chave(topico)
+        with self._trava:
+            texto = None if forcar else self._obter_valido(chave)
+            if texto is not None:
+                return texto
+            futuro = self._em_andamento.get(chave)
+            responsavel = futuro is None
+            if responsavel:
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+
+        # Outra thread já está buscando este tópico: espera o resultado dela
+        if not responsavel:
+            return futuro.result()
+
+        try:
+            texto = buscar()
+        except Exception as erro:
+            futuro.set_exception(erro)
+            raise
+        else:
+            futuro.set_result(texto)
+            if texto and texto.strip():
+                with self._trava:
+                    self._itens[chave] = (time.time() + self.ttl_segundos, texto)
+                    self._itens.move_to_end(chave)
+                    while len(self._itens) > self.max_itens:
+                        self._itens.popitem(last=False)
+            return texto
+        finally:
+            with self._trava:
+                self._em_andamento.pop(chave, None)
+
+    def _obter_valido(self, chave: str):
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        expira_em, texto = item
+        if expira_em <= time.time():
+            del self._itens[chave]
+            return None
+        self._itens.move_to_end(chave)
+        return texto
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+
+from backend_stub import EventoSimulado, UsoSimulado
+from cache_respostas import chave_da_chamada
+
+# --- Gravação e Reprodução de Chamadas (cassetes) ---
+# O BackendGravador envolve outro backend (normalmente o do ADK) e grava o fluxo completo
+# de eventos de cada chamada, com o instante de cada evento, num cassete: um arquivo
+# JSON Lines compactado com gzip, <pasta>/<chave>.jsonl.gz, em que <chave> é a mesma
+# chave de cache_respostas (agente, modelo, instrução, entrada e ajustes de geração).
+# O BackendReproducao toca os cassetes de volta, no ritmo original ou acelerado, sem chave
+# de API nem rede: serve para reproduzir perfis de latência reais, testar a interpretação
+# das respostas e medir a orquestração de forma determinística.
+#
+# Formato: a primeira linha é o cabeçalho {"v", "agente", "modelo", "streaming", "gravado_em"};
+# cada linha seguinte é um evento {"t": segundos desde o início da chamada, "p": parcial,
+# "f": resposta final, "x": textos das partes, "u": [tokens de entrada, de saída, total]}.
+
+VERSAO_CASSETE = 1
+
+class CasseteAusente(LookupError):
+    """Não há cassete gravado para esta chamada."""
+
+def caminho_cassete(diretorio: str, chave: str) -> str:
+    return os.path.join(diretorio, f"{chave}.jsonl.gz")
+
+def _serializar_evento(evento, instante: float) -> dict:
+    conteudo = getattr(evento, "content", None)
+    partes = getattr(conteudo, "parts", None) or []
+    registro = {
+        "t": round(instante, 4),
+        "p": int(bool(getattr(evento, "partial", False))),
+        "f": int(bool(evento.is_final_response())),
+        "x": [getattr(parte, "text", None) for parte in partes],
+    }
+    uso = getattr(evento, "usage_metadata", None)
+    if uso is not None:
+        registro["u"] = [uso.prompt_token_count or 0, uso.candidates_token_count or 0, uso.total_token_count or 0]
+    return registro
+
+def _evento_do_registro(autor: str, registro: dict) -> EventoSimulado:
+    uso = UsoSimulado(*registro["u"]) if "u" in registro else None
+    return EventoSimulado(autor, registro["x"], partial=bool(registro["p"]), usage_metadata=uso, final=bool(registro["f"]))
+
+def ler_cassete(caminho: str):
+    """Retorna (cabeçalho, eventos) de um cassete."""
+    with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+        cabecalho = json.loads(arquivo.readline())
+        eventos = [json.loads(linha) for linha in arquivo if linha.strip()]
+    return cabecalho, eventos
+
+class BackendGravador:
+    # Na gravação toda chamada precisa chegar ao modelo: call_agent e a busca ignoram os caches na leitura
+    usa_cache = False
+
+    def __init__(self, backend, diretorio: str = "cassetes"):
+        """Repassa cada chamada para `backend` e grava o fluxo de eventos em `diretorio`."""
+        self.backend = backend
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        # Chaves já gravadas nesta execução com a resposta final (não são trocadas por gravações cortadas)
+        self._com_resposta_final = set()
+
+    @property
+    def usa_adk(self) -> bool:
+        return getattr(self.backend, "usa_adk", True)
+
+    def executar(self, agent, message_text: str, contexto, streaming: bool):
+        inicio = time.perf_counter()
+        eventos = []
+        final = False
+        chave = chave_da_chamada(agent, message_text)
+        fluxo = self.backend.executar(agent, message_text, contexto, streaming)
+        try:
+            for evento in fluxo:
+                eventos.append(_serializar_evento(evento, time.perf_counter() - inicio))
+                final = final or (not evento.partial and evento.is_final_response())
+                yield evento
+        except GeneratorExit:
+            # call_agent parou de ler (resposta completa, limite de saída ou cópia que perdeu a corrida): o fluxo de
+            # dentro é fechado, para o backend cancelar a chamada, e fica gravado só o que foi recebido. Na
+            # reprodução com os mesmos limites, call_agent para no mesmo ponto. Uma gravação cortada sem eventos,
+            # ou sem resposta final quando esta execução já gravou a chamada completa, é descartada.
+            fluxo.close()
+            if eventos and (final or chave not in self._com_resposta_final):
+                self._gravar(chave, agent, streaming, eventos, final)
+            return
+        # Chamadas que terminaram com erro do backend não chegam aqui e não são gravadas
+        self._gravar(chave, agent, streaming, eventos, final)
+
+    def _gravar(self, chave: str, agent, streaming: bool, eventos: list, final: bool):
+        if final:
+            self._com_resposta_final.add(chave)
+        cabecalho = {"v": VERSAO_CASSETE, "agente": agent.name, "modelo": agent.model, "streaming": streaming,
+                     "gravado_em": time.time()}
+        caminho = caminho_cassete(self.diretorio, chave)
+        temporario = f"{caminho}.{uuid.uuid4().hex[:8]}.tmp"
+        with gzip.open(temporario, "wt", encoding="utf-8") as arquivo:
+            for linha in [cabecalho] + eventos:
+                arquivo.write(json.dumps(linha, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(temporario, caminho)
+
+class BackendReproducao:
+    # Só toca eventos gravados: os agentes podem ser descrições leves (chatbot_core.DescricaoAgente), sem o ADK
+    usa_adk = False
+
+    def __init__(self, diretorio: str = "cassetes", escala_tempo: float = 1.0, modo: str = "agente"):
+        """
+        Toca os cassetes de `diretorio`. `escala_tempo` multiplica as esperas gravadas
+        (1 = ritmo original, 0.1 = dez vezes mais rápido, 0 = sem espera).
+        `modo` 'exato' exige o cassete da mesma chamada (senão lança CasseteAusente); 'agente' usa,
+        na falta dele, um cassete do mesmo agente escolhido de forma determinística pela entrada.
+        """
+        if modo not in ("exato", "agente"):
+            raise ValueError(f"Modo de reprodução desconhecido: {modo}")
+        self.diretorio = diretorio
+        self.escala_tempo = escala_tempo
+        self.modo = modo
+        self._por_agente = None
+        self._trava = threading.Lock()
+        self.reproduzidas = 0
+        self.substituidas = 0
+
+    def _indice_por_agente(self) -> dict:
+        """Chaves dos cassetes de cada agente (lidas dos cabeçalhos uma única vez)."""
+        with self._trava:
+            if self._por_agente is None:
+                self._por_agente = {}
+                for nome in sorted(os.listdir(self.diretorio)) if os.path.isdir(self.diretorio) else []:
+                    if nome.endswith(".jsonl.gz"):
+                        with gzip.open(os.path.join(self.diretorio, nome), "rt", encoding="utf-8") as arquivo:
+                            agente = json.loads(arquivo.readline())["agente"]
+                        self._por_agente.setdefault(agente, []).append(nome[:-len(".jsonl.gz")])
+            return self._por_agente
+
+    def _escolher(self, agent, message_text: str) -> str:
+        chave = chave_da_chamada(agent, message_text)
+        if os.path.exists(caminho_cassete(self.diretorio, chave)):
+            return chave
+        candidatos = self._indice_por_agente().get(agent.name) if self.modo == "agente" else None
+        if not candidatos:
+            raise CasseteAusente(f"Nenhum cassete para {agent.name} ({chave[:12]}) em {self.diretorio}")
+        with self._trava:
+            self.substituidas += 1
+        return candidatos[int(chave, 16) % len(candidatos)]
+
+    def executar(self, agent, message_text: str, contexto, streaming: bool):
+        cabecalho, eventos = ler_cassete(caminho_cassete(self.diretorio, self._escolher(agent, message_text)))
+        with self._trava:
+            self.reproduzidas += 1
+        inicio = time.perf_counter()
+        for registro in eventos:
+            # Sem streaming, os trechos parciais gravados não são entregues (como faria o modelo)
+            if registro["p"] and not streaming:
+                continue
+            espera = registro["t"] * self.escala_tempo - (time.perf_counter() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+            yield _evento_do_registro(cabecalho["agente"], registro)
@@ -1,15 +1,38 @@
+from __future__ import annotations
+
+import time
+_inicio_importacao = time.perf_counter()
+
 import os
-import google.generativeai as genai
-from google.adk.agents import Agent
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk.tools import google_search
-from google.genai import types
+import asyncio
+import json
 from datetime import date
-import textwrap
-import requests
+from dataclasses import asdict, dataclass, field, replace
+from typing import TYPE_CHECKING, Callable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import closing
+import threading
+import queue
+import uuid
 import warnings
 
+# Os SDKs do Google (ADK e google-genai) são pesados e só são importados quando um agente
+# é construído ou chamado pela primeira vez. Assim importar este módulo (e cada rerun do
+# Streamlit) fica rápido. Os backends que não chamam o Gemini (simulado e reprodução de
+# cassetes) usam descrições leves dos agentes (DescricaoAgente) e nunca carregam os SDKs.
+if TYPE_CHECKING:
+    from google.adk.agents import Agent
+    from google.adk.runners import Runner
+
+from cache_respostas import CacheBusca, CacheRespostas, chave_da_chamada
+from conformidade import VERIFICADORES, AuditoriaConformidade, descrever_violacoes, verificar_rascunho
+from duplicatas import EstatisticasLatencia, OrcamentoDuplicatas, calcular_limiar, executar_com_duplicata, ler_regras
+from limitador import LimitadorModelos, erro_de_modelo, executar_com_retentativas, ler_limites
+from metricas import ColetorMetricas
+from orcamento import estimar_tokens, ler_orcamentos, preparar_entrada
+from roteamento import RoteadorModelos, Rota, ler_rotas
+from saidas import DISCLAIMER_LEGENDA, INTERPRETADORES, MARCADOR_REVISAO, ErroFormato, fim_da_resposta
+
 warnings.filterwarnings("ignore")
 
 # --- Configuração da API Key (MUDANÇA AQUI!) ---
@@ -18,44 +41,505 @@ warnings.filterwarnings("ignore")
 # E DESCOMENTE (remova o '#') a linha abaixo para que ele consiga ler sua chave:
 from dotenv import load_dotenv; load_dotenv() # <--- DESCOMENTE ESTA LINHA
 
-# Não precisa mexer no código abaixo, ele vai tentar pegar a chave da variável de ambiente
-try:
-    os.environ["GOOGLE_API_KEY"]
-except KeyError:
-    raise Exception("Variável de ambiente GOOGLE_API_KEY não definida. Por favor, defina-a no seu arquivo .env ou no sistema.")
+# Não precisa mexer no código abaixo, ele vai tentar pegar a chave da variável de ambiente.
+# A chave só é exigida quando um agente é chamado de verdade; com o backend simulado
+# (JURIPOST_BACKEND=stub) o módulo funciona sem ela.
+def verificar_api_key():
+    try:
+        os.environ["GOOGLE_API_KEY"]
+    except KeyError:
+        raise Exception("Variável de ambiente GOOGLE_API_KEY não definida. Por favor, defina-a no seu arquivo .env ou no sistema.")
 # Fim da Configuração da API Key
 
-# Configura o cliente da SDK do Gemini
-client = genai.Client()
 MODEL_ID = "gemini-2.0-flash" # Mantenha o ID do seu modelo principal
 
-# Função auxiliar que envia uma mensagem para um agente via Runner e retorna a resposta final
-def call_agent(agent: Agent, message_text: str) -> str:
-    session_service = InMemorySessionService()
-    session = session_service.create_session(app_name=agent.name, user_id="user1", session_id="session1")
-    runner = Runner(agent=agent, app_name=agent.name, session_service=session_service)
-    content = types.Content(role="user", parts=[types.Part(text=message_text)])
-
-    final_response = ""
-    for event in runner.run(user_id="user1", session_id="session1", new_message=content):
-        if event.is_final_response():
-            for part in event.content.parts:
-                if part.text is not None:
-                    final_response += part.text
-                    final_response += "\n"
+# Modelo de cada agente
+MODELOS_AGENTES = {
+    "agente_buscador": MODEL_ID,
+    "agente_planejador": MODEL_ID,
+    "agente_reels_completo": MODEL_ID,
+    "agente_redator": MODEL_ID,
+    "agente_revisor": MODEL_ID,
+    "agente_legenda": MODEL_ID,
+    "agente_imagem": "gemini-2.5-flash-preview-05-20", # Mantenha o modelo mais recente para imagem
+}
+
+# Rota de cada agente: o modelo de MODELOS_AGENTES e, como reserva, os demais modelos usados pelo app.
+# JURIPOST_ROTAS substitui rotas inteiras, ex.: "agente_legenda=gemini-2.0-flash-lite>gemini-2.0-flash", e
+# JURIPOST_ROTAS_POR_LATENCIA lista os agentes que devem usar primeiro o modelo mais rápido da rota.
+ROTAS_AGENTES = {
+    nome: Rota([modelo] + [outro for outro in dict.fromkeys(MODELOS_AGENTES.values()) if outro != modelo])
+    for nome, modelo in MODELOS_AGENTES.items()
+}
+ROTAS_AGENTES.update(ler_rotas(os.environ.get("JURIPOST_ROTAS")))
+for _nome in os.environ.get("JURIPOST_ROTAS_POR_LATENCIA", "").split(","):
+    if _nome.strip() in ROTAS_AGENTES:
+        ROTAS_AGENTES[_nome.strip()].por_latencia = True
+# O modelo principal de cada agente passa a ser o primeiro da sua rota
+MODELOS_AGENTES.update({nome: rota.modelos[0] for nome, rota in ROTAS_AGENTES.items() if rota.modelos})
+roteador_modelos = RoteadorModelos(ROTAS_AGENTES)
+
+# Número máximo de chamadas de agentes executando ao mesmo tempo no processo (somando todos os usuários)
+MAX_CONCORRENCIA = int(os.environ.get("JURIPOST_MAX_CONCORRENCIA", "8"))
+
+# Pool de threads compartilhado por todas as gerações de post do processo
+_executor_agentes = ThreadPoolExecutor(max_workers=MAX_CONCORRENCIA, thread_name_prefix="juripost-agente")
+
+# Cache das respostas dos agentes (LRU em memória + pasta no disco). JURIPOST_CACHE_DIR vazio desativa o disco.
+cache_respostas = CacheRespostas(
+    diretorio=os.environ.get("JURIPOST_CACHE_DIR", ".cache_juripost") or None,
+    max_itens_memoria=int(os.environ.get("JURIPOST_CACHE_MAX_ITENS", "256")),
+    max_bytes_disco=int(float(os.environ.get("JURIPOST_CACHE_MAX_MB", "50")) * 1024 * 1024),
+)
+
+# Métricas de cada chamada e etapa. JURIPOST_METRICAS_JSONL, se definido, recebe cada registro assim que ele é feito.
+coletor_metricas = ColetorMetricas(arquivo_jsonl=os.environ.get("JURIPOST_METRICAS_JSONL") or None)
+
+# Limite de chamadas por minuto de cada modelo, compartilhado por todo o processo.
+# Ex.: JURIPOST_LIMITES_RPM="gemini-2.0-flash=15,gemini-2.5-flash-preview-05-20=10"; os demais usam JURIPOST_LIMITE_RPM_PADRAO.
+limitador_modelos = LimitadorModelos(
+    limites_por_minuto=ler_limites(os.environ.get("JURIPOST_LIMITES_RPM")),
+    limite_padrao=float(os.environ.get("JURIPOST_LIMITE_RPM_PADRAO", "60")),
+)
+
+# Tentativas por chamada de agente em erros temporários (cota, indisponibilidade, rede)
+MAX_TENTATIVAS = int(os.environ.get("JURIPOST_MAX_TENTATIVAS", "4"))
+
+# Tentativas por etapa quando a resposta não segue o formato pedido na instrução (ver saidas.py)
+# ou viola as regras de conformidade conferidas localmente (ver conformidade.py)
+MAX_TENTATIVAS_FORMATO = int(os.environ.get("JURIPOST_MAX_TENTATIVAS_FORMATO", "2"))
+
+# Antes de repassar a resposta de uma etapa às seguintes, ela é compactada (ver orcamento.py) e, se a etapa
+# que a recebe tiver orçamento, cortada para caber nele. Ex.: JURIPOST_ORCAMENTO_TOKENS="plano_de_post=2000,legenda_post=800"
+# limita a busca enviada ao planejador e o post enviado à legenda. JURIPOST_COMPACTAR_ENTRADAS=0 desativa tudo.
+COMPACTAR_ENTRADAS = os.environ.get("JURIPOST_COMPACTAR_ENTRADAS", "1") == "1"
+ORCAMENTOS_ETAPAS = ler_orcamentos(os.environ.get("JURIPOST_ORCAMENTO_TOKENS", "plano_de_post=2000"))
+# O revisor recebe o rascunho inteiro, sem compactação nem orçamento: é o texto que ele reescreve
+# e que vai para publicação como está quando já está conforme (ver agente_revisor)
+ETAPAS_SEM_COMPACTACAO = ('post_final',)
+
+# Tamanho máximo da resposta de cada agente, em tokens, enviado ao modelo como max_output_tokens. As instruções
+# pedem saídas curtas (6 a 8 slides, legenda de até 7 linhas), então o limite só corta gerações descontroladas.
+# Nos modelos 2.5 o limite também conta os tokens de raciocínio, por isso o do agente de imagem é maior.
+# Ex.: JURIPOST_MAX_TOKENS_SAIDA="agente_legenda=400,agente_reels_completo=1500"; 0 remove o limite do agente.
+MAX_TOKENS_SAIDA = {
+    "agente_buscador": 2048,
+    "agente_planejador": 2048,
+    "agente_reels_completo": 2048,
+    "agente_redator": 1024,
+    "agente_revisor": 1536,
+    "agente_legenda": 768,
+    "agente_imagem": 4096,
+}
+MAX_TOKENS_SAIDA.update(ler_orcamentos(os.environ.get("JURIPOST_MAX_TOKENS_SAIDA")))
+# Linha que encerra a resposta do agente: assim que ela chega completa, call_agent para de ler o fluxo e
+# descarta o que viesse depois. Fica fora do stop_sequences do modelo, que tiraria a própria linha da resposta.
+FIM_DAS_RESPOSTAS = {
+    "agente_revisor": MARCADOR_REVISAO,
+    "agente_legenda": DISCLAIMER_LEGENDA,
+}
+
+# Verificações de conformidade de cada geração. JURIPOST_AUDITORIA_JSONL, se definido, recebe cada uma assim que é feita.
+auditoria_conformidade = AuditoriaConformidade(arquivo_jsonl=os.environ.get("JURIPOST_AUDITORIA_JSONL") or None)
+# Rascunho sem nenhuma violação vai direto para publicação, sem a chamada ao revisor ("0" sempre chama o revisor)
+PULAR_REVISOR_CONFORME = os.environ.get("JURIPOST_PULAR_REVISOR_CONFORME", "1") == "1"
+
+# Cópias de chamadas lentas (ver duplicatas.py), desativadas por padrão. Limiar por etapa, em segundos ou
+# no percentil de latência do agente: JURIPOST_DUPLICATAS="*=p95" ou "lancamentos_buscados=30,post_final=p95".
+# JURIPOST_DUPLICATAS_ORCAMENTO é a fração máxima de chamadas extras (0.1 = até 10%).
+REGRAS_DUPLICATAS = ler_regras(os.environ.get("JURIPOST_DUPLICATAS"))
+MIN_AMOSTRAS_DUPLICATAS = int(os.environ.get("JURIPOST_DUPLICATAS_MIN_AMOSTRAS", "20"))
+orcamento_duplicatas = OrcamentoDuplicatas(fracao=float(os.environ.get("JURIPOST_DUPLICATAS_ORCAMENTO", "0.1")))
+latencias_agentes = EstatisticasLatencia()
+# A chamada original e a cópia rodam num pool próprio, para não disputar vagas com as etapas
+_executor_duplicatas = ThreadPoolExecutor(max_workers=MAX_CONCORRENCIA * 2, thread_name_prefix="juripost-duplicata")
+
+# Cache das buscas por tópico: quem gerar posts sobre o mesmo tema na mesma janela reaproveita uma única busca.
+# JURIPOST_BUSCA_JANELA_HORAS=24 agrupa pelo dia; valores menores agrupam em blocos de N horas.
+cache_busca = CacheBusca(
+    janela_horas=float(os.environ.get("JURIPOST_BUSCA_JANELA_HORAS", "24")),
+    ttl_horas=float(os.environ["JURIPOST_BUSCA_TTL_HORAS"]) if os.environ.get("JURIPOST_BUSCA_TTL_HORAS") else None,
+)
+
+# --- Contexto da Requisição ---
+# Identifica quem pediu a geração e qual geração é, para que usuários e threads
+# diferentes nunca compartilhem sessões.
+@dataclass
+class ContextoRequisicao:
+    user_id: str = "anonimo"
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # Etapa do pipeline em execução (preenchida pelo orquestrador)
+    etapa: str = None
+    # Se definido, call_agent transmite a resposta em partes: ao_receber_parcial(etapa, texto_acumulado)
+    ao_receber_parcial: Callable[[str, str], None] = None
+    # False ignora o cache de respostas (ex.: quando o usuário pede explicitamente para refazer)
+    usar_cache: bool = True
+    # Motivo pelo qual a resposta anterior desta etapa foi recusada; é repassado ao agente na nova tentativa
+    correcao_formato: str = None
+    # Ajustes de geração do modelo (None = padrão do modelo); usados para criar variantes de um post
+    temperatura: float = None
+    semente: int = None
+
+# --- Registro de Agentes ---
+# Cada agente é construído uma única vez por (nome, modelo), junto com o seu Runner,
+# e compartilhado entre todas as chamadas. Assim as instruções longas e o Runner não
+# são recriados a cada post.
+_agentes_registrados = {}
+_runners_registrados = {}
+_trava_registro = threading.Lock()
+
+def obter_agente(nome: str, modelo: str, construtor, ajustes: tuple = ()) -> Agent:
+    """
+    Retorna o agente registrado para (nome, modelo, ajustes), construindo-o com `construtor(modelo, ajustes)`
+    na primeira vez. `ajustes` são pares (campo, valor) da configuração de geração, ex.: (("seed", 2),).
+    """
+    # Agentes do ADK e descrições leves (ver DescricaoAgente) ficam em entradas separadas do registro
+    chave = (nome, modelo, ajustes, _backend_usa_adk())
+    with _trava_registro:
+        if chave not in _agentes_registrados:
+            _agentes_registrados[chave] = construtor(modelo, ajustes)
+        return _agentes_registrados[chave]
+
+# --- Agentes sem o ADK ---
+# Os backends que não chamam o Gemini (ver `usa_adk` em backend_stub.py e cassetes.py) só leem do
+# agente o nome, o modelo, a instrução e a configuração de geração. Para eles, os construtores
+# montam estas descrições no lugar do Agent do ADK, e o pipeline roda sem os SDKs instalados.
+@dataclass(frozen=True)
+class ConfiguracaoGeracao:
+    # Mesmos campos, na mesma ordem, do GenerateContentConfig: a serialização (usada na chave do cache e
+    # dos cassetes) sai idêntica à do SDK
+    temperature: float = None
+    max_output_tokens: int = None
+    seed: int = None
+
+    def model_dump_json(self, exclude_none: bool = True) -> str:
+        campos = {campo: valor for campo, valor in asdict(self).items() if valor is not None or not exclude_none}
+        return json.dumps(campos, separators=(",", ":"))
+
+@dataclass
+class DescricaoAgente:
+    name: str
+    model: str
+    instruction: str = ""
+    description: str = ""
+    generate_content_config: ConfiguracaoGeracao = None
+    tools: list = field(default_factory=list)
+
+def _backend_usa_adk() -> bool:
+    return getattr(obter_backend(), "usa_adk", True)
+
+def _backend_usa_cache() -> bool:
+    """False para backends que precisam receber toda chamada (ex.: o BackendGravador de cassetes.py)."""
+    return getattr(obter_backend(), "usa_cache", True)
+
+def _classe_agente():
+    """O Agent do ADK ou, se o backend não usa o ADK, a DescricaoAgente."""
+    if not _backend_usa_adk():
+        return DescricaoAgente
+    from google.adk.agents import Agent
+    return Agent
+
+def _ferramentas_busca() -> list:
+    """A ferramenta de busca do Google, para os agentes que pesquisam (nenhuma sem o ADK)."""
+    if not _backend_usa_adk():
+        return []
+    from google.adk.tools import google_search
+    return [google_search]
+
+def _configuracao_geracao(ajustes: tuple = ()):
+    """GenerateContentConfig com os ajustes informados, ou None para usar o padrão do modelo."""
+    if not ajustes:
+        return None
+    if not _backend_usa_adk():
+        return ConfiguracaoGeracao(**dict(ajustes))
+    from google.genai import types
+    return types.GenerateContentConfig(**dict(ajustes))
+
+def _limites_saida(nome: str) -> tuple:
+    """Limite de saída do agente (ver MAX_TOKENS_SAIDA), no formato dos ajustes de geração."""
+    limite = MAX_TOKENS_SAIDA.get(nome)
+    return (("max_output_tokens", limite),) if limite else ()
+
+def _ajustes(contexto: ContextoRequisicao) -> tuple:
+    """Ajustes de geração pedidos no contexto, no formato usado como chave do registro de agentes."""
+    if contexto is None:
+        return ()
+    return tuple((campo, valor) for campo, valor in (("temperature", contexto.temperatura), ("seed", contexto.semente))
+                 if valor is not None)
+
+# Serviço de sessões único para todos os Runners, com limite de sessões e de memória (ver sessoes.py)
+MAX_SESSOES = int(os.environ.get("JURIPOST_MAX_SESSOES", "256"))
+MAX_MEMORIA_SESSOES_MB = float(os.environ.get("JURIPOST_MAX_MEMORIA_SESSOES_MB", "64"))
+_servico_sessoes = None
+
+def obter_servico_sessoes():
+    global _servico_sessoes
+    with _trava_registro:
+        if _servico_sessoes is None:
+            from sessoes import ServicoSessoesLimitado
+            _servico_sessoes = ServicoSessoesLimitado(MAX_SESSOES, int(MAX_MEMORIA_SESSOES_MB * 1024 * 1024))
+        return _servico_sessoes
+
+def estado_sessoes() -> dict:
+    """Tamanho atual do serviço de sessões (zerado enquanto nenhum agente do ADK foi chamado)."""
+    if _servico_sessoes is None:
+        return {"sessoes": 0, "bytes": 0, "descartadas": 0}
+    return _servico_sessoes.tamanho()
+
+def obter_runner(agent: Agent) -> Runner:
+    """Retorna o Runner compartilhado do agente, criando-o na primeira vez."""
+    # Variantes do mesmo agente (ajustes de geração diferentes) têm cada uma o seu Runner
+    chave = (agent.name, agent.model, id(agent))
+    from google.adk.runners import Runner
+
+    servico_sessoes = obter_servico_sessoes()
+    with _trava_registro:
+        runner = _runners_registrados.get(chave)
+        if runner is None or runner.agent is not agent:
+            runner = Runner(agent=agent, app_name=agent.name, session_service=servico_sessoes)
+            _runners_registrados[chave] = runner
+        return runner
+
+# --- Backends de Execução ---
+# O backend é quem de fato executa o agente e devolve o fluxo de eventos.
+# Qualquer objeto com o método `executar(agent, message_text, contexto, streaming)`
+# que produza eventos no formato do ADK (partial, content.parts, is_final_response(),
+# usage_metadata) pode ser usado, o que permite rodar o pipeline sem a API do Gemini.
+class BackendADK:
+    """Executa os agentes pelo Runner do ADK, chamando a API do Gemini."""
+
+    def executar(self, agent: Agent, message_text: str, contexto: ContextoRequisicao, streaming: bool):
+        from google.adk.agents.run_config import RunConfig, StreamingMode
+        from google.genai import types
+
+        verificar_api_key()
+        runner = obter_runner(agent)
+        # Como o Runner é compartilhado, cada chamada usa uma sessão própria, única por requisição e agente,
+        # apagada ao fim da chamada (mesmo com erro ou se o fluxo for abandonado)
+        user_id = contexto.user_id
+        session_id = f"{contexto.request_id}-{agent.name}-{uuid.uuid4().hex[:8]}"
+        content = types.Content(role="user", parts=[types.Part(text=message_text)])
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE if streaming else StreamingMode.NONE)
+        # O Runner.run síncrono do ADK roda a chamada numa thread que continua até o modelo terminar, mesmo
+        # se ninguém mais ler os eventos. Aqui o run_async roda como uma tarefa própria numa thread e, quando
+        # call_agent fecha o fluxo (resposta completa ou limite atingido), a tarefa é cancelada: a conexão com
+        # o modelo é encerrada e o restante da resposta deixa de ser gerado.
+        fila = queue.Queue()
+        fim = object()
+        tarefa = {}
+
+        async def consumir():
+            tarefa["loop"], tarefa["tarefa"] = asyncio.get_running_loop(), asyncio.current_task()
+            try:
+                await runner.session_service.create_session(app_name=agent.name, user_id=user_id, session_id=session_id)
+                async for evento in runner.run_async(user_id=user_id, session_id=session_id, new_message=content,
+                                                     run_config=run_config):
+                    fila.put(evento)
+            except asyncio.CancelledError:
+                pass
+            except Exception as erro:
+                fila.put(erro) # Relançado na thread de quem chamou, para as retentativas e a troca de modelo
+            finally:
+                await runner.session_service.delete_session(app_name=agent.name, user_id=user_id, session_id=session_id)
+                fila.put(fim)
+
+        thread = threading.Thread(target=asyncio.run, args=(consumir(),), daemon=True, name="juripost-adk")
+        thread.start()
+        try:
+            while (item := fila.get()) is not fim:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if thread.is_alive():
+                try:
+                    tarefa["loop"].call_soon_threadsafe(tarefa["tarefa"].cancel)
+                except (KeyError, RuntimeError):
+                    pass # A tarefa já terminou
+                thread.join(timeout=5)
+
+_backend = None
+
+def definir_backend(backend):
+    """Troca o backend usado por call_agent (ex.: BackendStub em testes e benchmarks)."""
+    global _backend
+    _backend = backend
+
+def obter_backend():
+    """
+    Retorna o backend atual; na primeira vez, escolhe conforme JURIPOST_BACKEND:
+    'adk' (padrão), 'stub', 'gravar' (ADK gravando cassetes) ou 'reproduzir' (toca os cassetes gravados).
+    Os cassetes ficam em JURIPOST_CASSETES_DIR (ver cassetes.py).
+    """
+    global _backend
+    if _backend is None:
+        tipo = os.environ.get("JURIPOST_BACKEND", "adk").lower()
+        diretorio_cassetes = os.environ.get("JURIPOST_CASSETES_DIR", "cassetes")
+        if tipo == "stub":
+            from backend_stub import BackendStub
+            _backend = BackendStub()
+        elif tipo == "gravar":
+            from cassetes import BackendGravador
+            _backend = BackendGravador(BackendADK(), diretorio_cassetes)
+        elif tipo == "reproduzir":
+            from cassetes import BackendReproducao
+            _backend = BackendReproducao(
+                diretorio_cassetes,
+                escala_tempo=float(os.environ.get("JURIPOST_CASSETES_ESCALA_TEMPO", "1")),
+                modo=os.environ.get("JURIPOST_CASSETES_MODO", "agente"),
+            )
+        else:
+            _backend = BackendADK()
+    return _backend
+
+# Função auxiliar que envia uma mensagem para um agente via backend e retorna a resposta final
+def call_agent(agent: Agent, message_text: str, contexto: ContextoRequisicao = None, usar_cache: bool = True) -> str:
+    """
+    Se o modelo do agente falhar (depois das retentativas), tenta os modelos seguintes da rota
+    do agente (ver roteamento.py). Só troca de modelo em falhas que outro modelo pode contornar
+    (cota, indisponibilidade, rede, modelo inexistente); os demais erros sobem na hora. Se todos
+    os modelos falharem, relança o erro do primeiro.
+    """
+    try:
+        return _chamar_modelo(agent, message_text, contexto, usar_cache)
+    except Exception as erro:
+        if agent.name not in CONSTRUTORES_AGENTES or not erro_de_modelo(erro):
+            raise
+        for modelo in roteador_modelos.ordenar(agent.name):
+            if modelo == agent.model:
+                continue
+            try:
+                return _chamar_modelo(_agente(agent.name, contexto, modelo), message_text, contexto, usar_cache)
+            except Exception as erro_reserva:
+                if not erro_de_modelo(erro_reserva):
+                    raise
+        raise erro
+
+def _chamar_modelo(agent: Agent, message_text: str, contexto: ContextoRequisicao = None, usar_cache: bool = True) -> str:
+    """Uma chamada ao agente no modelo dele: cache, limite de requisições, retentativas e cópias por demora."""
+    contexto = contexto or ContextoRequisicao()
+    if contexto.correcao_formato:
+        message_text += (f"\n\nATENÇÃO: a resposta anterior foi recusada porque {contexto.correcao_formato}. "
+                         "Siga rigorosamente o formato e as regras pedidos nas instruções.")
+    with coletor_metricas.medir_chamada(contexto.request_id, contexto.etapa, agent.name, agent.model, message_text) as medicao:
+        usar_cache = usar_cache and contexto.usar_cache and _backend_usa_cache()
+        chave_cache = chave_da_chamada(agent, message_text)
+        if usar_cache:
+            resposta_guardada = cache_respostas.obter(chave_cache)
+            if resposta_guardada is not None:
+                if contexto.ao_receber_parcial is not None:
+                    contexto.ao_receber_parcial(contexto.etapa or agent.name, resposta_guardada)
+                medicao.registrar_saida(resposta_guardada, cache=True)
+                return resposta_guardada
+
+        # Com um callback de parciais, pede ao modelo a resposta em streaming (SSE)
+        streaming = contexto.ao_receber_parcial is not None
+
+        medicao.registro.tentativas = 0
+        configuracao = getattr(agent, "generate_content_config", None)
+        limite_tokens = getattr(configuracao, "max_output_tokens", None)
+        marcador_fim = FIM_DAS_RESPOSTAS.get(agent.name)
+
+        def tentativa(transmitir, cancelado):
+            # Com cópia em andamento, a que perdeu a corrida para assim que possível
+            if cancelado is not None and cancelado.is_set():
+                return ""
+            medicao.registro.tentativas += 1
+            # Cada tentativa espera sua vez no limite de requisições do modelo
+            limitador_modelos.adquirir(agent.model)
+            resposta = ""
+            texto_parcial = ""
+            # A leitura para assim que a resposta está completa: na resposta final, no fim da última linha
+            # esperada (FIM_DAS_RESPOSTAS) ou, em streaming, quando o texto passa do limite de tokens.
+            # closing() fecha o fluxo na hora; o BackendADK então cancela a chamada ao modelo e apaga a sessão.
+            with closing(obter_backend().executar(agent, message_text, contexto, transmitir)) as eventos:
+                for event in eventos:
+                    if cancelado is not None and cancelado.is_set():
+                        break
+                    medicao.registrar_evento(event)
+                    if transmitir and event.partial and event.content and event.content.parts:
+                        texto_parcial += "".join(part.text for part in event.content.parts if part.text)
+                        fim = fim_da_resposta(texto_parcial, marcador_fim) if marcador_fim else None
+                        if fim is not None:
+                            resposta, medicao.registro.interrompida = texto_parcial[:fim], "fim"
+                        elif limite_tokens and estimar_tokens(texto_parcial) > limite_tokens:
+                            resposta, medicao.registro.interrompida = texto_parcial, "limite"
+                        contexto.ao_receber_parcial(contexto.etapa or agent.name, resposta or texto_parcial)
+                        if resposta:
+                            break
+                    elif event.is_final_response() and event.content and event.content.parts:
+                        # As partes de uma resposta são trechos seguidos do mesmo texto
+                        resposta = "".join(part.text for part in event.content.parts if part.text)
+                        fim = fim_da_resposta(resposta, marcador_fim) if marcador_fim else None
+                        if fim is not None and resposta[fim:].strip():
+                            resposta, medicao.registro.interrompida = resposta[:fim], "fim"
+                        uso = getattr(event, "usage_metadata", None)
+                        if limite_tokens and uso is not None and (uso.candidates_token_count or 0) >= limite_tokens:
+                            medicao.registro.interrompida = "limite" # O próprio modelo cortou a resposta no limite
+                        if resposta:
+                            break
+            return resposta
+
+        def ao_falhar(numero_tentativa, erro):
+            limitador_modelos.registrar_erro(agent.model, erro)
+
+        def executar(principal=True, cancelado=None):
+            # Só a chamada original transmite em partes; a cópia pede a resposta inteira
+            return executar_com_retentativas(lambda: tentativa(streaming and principal, cancelado),
+                                             max_tentativas=MAX_TENTATIVAS, ao_falhar=ao_falhar)
+
+        orcamento_duplicatas.registrar_chamada()
+        regra = REGRAS_DUPLICATAS.get(etapa_base(contexto.etapa) if contexto.etapa else agent.name, REGRAS_DUPLICATAS.get("*"))
+        limiar = calcular_limiar(regra, agent.name, latencias_agentes, MIN_AMOSTRAS_DUPLICATAS)
+        inicio = time.perf_counter()
+        try:
+            if limiar is None:
+                final_response = executar()
+            else:
+                final_response, medicao.registro.duplicata_venceu = executar_com_duplicata(
+                    executar, limiar, orcamento_duplicatas, _executor_duplicatas,
+                    ao_duplicar=lambda: setattr(medicao.registro, "duplicada", True),
+                )
+        except Exception as erro:
+            # Erros que não são do modelo (requisição inválida, chave ausente, cassete ausente, falha do
+            # nosso código) não o afastam da rota
+            if erro_de_modelo(erro):
+                roteador_modelos.registrar_erro(agent.name, agent.model)
+            raise
+        duracao = time.perf_counter() - inicio
+        latencias_agentes.registrar(agent.name, duracao)
+        roteador_modelos.registrar_sucesso(agent.name, agent.model, duracao)
+        limitador_modelos.registrar_sucesso(agent.model)
+        medicao.registrar_saida(final_response)
+
+    # A resposta nova substitui a guardada, mesmo quando o cache foi ignorado na leitura, mas só
+    # se a etapa a aceitar: uma resposta recusada não pode voltar do cache na próxima geração
+    if final_response.strip() and _resposta_aceita(etapa_base(contexto.etapa or ""), final_response):
+        cache_respostas.guardar(chave_cache, final_response)
     return final_response
 
+def _agente(nome: str, contexto: ContextoRequisicao = None, modelo: str = None) -> Agent:
+    """
+    O agente registrado com o nome, no modelo preferido da sua rota neste momento (ou em `modelo`)
+    com o seu limite de saída (MAX_TOKENS_SAIDA) e com os ajustes de geração pedidos no contexto.
+    """
+    modelo = modelo or (roteador_modelos.ordenar(nome) or [MODELOS_AGENTES[nome]])[0]
+    return obter_agente(nome, modelo, CONSTRUTORES_AGENTES[nome], _limites_saida(nome) + _ajustes(contexto))
+
 # --- Definição dos 5 Agentes e suas funções (Com as instruções melhoradas e nomes antigos) ---
 # MANTIVE OS NOMES DAS FUNÇÕES DE AGENTE ORIGINAIS DO SEU CÓDIGO
 # PARA EVITAR QUE VOCÊ TENHA QUE MUDAR OUTRAS PARTES DO CÓDIGO.
 
 # Agente 1: Buscador de Notícias
-def agente_buscador(topico, data_de_hoje): # Nome da função original
-    buscador = Agent(
+def _construir_agente_buscador(modelo, ajustes=()):
+    Agent = _classe_agente()
+
+    return Agent(
         name="agente_buscador", # Nome interno do agente
-        model="gemini-2.0-flash",
+        model=modelo,
+        generate_content_config=_configuracao_geracao(ajustes),
         description="Agente que busca notícias no Google sobre o tópico indicado",
-        tools=[google_search],
+        tools=_ferramentas_busca(),
         instruction="""
         Você é um assistente de pesquisa. A sua tarefa é usar a ferramenta de busca do google (google_search) para recuperar as últimas notícias de lançamentos muito relevantes sobre o tópico abaixo.
         Foque em no máximo 5 lançamentos relevantes, com base na quantidade e entusiasmo das notícias sobre ele.
@@ -64,15 +548,26 @@ def agente_buscador(topico, data_de_hoje): # Nome da função original
         APRESENTE os lançamentos como uma lista numerada, incluindo o nome do lançamento e uma breve descrição do porquê é relevante.
         """
     )
+
+def agente_buscador(topico, data_de_hoje, contexto=None): # Nome da função original
+    buscador = _agente("agente_buscador", contexto)
     entrada_do_agente_buscador = f"Tópico: {topico}\nData de hoje: {data_de_hoje}"
-    lancamentos = call_agent(buscador, entrada_do_agente_buscador)
+    # A busca é compartilhada por tópico normalizado e janela de tempo (ver cache_busca). Só o cache_busca
+    # decide quando ela vale: o cache de respostas, que guarda no disco sem prazo, não é consultado aqui
+    forcar_busca = (contexto is not None and not contexto.usar_cache) or not _backend_usa_cache()
+    lancamentos = cache_busca.obter_ou_buscar(
+        topico, lambda: call_agent(buscador, entrada_do_agente_buscador, contexto, usar_cache=False), forcar=forcar_busca
+    )
     return lancamentos
 
 # Agente 2: Planejador de posts
-def agente_planejador(topico, lancamentos_buscados): # Nome da função original
-    planejador = Agent(
+def _construir_agente_planejador(modelo, ajustes=()):
+    Agent = _classe_agente()
+
+    return Agent(
         name="agente_planejador", # Nome interno do agente
-        model="gemini-2.0-flash",
+        model=modelo,
+        generate_content_config=_configuracao_geracao(ajustes),
         instruction="""
         Você é um planejador de conteúdo jurídico, especialista em redes sociais de um escritório de advocacia luso-brasileiro.
         Com base na lista de lançamentos mais recentes e relevantes buscados, você deve:
@@ -92,17 +587,23 @@ def agente_planejador(topico, lancamentos_buscados): # Nome da função original
         [Descrição detalhada do que deve ser abordado no post, tópicos, argumentos, etc.]
         """,
         description="Agente que planeja posts",
-        tools=[google_search]
+        tools=_ferramentas_busca()
     )
+
+def agente_planejador(topico, lancamentos_buscados, contexto=None): # Nome da função original
+    planejador = _agente("agente_planejador", contexto)
     entrada_do_agente_planejador = f"Tópico:{topico}\nLançamentos buscados: {lancamentos_buscados}"
-    plano_do_post = call_agent(planejador, entrada_do_agente_planejador)
+    plano_do_post = call_agent(planejador, entrada_do_agente_planejador, contexto)
     return plano_do_post
 
 # NOVO AGENTE AQUI: Agente Criador de Reels Completo
-def agente_reels_completo(topico, plano_de_post):
-    reels_gerador = Agent(
+def _construir_agente_reels_completo(modelo, ajustes=()):
+    Agent = _classe_agente()
+
+    return Agent(
         name="agente_reels_completo",
-        model="gemini-2.0-flash", # Mantenha o modelo que você está usando
+        model=modelo,
+        generate_content_config=_configuracao_geracao(ajustes),
         instruction="""
         Você é um agente especialista na criação de Reels para um escritório de advocacia luso-brasileiro (CK Sasso).
         Seu objetivo é criar, a partir do tópico jurídico e do plano de post fornecidos, um **roteiro completo de vídeo no estilo Reels**, pronto para ser editado no Canva, CapCut ou InShot.
@@ -170,15 +671,21 @@ def agente_reels_completo(topico, plano_de_post):
         """,
         description="Agente que cria roteiros completos, legendas e sugestões visuais/musicais para Reels de Instagram."
     )
+
+def agente_reels_completo(topico, plano_de_post, contexto=None):
+    reels_gerador = _agente("agente_reels_completo", contexto)
     entrada_do_agente_reels = f"Tópico: {topico}\nPlano de post: {plano_de_post}\n\nCrie um Reels completo com base no exemplo fornecido:"
-    reels_completo = call_agent(reels_gerador, entrada_do_agente_reels)
+    reels_completo = call_agent(reels_gerador, entrada_do_agente_reels, contexto)
     return reels_completo
 
 # Agente 3: Redator do Post
-def agente_redator(topico, plano_de_post): # Nome da função original
-    redator = Agent(
+def _construir_agente_redator(modelo, ajustes=()):
+    Agent = _classe_agente()
+
+    return Agent(
         name="agente_redator", # Nome interno do agente
-        model="gemini-2.0-flash",
+        model=modelo,
+        generate_content_config=_configuracao_geracao(ajustes),
         instruction="""
         Você é um Redator Criativo especializado em criar posts virais para redes sociais de um escritório de advocacia luso-brasileiro.
         Você escreve posts para o escritório CK Sasso, um escritório de advocacia luso-brasileiro.
@@ -196,15 +703,21 @@ def agente_redator(topico, plano_de_post): # Nome da função original
         """,
         description="Agente redator de posts engajadores para Instagram"
     )
+
+def agente_redator(topico, plano_de_post, contexto=None): # Nome da função original
+    redator = _agente("agente_redator", contexto)
     entrada_do_agente_redator = f"Tópico: {topico}\nPlano de post: {plano_de_post}"
-    rascunho = call_agent(redator, entrada_do_agente_redator)
+    rascunho = call_agent(redator, entrada_do_agente_redator, contexto)
     return rascunho
 
 # Agente 4: Revisor de Qualidade
-def agente_revisor(topico, rascunho_gerado): # Nome da função original
-    revisor = Agent(
+def _construir_agente_revisor(modelo, ajustes=()):
+    Agent = _classe_agente()
+
+    return Agent(
         name="agente_revisor", # Nome interno do agente
-        model="gemini-2.0-flash",
+        model=modelo,
+        generate_content_config=_configuracao_geracao(ajustes),
         instruction="""
     	Você é um Editor e Revisor de Conteúdo meticuloso, especializado em posts para redes sociais de um escritório de advocacia luso-brasileiro, com foco no Instagram.
     	Use um tom de escrita adequado para um escritório de advocacia, mas também simples para que seja compreendido por uma pessoa leiga. Seja empático, simpático, bem disposto e educado.
@@ -233,17 +746,39 @@ def agente_revisor(topico, rascunho_gerado): # Nome da função original
     
         description="Agente revisor de post para redes sociais."
     )
+
+def agente_revisor(topico, rascunho_gerado, contexto=None): # Nome da função original
+    """
+    `rascunho_gerado` é o resultados['rascunho_de_post'] original, sem compactação (ver ETAPAS_SEM_COMPACTACAO):
+    é esse texto que a verificação confere e que é publicado como está quando o revisor é dispensado.
+    """
+    contexto = contexto or ContextoRequisicao()
+    violacoes = verificar_rascunho(rascunho_gerado)
+    # Rascunho conforme dispensa o revisor, exceto quando o usuário pediu uma versão nova (sem cache)
+    if not violacoes and PULAR_REVISOR_CONFORME and contexto.usar_cache and not contexto.correcao_formato:
+        auditoria_conformidade.registrar(contexto.request_id, contexto.etapa or 'post_final', violacoes, "revisor dispensado")
+        return (f"{rascunho_gerado.strip()}\n\n{MARCADOR_REVISAO} "
+                "(Detalhes da revisão: Sem alterações; aprovado na verificação automática de conformidade)")
+    auditoria_conformidade.registrar(contexto.request_id, contexto.etapa or 'post_final', violacoes, "enviado ao revisor")
+    revisor = _agente("agente_revisor", contexto)
     entrada_do_agente_revisor = f"Tópico: {topico}\nRascunho: {rascunho_gerado}"
-    texto_revisado = call_agent(revisor, entrada_do_agente_revisor)
+    if violacoes:
+        # O revisor recebe exatamente o que a verificação automática encontrou
+        entrada_do_agente_revisor += ("\n\nProblemas encontrados no rascunho (corrija todos): "
+                                      f"{descrever_violacoes(violacoes)}.")
+    texto_revisado = call_agent(revisor, entrada_do_agente_revisor, contexto)
     return texto_revisado
 
 # ... (código da função agente_revisor termina aqui) ...
 
 # NOVO AGENTE AQUI: Agente de Legendas
-def agente_legenda(topico, post_final_revisado):
-    criador_legenda = Agent(
+def _construir_agente_legenda(modelo, ajustes=()):
+    Agent = _classe_agente()
+
+    return Agent(
         name="agente_legenda", # Nome interno do agente
-        model="gemini-2.0-flash", # Usando o modelo que você preferiu
+        model=modelo,
+        generate_content_config=_configuracao_geracao(ajustes),
         instruction="""
         Você é um Criador de Legendas MASTER para posts de redes sociais de um escritório de advocacia luso-brasileiro (CK Sasso), com foco no Instagram.
         Sua função é gerar uma **legenda completa e robusta**, mas também CURIOSA, ATRAENTE e OTIMIZADA para o Instagram, que sirva quase como um mini-post, com base no tópico e no post final revisado que você receberá.
@@ -269,20 +804,26 @@ def agente_legenda(topico, post_final_revisado):
         **EXEMPLO DE OUTPUT ESPERADO (APENAS A LEGENDA COMPLETA):**
         Muitos bisnetos de portugueses sonham com a cidadania europeia. Embora não haja um caminho direto, a nacionalidade pode ser alcançada através de um processo em "cascata": primeiro, o neto(a) do cidadão português original obtém a nacionalidade, e então, transmite esse direito ao filho(a) (o bisneto). É um processo que exige paciência, organização documental e estratégia.
 
-        #NacionalidadePortuguesaParaBisnetos #BisnetoDePortugues #CidadaniaEmCascata #AdvogadoNacionalidadePortuguesa #PlanejamentoMigratorio #DireitoDeSangue #PortugalBrasil
+        #NacionalidadePortuguesaParaBisnetos #BisnetoDePortugues #CidadaniaEmCascata #AdvogadoNacionalidadePortuguesa #PlanejamentoMigratorio #DireitoDeSangue
         Este post tem caráter informativo e não substitui uma consulta jurídica especializada.
         """,
         description="Agente que gera legendas para posts de Instagram."
     )
+
+def agente_legenda(topico, post_final_revisado, contexto=None):
+    criador_legenda = _agente("agente_legenda", contexto)
     entrada_do_agente_legenda = f"Tópico: {topico}\nPost final revisado: {post_final_revisado}\n\nLegenda:" #Adiciona um "Legenda:" para guiar
-    legenda_gerada = call_agent(criador_legenda, entrada_do_agente_legenda)
+    legenda_gerada = call_agent(criador_legenda, entrada_do_agente_legenda, contexto)
     return legenda_gerada
 
 # Agente 5: Criador de Imagem
-def agente_imagem(topico, texto_revisado): # Nome da função original
-    criador = Agent(
+def _construir_agente_imagem(modelo, ajustes=()):
+    Agent = _classe_agente()
+
+    return Agent(
         name="agente_imagem", # Nome interno do agente
-        model="gemini-2.5-flash-preview-05-20", # Mantenha o modelo mais recente para imagem
+        model=modelo,
+        generate_content_config=_configuracao_geracao(ajustes),
         instruction="""
         Você é um Criador de Imagem, especializado em posts para redes sociais de um escritório de advocacia luso-brasileiro, com foco no Instagram.
         Veja o texto do post de Instagram criado sobre o tópico indicado e **crie APENAS a descrição detalhada e criativa (um prompt) para uma IA de geração de imagem.**
@@ -296,48 +837,287 @@ def agente_imagem(topico, texto_revisado): # Nome da função original
         """,
         description="Agente criador de imagem de post para redes sociais."
     )
+
+def agente_imagem(topico, texto_revisado, contexto=None): # Nome da função original
+    criador = _agente("agente_imagem", contexto)
     entrada_do_agente_imagem = f"Tópico: {topico}\nTexto Revisado: {texto_revisado}"
-    imagem_gerada = call_agent(criador, entrada_do_agente_imagem)
+    imagem_gerada = call_agent(criador, entrada_do_agente_imagem, contexto)
     return imagem_gerada
 
-# --- Função Principal que Orquestra os Agentes (NOVIDADE AQUI!) ---
-def gerar_post_completo(topico_input: str) -> dict:
+# Construtor de cada agente, usado para montá-lo com o modelo definido em MODELOS_AGENTES
+CONSTRUTORES_AGENTES = {
+    "agente_buscador": _construir_agente_buscador,
+    "agente_planejador": _construir_agente_planejador,
+    "agente_reels_completo": _construir_agente_reels_completo,
+    "agente_redator": _construir_agente_redator,
+    "agente_revisor": _construir_agente_revisor,
+    "agente_legenda": _construir_agente_legenda,
+    "agente_imagem": _construir_agente_imagem,
+}
+
+def preparar_agentes():
+    """
+    Importa o ADK e constrói todos os agentes e seus Runners de uma vez. Opcional: serve
+    para aquecer o processo (ex.: em segundo plano ao abrir o app) e tirar esse custo
+    da primeira geração de post. Com um backend que não usa o ADK, só monta as descrições.
+    """
+    for nome in CONSTRUTORES_AGENTES:
+        agente = _agente(nome)
+        if _backend_usa_adk():
+            obter_runner(agente)
+
+# --- Orquestração das Etapas ---
+# Cada etapa declara a função do agente e as chaves das entradas de que depende.
+# Etapas cujas dependências já estão prontas rodam ao mesmo tempo: reels e redator
+# só precisam do plano, e legenda e imagem só precisam do post final.
+ETAPAS_DO_PIPELINE = {
+    'lancamentos_buscados': (agente_buscador, ('data_de_hoje',)),
+    'plano_de_post': (agente_planejador, ('lancamentos_buscados',)),
+    'reels_conteudo_completo': (agente_reels_completo, ('plano_de_post',)),
+    'rascunho_de_post': (agente_redator, ('plano_de_post',)),
+    'post_final': (agente_revisor, ('rascunho_de_post',)),
+    'legenda_post': (agente_legenda, ('post_final',)),
+    'imagem_gerada_prompt': (agente_imagem, ('post_final',)),
+}
+
+# Nas variantes de um post, as chaves das etapas repetidas levam o número da variante: "post_final__v2"
+SEPARADOR_VARIANTE = "__v"
+
+def etapa_base(chave: str) -> str:
+    """A etapa do pipeline a que a chave se refere ('post_final__v2' -> 'post_final')."""
+    return chave.split(SEPARADOR_VARIANTE)[0]
+
+def _preparar_argumentos(etapa: str, dependencias: tuple, argumentos: list, medicao) -> list:
+    """Compacta as respostas de outras etapas que a etapa recebe, registrando os tokens antes e depois."""
+    respostas = [indice for indice, dependencia in enumerate(dependencias) if dependencia in ETAPAS_DO_PIPELINE]
+    if not COMPACTAR_ENTRADAS or not respostas or etapa in ETAPAS_SEM_COMPACTACAO:
+        return argumentos
+    argumentos = list(argumentos)
+    orcamento = ORCAMENTOS_ETAPAS.get(etapa)
+    for indice in respostas:
+        argumentos[indice], antes, depois = preparar_entrada(
+            argumentos[indice], orcamento // len(respostas) if orcamento else None)
+        medicao.registro.tokens_entrada_antes += antes
+        medicao.registro.tokens_entrada_depois += depois
+    return argumentos
+
+def _executar_etapa(medicao, funcao, topico, argumentos, contexto, dependencias=()):
+    """
+    Roda uma etapa no pool, registrando seu tempo de espera na fila e sua duração.
+    As respostas de outras etapas recebidas em `argumentos` são compactadas antes (ver orcamento.py).
+    Se a etapa tem formato verificável (saidas.INTERPRETADORES) e a resposta não o segue, ou
+    se a resposta viola as regras de conformidade (conformidade.VERIFICADORES), só esta etapa
+    é refeita, com o motivo da recusa, até MAX_TENTATIVAS_FORMATO vezes.
+    Se o problema continuar, a última resposta é mantida.
+    """
+    etapa = etapa_base(contexto.etapa)
+    contexto_tentativa = contexto
+    with medicao:
+        argumentos = _preparar_argumentos(etapa, dependencias, argumentos, medicao)
+        for numero_tentativa in range(1, MAX_TENTATIVAS_FORMATO + 1):
+            resposta = funcao(topico, *argumentos, contexto=contexto_tentativa)
+            motivo = _motivo_recusa(etapa, resposta, contexto, ultima=numero_tentativa == MAX_TENTATIVAS_FORMATO)
+            if motivo is None or numero_tentativa == MAX_TENTATIVAS_FORMATO:
+                break
+            medicao.registro.refeita_por_formato += 1
+            contexto_tentativa = replace(contexto, correcao_formato=motivo)
+        return resposta
+
+def _resposta_aceita(etapa: str, resposta: str) -> bool:
+    """Se a resposta passa no formato e na conformidade da etapa (sem registrar auditoria)."""
+    interpretar = INTERPRETADORES.get(etapa)
+    if interpretar is not None:
+        try:
+            interpretar(resposta)
+        except ErroFormato:
+            return False
+    verificar = VERIFICADORES.get(etapa)
+    return verificar is None or not verificar(resposta)
+
+def _motivo_recusa(etapa: str, resposta: str, contexto: ContextoRequisicao, ultima: bool) -> str:
+    """
+    Por que a resposta da etapa deve ser refeita (formato e/ou conformidade), ou None se ela está boa.
+    A conformidade é conferida (e auditada) mesmo quando o formato já falhou, porque na última
+    tentativa a resposta é mantida como veio.
+    """
+    motivos = []
+    interpretar = INTERPRETADORES.get(etapa)
+    if interpretar is not None:
+        try:
+            interpretar(resposta)
+        except ErroFormato as erro:
+            motivos.append(str(erro))
+    verificar = VERIFICADORES.get(etapa)
+    if verificar is not None:
+        violacoes = verificar(resposta)
+        acao = "aprovada" if not violacoes else "mantida com violações" if ultima else "refeita"
+        auditoria_conformidade.registrar(contexto.request_id, contexto.etapa, violacoes, acao)
+        if violacoes:
+            motivos.append(descrever_violacoes(violacoes))
+    return "; além disso, ".join(motivos) or None
+
+def executar_etapas(topico: str, entradas: dict, etapas: dict = ETAPAS_DO_PIPELINE, ao_concluir_etapa=None,
+                    contexto: ContextoRequisicao = None) -> dict:
+    """
+    Executa as etapas respeitando as dependências entre elas, em paralelo sempre que possível,
+    no pool de threads compartilhado do processo (limitado a MAX_CONCORRENCIA chamadas).
+    `entradas` traz os valores já disponíveis (ex.: 'data_de_hoje'); etapas que já constam
+    nas entradas não são executadas de novo.
+    Retorna um dicionário com o resultado de cada etapa, na ordem em que foram declaradas.
+    """
+    contexto = contexto or ContextoRequisicao()
+    valores = dict(entradas)
+    pendentes = [chave for chave in etapas if chave not in valores]
+    em_andamento = {}
+
+    try:
+        while pendentes or em_andamento:
+            # Dispara todas as etapas cujas dependências já foram resolvidas
+            for chave in list(pendentes):
+                funcao, dependencias = etapas[chave]
+                if all(dependencia in valores for dependencia in dependencias):
+                    pendentes.remove(chave)
+                    argumentos = [valores[dependencia] for dependencia in dependencias]
+                    contexto_etapa = replace(contexto, etapa=chave)
+                    medicao = coletor_metricas.medir_etapa(contexto.request_id, chave)
+                    futuro = _executor_agentes.submit(_executar_etapa, medicao, funcao, topico, argumentos, contexto_etapa,
+                                                      tuple(etapa_base(dependencia) for dependencia in dependencias))
+                    em_andamento[futuro] = chave
+
+            if not em_andamento:
+                raise ValueError(f"Dependências não satisfeitas para as etapas: {', '.join(pendentes)}")
+
+            concluidas, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in concluidas:
+                chave = em_andamento.pop(futuro)
+                valores[chave] = futuro.result()
+                if ao_concluir_etapa is not None:
+                    ao_concluir_etapa(chave, valores[chave])
+    finally:
+        # Se alguma etapa falhou, as que ainda não começaram não precisam mais rodar
+        for futuro in em_andamento:
+            futuro.cancel()
+
+    return {chave: valores[chave] for chave in etapas if chave in valores}
+
+def _contexto_com_callbacks(contexto: ContextoRequisicao, ao_atualizar_etapa):
+    """
+    Liga `ao_atualizar_etapa(chave, texto, concluida)` ao streaming de call_agent (parciais)
+    e ao fim de cada etapa. Retorna o contexto ajustado e o callback de etapa concluída.
+    """
+    if ao_atualizar_etapa is None:
+        return contexto, None
+    contexto = replace(contexto, ao_receber_parcial=lambda chave, texto: ao_atualizar_etapa(chave, texto, False))
+    return contexto, lambda chave, texto: ao_atualizar_etapa(chave, texto, True)
+
+# --- Função Principal que Orquestra os Agentes ---
+def gerar_post_completo(topico_input: str, contexto: ContextoRequisicao = None, ao_atualizar_etapa=None) -> dict:
     """
-    Orquestra a chamada dos 5 agentes para gerar um post de marketing jurídico completo.
+    Orquestra a chamada dos agentes para gerar um post de marketing jurídico completo.
+    As etapas independentes (reels e redator; legenda e imagem) rodam em paralelo.
+    `contexto` identifica o usuário e a requisição; se omitido, um novo é criado.
+    Se `ao_atualizar_etapa(chave, texto, concluida)` for informado, as respostas dos agentes são
+    transmitidas em partes (concluida=False) e cada etapa é avisada ao terminar (concluida=True).
     Retorna um dicionário com os resultados de cada etapa.
     """
-    data_de_hoje = date.today().strftime("%d/%m/%Y")
-    resultados = {}
+    if not topico_input:
+        return {"erro": "Você esqueceu de digitar o tópico."}
 
-    # 1. Agente Buscador
-    if topico_input:
-        lancamentos_buscados = agente_buscador(topico_input, data_de_hoje)
-        resultados['lancamentos_buscados'] = lancamentos_buscados
+    contexto, ao_concluir_etapa = _contexto_com_callbacks(contexto or ContextoRequisicao(), ao_atualizar_etapa)
+    data_de_hoje = date.today().strftime("%d/%m/%Y")
+    return executar_etapas(topico_input, {'data_de_hoje': data_de_hoje}, contexto=contexto, ao_concluir_etapa=ao_concluir_etapa)
 
-        # 2. Agente Planejador
-        plano_de_post = agente_planejador(topico_input, lancamentos_buscados)
-        resultados['plano_de_post'] = plano_de_post
+# --- Regeneração de Etapas ---
+def etapas_dependentes(etapa: str, etapas: dict = ETAPAS_DO_PIPELINE) -> list:
+    """A etapa e todas as que dependem dela, direta ou indiretamente, na ordem do pipeline."""
+    if etapa not in etapas:
+        raise ValueError(f"Etapa desconhecida: {etapa}")
+    invalidadas = {etapa}
+    # As etapas estão declaradas em ordem topológica, então uma passada basta
+    for chave, (_, dependencias) in etapas.items():
+        if any(dependencia in invalidadas for dependencia in dependencias):
+            invalidadas.add(chave)
+    return [chave for chave in etapas if chave in invalidadas]
 
-        # NOVO PASSO: Chamar Agente Criador de Reels COMPLETO
-        reels_conteudo_completo = agente_reels_completo(topico_input, plano_de_post)
-        resultados['reels_conteudo_completo'] = reels_conteudo_completo # Armazena todo o output do Reels
+def regenerar_etapa(topico_input: str, resultados: dict, etapa: str, contexto: ContextoRequisicao = None,
+                    ao_atualizar_etapa=None) -> dict:
+    """
+    Refaz apenas `etapa` e as etapas que dependem dela, reaproveitando os demais `resultados`.
+    Ex.: regenerar 'post_final' refaz também 'legenda_post' e 'imagem_gerada_prompt', mas não a
+    busca nem o planejamento. A etapa pedida ignora o cache, para vir uma versão nova.
+    Retorna um novo dicionário de resultados completo.
+    """
+    if not topico_input:
+        return {"erro": "Você esqueceu de digitar o tópico."}
 
-        # 3. Agente Redator
-        rascunho_de_post = agente_redator(topico_input, plano_de_post)
-        resultados['rascunho_de_post'] = rascunho_de_post
+    invalidadas = etapas_dependentes(etapa)
+    contexto = replace(contexto or ContextoRequisicao(), usar_cache=False)
+    contexto, ao_concluir_etapa = _contexto_com_callbacks(contexto, ao_atualizar_etapa)
+    entradas = {chave: texto for chave, texto in resultados.items() if chave in ETAPAS_DO_PIPELINE and chave not in invalidadas}
+    entradas['data_de_hoje'] = date.today().strftime("%d/%m/%Y")
+    return executar_etapas(topico_input, entradas, contexto=contexto, ao_concluir_etapa=ao_concluir_etapa)
 
-        # 4. Agente Revisor
-        post_final = agente_revisor(topico_input, rascunho_de_post)
-        resultados['post_final'] = post_final
+# --- Variantes de um Post ---
+# Para ter várias versões do mesmo tema, a busca, o plano e o reels rodam uma vez e só o ramo
+# redator -> revisor -> legenda/imagem se repete, em paralelo, para cada variante. Com 4 variantes
+# são 3 + 4x4 chamadas em vez de 4x7, no tempo de mais ou menos uma geração.
+ETAPAS_DAS_VARIANTES = ('rascunho_de_post', 'post_final', 'legenda_post', 'imagem_gerada_prompt')
 
-        # NOVO PASSO: Chamar o Agente de Legendas
-        legenda_post = agente_legenda(topico_input, post_final) # Chama a nova função
-        resultados['legenda_post'] = legenda_post # Adiciona a legenda aos resultados
+def _na_variante(funcao, ajustes: dict):
+    """A função da etapa rodando com os ajustes de geração da variante (ex.: {'semente': 2})."""
+    def executar(topico, *argumentos, contexto=None):
+        return funcao(topico, *argumentos, contexto=replace(contexto or ContextoRequisicao(), **ajustes))
+    return executar
 
-        # 5. Agente Criador de Imagem (gera o prompt para a imagem)
-        imagem_gerada_prompt = agente_imagem(topico_input, post_final)
-        resultados['imagem_gerada_prompt'] = imagem_gerada_prompt
+def etapas_com_variantes(ajustes_variantes: list, etapas: dict = ETAPAS_DO_PIPELINE) -> dict:
+    """
+    Pipeline em que as etapas de ETAPAS_DAS_VARIANTES se repetem para cada item de `ajustes_variantes`
+    (com as chaves '<etapa>__v1', '<etapa>__v2', ...) e as demais rodam uma única vez.
+    """
+    novas = {chave: etapa for chave, etapa in etapas.items() if chave not in ETAPAS_DAS_VARIANTES}
+    for numero, ajustes in enumerate(ajustes_variantes, start=1):
+        sufixo = f"{SEPARADOR_VARIANTE}{numero}"
+        for chave in ETAPAS_DAS_VARIANTES:
+            funcao, dependencias = etapas[chave]
+            dependencias = tuple(dependencia + sufixo if dependencia in ETAPAS_DAS_VARIANTES else dependencia
+                                 for dependencia in dependencias)
+            novas[chave + sufixo] = (_na_variante(funcao, ajustes), dependencias)
+    return novas
 
-        return resultados
-    else:
+def gerar_variantes(topico_input: str, quantidade: int = 3, temperaturas: list = None, sementes: list = None,
+                    contexto: ContextoRequisicao = None, ao_atualizar_etapa=None) -> dict:
+    """
+    Gera `quantidade` versões do post sobre o mesmo tema, reaproveitando busca, plano e reels.
+    Cada variante pode ter sua temperatura e/ou semente; sem nenhuma das duas, a variante N usa a semente N,
+    para que as versões sejam diferentes entre si (e não acertem a mesma entrada do cache).
+    Retorna as etapas compartilhadas e, em 'variantes', um dicionário de resultados por variante.
+    """
+    if not topico_input:
         return {"erro": "Você esqueceu de digitar o tópico."}
+    # Repetir os ajustes geraria versões iguais, então cada versão precisa dos seus
+    for nome, lista in (("temperaturas", temperaturas), ("sementes", sementes)):
+        if lista and len(lista) < quantidade:
+            return {"erro": f"Informe {quantidade} {nome}, uma para cada versão (foram informadas {len(lista)})."}
+
+    ajustes_variantes = []
+    for indice in range(quantidade):
+        ajustes = {}
+        if temperaturas:
+            ajustes["temperatura"] = temperaturas[indice]
+        if sementes or not temperaturas:
+            ajustes["semente"] = sementes[indice] if sementes else indice + 1
+        ajustes_variantes.append(ajustes)
+
+    contexto, ao_concluir_etapa = _contexto_com_callbacks(contexto or ContextoRequisicao(), ao_atualizar_etapa)
+    data_de_hoje = date.today().strftime("%d/%m/%Y")
+    valores = executar_etapas(topico_input, {'data_de_hoje': data_de_hoje}, etapas=etapas_com_variantes(ajustes_variantes),
+                              contexto=contexto, ao_concluir_etapa=ao_concluir_etapa)
+    resultados = {chave: texto for chave, texto in valores.items() if SEPARADOR_VARIANTE not in chave}
+    resultados['variantes'] = [
+        {chave: valores[f"{chave}{SEPARADOR_VARIANTE}{numero}"] for chave in ETAPAS_DAS_VARIANTES}
+        for numero in range(1, quantidade + 1)
+    ]
+    return resultados
+
+# Tempo gasto importando este módulo (exibido no app para acompanhar a inicialização)
+TEMPO_IMPORTACAO_S = time.perf_counter() - _inicio_importacao
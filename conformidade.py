@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+from saidas import DISCLAIMER_LEGENDA, HASHTAGS_LEGENDA, extrair_hashtags
+
+# --- Verificação Local de Conformidade ---
+# As regras de publicidade da OAB que as instruções dos agentes repetem são, em boa parte,
+# literais: expressões de captação proibidas, número de hashtags e o disclaimer da legenda.
+# Estas funções conferem essas regras localmente, sem chamar o modelo: o texto é normalizado
+# (sem acentos, minúsculo, sem Markdown) e todas as expressões são procuradas de uma só vez
+# por uma única expressão regular. O orquestrador usa o resultado para dispensar o revisor
+# quando o rascunho já está conforme, para dizer ao revisor o que corrigir quando não está,
+# e para refazer a legenda que saiu com violações. Cada verificação fica registrada na auditoria.
+
+# Expressões proibidas (já normalizadas), agrupadas pela regra que violam
+EXPRESSOES_PROIBIDAS = {
+    "chamada direta para ação": (
+        "agende uma consulta", "agende sua consulta", "agende ja", "agendar uma consulta", "marque uma consulta",
+        "marque sua consulta", "entre em contato", "entre em contacto", "ligue agora", "ligue ja", "ligue para",
+        "fale conosco", "fale com a gente", "chame no whatsapp", "chame no direct", "mande uma mensagem",
+        "envie uma mensagem", "clique no link", "contrate",
+    ),
+    "oferta de serviço ou vantagem": (
+        "consulta gratis", "consulta gratuita", "orcamento gratis", "preco acessivel", "precos acessiveis",
+        "honorarios baixos",
+    ),
+    "promessa de resultado": (
+        "garantimos", "resultado garantido", "sucesso garantido", "100% de sucesso", "causa ganha",
+    ),
+}
+
+# Número de hashtags pedido em cada etapa (o revisor mantém as do rascunho)
+HASHTAGS_RASCUNHO = (2, 4)
+
+@dataclass(slots=True)
+class Violacao:
+    regra: str
+    detalhe: str
+
+@dataclass
+class RegistroConformidade:
+    request_id: str
+    etapa: str
+    acao: str # O que o orquestrador fez com o resultado (ex.: "revisor dispensado", "refeita")
+    violacoes: list = field(default_factory=list)
+    momento: float = field(default_factory=time.time)
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos, sem marcadores de Markdown e com espaços simples."""
+    sem_acentos = "".join(letra for letra in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(letra))
+    return re.sub(r"\s+", " ", re.sub(r"[*_`]", "", sem_acentos).casefold()).strip()
+
+# Todas as expressões numa única busca; o grupo nomeado diz a regra de cada ocorrência
+_GRUPOS = {f"r{indice}": regra for indice, regra in enumerate(EXPRESSOES_PROIBIDAS)}
+_PADRAO_PROIBIDAS = re.compile("|".join(
+    rf"(?P<{grupo}>\b(?:{'|'.join(re.escape(expressao) for expressao in EXPRESSOES_PROIBIDAS[regra])})(?!\w))"
+    for grupo, regra in _GRUPOS.items()
+))
+
+def procurar_expressoes_proibidas(texto: str) -> list:
+    violacoes = []
+    vistas = set()
+    for ocorrencia in _PADRAO_PROIBIDAS.finditer(normalizar(texto)):
+        expressao = ocorrencia.group()
+        if expressao not in vistas:
+            vistas.add(expressao)
+            violacoes.append(Violacao(_GRUPOS[ocorrencia.lastgroup], f"usa a expressão proibida '{expressao}'"))
+    return violacoes
+
+def _verificar_hashtags(texto: str, minimo: int, maximo: int) -> list:
+    quantidade = len(extrair_hashtags(texto))
+    if minimo <= quantidade <= maximo:
+        return []
+    return [Violacao("número de hashtags", f"tem {quantidade} hashtags (o permitido é entre {minimo} e {maximo})")]
+
+def verificar_rascunho(texto: str) -> list:
+    """Violações do rascunho do redator (expressões proibidas e número de hashtags)."""
+    return procurar_expressoes_proibidas(texto) + _verificar_hashtags(texto, *HASHTAGS_RASCUNHO)
+
+def verificar_post(texto: str) -> list:
+    """Violações do post revisado (expressões proibidas)."""
+    return procurar_expressoes_proibidas(texto)
+
+def verificar_legenda(texto: str) -> list:
+    """Violações da legenda: expressões proibidas, número de hashtags e disclaimer obrigatório."""
+    violacoes = procurar_expressoes_proibidas(texto) + _verificar_hashtags(texto, *HASHTAGS_LEGENDA)
+    if normalizar(DISCLAIMER_LEGENDA) not in normalizar(texto):
+        violacoes.append(Violacao("disclaimer obrigatório", f"não traz a frase '{DISCLAIMER_LEGENDA}'"))
+    return violacoes
+
+def descrever_violacoes(violacoes: list) -> str:
+    """Texto curto com as violações, para repassar ao agente que vai corrigi-las."""
+    return "; ".join(f"{violacao.detalhe} ({violacao.regra})" for violacao in violacoes)
+
+# Etapas cuja saída vai para publicação e é conferida antes de ser aceita
+VERIFICADORES = {
+    'post_final': verificar_post,
+    'legenda_post': verificar_legenda,
+}
+
+# --- Auditoria ---
+class AuditoriaConformidade:
+    def __init__(self, max_registros: int = 2000, arquivo_jsonl: str = None):
+        """
+        Guarda até `max_registros` verificações em memória (as mais antigas são descartadas).
+        Se `arquivo_jsonl` for informado, cada verificação também é acrescentada a esse arquivo.
+        """
+        self._registros = deque(maxlen=max_registros)
+        self._trava = threading.Lock()
+        self.arquivo_jsonl = arquivo_jsonl
+
+    def registrar(self, request_id: str, etapa: str, violacoes: list, acao: str) -> RegistroConformidade:
+        registro = RegistroConformidade(request_id=request_id, etapa=etapa, acao=acao, violacoes=list(violacoes))
+        with self._trava:
+            self._registros.append(registro)
+            if self.arquivo_jsonl:
+                with open(self.arquivo_jsonl, "a", encoding="utf-8") as arquivo:
+                    arquivo.write(json.dumps(asdict(registro), ensure_ascii=False) + "\n")
+        return registro
+
+    def registros(self, request_id: str = None) -> list:
+        with self._trava:
+            return [registro for registro in self._registros if request_id is None or registro.request_id == request_id]
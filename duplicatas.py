@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# --- Chamadas Duplicadas (hedging) ---
+# Algumas chamadas ao Gemini demoram muito mais que o normal. Se uma chamada passa de um
+# limiar (em segundos, ou o percentil observado daquele agente, ex.: p95) sem responder,
+# uma cópia dela é disparada e vale a resposta que chegar primeiro. Para não dobrar o uso
+# da cota, as cópias saem de um orçamento global: cada chamada acumula uma fração de
+# crédito e cada cópia gasta um crédito inteiro.
+
+class OrcamentoDuplicatas:
+    def __init__(self, fracao: float = 0.1, reserva_maxima: float = 10.0):
+        """
+        Permite no máximo uma cópia a cada 1/`fracao` chamadas (fracao=0.1: até 10% de chamadas
+        extras). `reserva_maxima` limita o crédito acumulado em períodos sem lentidão.
+        """
+        self.fracao = fracao
+        self.reserva_maxima = reserva_maxima
+        self._credito = 0.0
+        self._trava = threading.Lock()
+        self.duplicatas = 0
+
+    def registrar_chamada(self):
+        with self._trava:
+            self._credito = min(self._credito + self.fracao, self.reserva_maxima)
+
+    def gastar(self) -> bool:
+        """Consome o crédito de uma cópia, se houver."""
+        with self._trava:
+            if self._credito < 1:
+                return False
+            self._credito -= 1
+            self.duplicatas += 1
+            return True
+
+class EstatisticasLatencia:
+    def __init__(self, max_amostras: int = 200):
+        """Guarda as `max_amostras` latências mais recentes de cada agente."""
+        self.max_amostras = max_amostras
+        self._amostras = {}
+        self._trava = threading.Lock()
+
+    def registrar(self, agente: str, duracao_s: float):
+        with self._trava:
+            self._amostras.setdefault(agente, deque(maxlen=self.max_amostras)).append(duracao_s)
+
+    def percentil(self, agente: str, p: float, min_amostras: int = 20):
+        """Percentil `p` das latências do agente, ou None se ainda não há amostras suficientes."""
+        with self._trava:
+            amostras = sorted(self._amostras.get(agente, ()))
+        if len(amostras) < min_amostras:
+            return None
+        return amostras[min(int(len(amostras) * p / 100), len(amostras) - 1)]
+
+def ler_regras(texto: str) -> dict:
+    """
+    Converte 'post_final=p95,lancamentos_buscados=30' em {'post_final': 'p95', 'lancamentos_buscados': 30.0}.
+    A chave '*' vale para as etapas não listadas.
+    """
+    regras = {}
+    for item in (texto or "").split(","):
+        if "=" in item:
+            etapa, valor = (parte.strip() for parte in item.split("=", 1))
+            regras[etapa] = valor.lower() if valor.lower().startswith("p") else float(valor)
+    return regras
+
+def calcular_limiar(regra, agente: str, estatisticas: EstatisticasLatencia, min_amostras: int = 20):
+    """Limiar em segundos para a regra (número ou 'pNN'); None desativa a cópia nesta chamada."""
+    if regra is None:
+        return None
+    if isinstance(regra, str):
+        return estatisticas.percentil(agente, float(regra[1:]), min_amostras)
+    return regra
+
+def executar_com_duplicata(executar, limiar: float, orcamento: OrcamentoDuplicatas, executor, ao_duplicar=None):
+    """
+    Roda `executar(principal=True, cancelado=evento)` no `executor`. Se não terminar em `limiar`
+    segundos e houver orçamento, dispara `executar(principal=False, cancelado=evento)` e fica com o
+    primeiro resultado sem erro; `cancelado` é sinalizado para a outra cópia parar assim que puder.
+    Retorna (resultado, True se a cópia venceu). Se as duas falharem, relança o erro da principal.
+    """
+    cancelado = threading.Event()
+    principal = executor.submit(executar, True, cancelado)
+    futuros = [principal]
+    concluidos, _ = wait(futuros, timeout=limiar)
+    if not concluidos and orcamento.gastar():
+        if ao_duplicar is not None:
+            ao_duplicar()
+        futuros.append(executor.submit(executar, False, cancelado))
+
+    pendentes = set(futuros)
+    while pendentes:
+        concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        for futuro in concluidos:
+            if futuro.exception() is None:
+                cancelado.set()
+                return futuro.result(), futuro is not principal
+    raise principal.exception()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Geração de posts em lote, sem a interface do Streamlit.
+
+Lê vários tópicos de um arquivo CSV (coluna "topico") ou JSONL (campo "topico"),
+roda o pipeline de agentes para vários tópicos ao mesmo tempo e grava cada post
+concluído como uma linha JSON no arquivo de saída.
+
+Cada etapa concluída é salva num checkpoint em disco. Se a execução for interrompida,
+basta rodar o mesmo comando de novo: os tópicos já gravados na saída são pulados e os
+que estavam pela metade continuam de onde pararam, sem repetir chamadas aos agentes.
+
+Uso:
+    python gerar_lote.py temas.csv --saida posts.jsonl --workers 4
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+def ler_topicos(caminho: str) -> list:
+    """
+    Retorna a lista de (id, tópico) do arquivo CSV ou JSONL, ignorando linhas sem tópico e linhas
+    repetidas (mesmo id, ou mesmo tópico sem id), que disputariam o mesmo checkpoint e a mesma saída.
+    """
+    registros = []
+    with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+        if caminho.lower().endswith((".jsonl", ".json")):
+            registros = [json.loads(linha) for linha in arquivo if linha.strip()]
+        else:
+            registros = list(csv.DictReader(arquivo))
+
+    topicos = []
+    ids_vistos = set()
+    for registro in registros:
+        topico = (registro.get("topico") or registro.get("tópico") or "").strip()
+        if not topico:
+            continue
+        # Sem um id explícito, o próprio tópico identifica o post no checkpoint e na saída
+        id_post = str(registro.get("id") or hashlib.sha1(topico.encode("utf-8")).hexdigest()[:12])
+        if id_post in ids_vistos:
+            print(f"Linha repetida ignorada (id {id_post}): {topico}", file=sys.stderr)
+            continue
+        ids_vistos.add(id_post)
+        topicos.append((id_post, topico))
+    return topicos
+
+def ids_ja_gravados(caminho_saida: str) -> set:
+    """Ids dos posts que já estão no arquivo de saída (sem erro), para não gerá-los de novo."""
+    if not os.path.exists(caminho_saida):
+        return set()
+    ids = set()
+    with open(caminho_saida, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            if "erro" not in registro:
+                ids.add(registro["id"])
+    return ids
+
+def ler_checkpoint(caminho: str) -> dict:
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+def salvar_checkpoint(caminho: str, checkpoint: dict):
+    # Grava num arquivo temporário e troca de uma vez, para não corromper o checkpoint se o processo cair
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(checkpoint, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def gerar_post_com_checkpoint(id_post: str, topico: str, pasta_checkpoints: str) -> dict:
+    """Roda o pipeline para um tópico, retomando do checkpoint e salvando cada etapa concluída."""
+    from chatbot_core import ContextoRequisicao, executar_etapas
+
+    caminho = os.path.join(pasta_checkpoints, f"{id_post}.json")
+    checkpoint = ler_checkpoint(caminho) or {
+        "topico": topico,
+        "data_de_hoje": date.today().strftime("%d/%m/%Y"),
+        "resultados": {},
+    }
+    trava = threading.Lock()
+
+    def ao_concluir_etapa(chave, texto):
+        with trava:
+            checkpoint["resultados"][chave] = texto
+            salvar_checkpoint(caminho, checkpoint)
+
+    entradas = {"data_de_hoje": checkpoint["data_de_hoje"], **checkpoint["resultados"]}
+    return executar_etapas(
+        topico,
+        entradas,
+        ao_concluir_etapa=ao_concluir_etapa,
+        contexto=ContextoRequisicao(user_id="lote", request_id=id_post),
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera posts do JuriPost em lote a partir de um CSV ou JSONL de tópicos.")
+    parser.add_argument("entrada", help="Arquivo .csv (coluna 'topico') ou .jsonl (campo 'topico'); 'id' é opcional.")
+    parser.add_argument("--saida", default="posts_gerados.jsonl", help="Arquivo JSONL onde cada post concluído é gravado.")
+    parser.add_argument("--workers", type=int, default=4, help="Quantos tópicos são processados ao mesmo tempo.")
+    parser.add_argument("--checkpoints", default=".checkpoints_juripost", help="Pasta dos checkpoints por etapa.")
+    parser.add_argument("--max-concorrencia", type=int, default=None,
+                        help="Máximo de chamadas de agentes simultâneas (padrão: JURIPOST_MAX_CONCORRENCIA).")
+    parser.add_argument("--metricas-jsonl", default=None, help="Ao final, grava as métricas de cada chamada e etapa neste arquivo JSONL.")
+    parser.add_argument("--metricas-prometheus", default=None, help="Ao final, grava as métricas agregadas neste arquivo (formato Prometheus).")
+    args = parser.parse_args(argv)
+
+    # O pool de agentes é criado ao importar o chatbot_core, então o limite precisa ser definido antes
+    if args.max_concorrencia:
+        os.environ["JURIPOST_MAX_CONCORRENCIA"] = str(args.max_concorrencia)
+
+    topicos = ler_topicos(args.entrada)
+    concluidos = ids_ja_gravados(args.saida)
+    pendentes = [(id_post, topico) for id_post, topico in topicos if id_post not in concluidos]
+    print(f"{len(topicos)} tópicos lidos, {len(topicos) - len(pendentes)} já concluídos, {len(pendentes)} a gerar.", file=sys.stderr)
+    if not pendentes:
+        return 0
+
+    os.makedirs(args.checkpoints, exist_ok=True)
+    falhas = 0
+
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="juripost-lote") as executor, \
+            open(args.saida, "a", encoding="utf-8") as saida:
+        futuros = {
+            executor.submit(gerar_post_com_checkpoint, id_post, topico, args.checkpoints): (id_post, topico)
+            for id_post, topico in pendentes
+        }
+        for numero, futuro in enumerate(as_completed(futuros), start=1):
+            id_post, topico = futuros[futuro]
+            try:
+                registro = {"id": id_post, "topico": topico, "resultados": futuro.result()}
+                situacao = "ok"
+                concluido = True
+            except Exception as erro:
+                # O checkpoint continua na pasta: a próxima execução retoma este tópico
+                registro = {"id": id_post, "topico": topico, "erro": str(erro)}
+                situacao = f"erro: {erro}"
+                concluido = False
+                falhas += 1
+            saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            saida.flush()
+            caminho_checkpoint = os.path.join(args.checkpoints, f"{id_post}.json")
+            if concluido and os.path.exists(caminho_checkpoint):
+                # Com o post gravado na saída, o checkpoint não é mais necessário
+                os.remove(caminho_checkpoint)
+            print(f"[{numero}/{len(pendentes)}] {topico} -> {situacao}", file=sys.stderr)
+
+    from chatbot_core import coletor_metricas
+    if args.metricas_jsonl:
+        coletor_metricas.exportar_jsonl(args.metricas_jsonl)
+    if args.metricas_prometheus:
+        coletor_metricas.exportar_prometheus(args.metricas_prometheus)
+
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
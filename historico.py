@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+
+from cache_respostas import normalizar_topico
+
+# --- Histórico de Gerações e Temas Parecidos ---
+# Cada post concluído fica gravado num banco SQLite local, com busca de texto completo (FTS5)
+# no tópico e no post. Para avisar quando alguém pede de novo um tema que já foi gerado com
+# outras palavras ("nacionalidade portuguesa bisnetos" e "cidadania portuguesa para bisnetos"),
+# o tópico é normalizado (sem acentos, sem palavras vazias, sinônimos unificados, radical das
+# palavras) e resumido numa assinatura MinHash. As assinaturas são divididas em faixas (LSH):
+# só as gerações que coincidem em alguma faixa são comparadas, por consulta ao índice do banco,
+# então a busca continua em poucos milissegundos mesmo com dezenas de milhares de posts.
+
+PALAVRAS_VAZIAS = frozenset("""
+a o as os um uma uns umas de da do das dos d em no na nos nas num numa ao aos e ou que com sem por pelo pela
+pelos pelas para pra pro sobre entre ate apos desde como quando se sua seu suas seus meu minha nosso nossa
+lhe eles elas ele ela isso esse essa este esta mais muito muita tudo todo toda todos todas ja nao sim qual quais
+""".split())
+
+# Palavras tratadas como a mesma no português do Brasil e de Portugal ou no uso jurídico corrente
+SINONIMOS = {
+    "cidadania": "nacionalidade",
+    "lusa": "portuguesa",
+    "luso": "portugues",
+    "lusitana": "portuguesa",
+    "lusitano": "portugues",
+    "aposentadoria": "reforma",
+    "heranca": "sucessao",
+}
+
+NUM_PERMUTACOES = 64
+LINHAS_POR_FAIXA = 4 # 16 faixas de 4 linhas: pares com semelhança a partir de ~0,5 quase sempre viram candidatos
+
+# Plurais irregulares mais comuns: imóveis -> imóvel, ações -> ação
+_PLURAIS = (("oes", "ao"), ("aes", "ao"), ("eis", "el"), ("ais", "al"), ("ois", "ol"))
+
+def _raiz(palavra: str) -> str:
+    """Radical simples: tira plurais e terminações de gênero ('portuguesa', 'portugueses' -> 'portugu')."""
+    for plural, singular in _PLURAIS:
+        if len(palavra) > 5 and palavra.endswith(plural):
+            palavra = palavra[:-len(plural)] + singular
+            break
+    while len(palavra) > 4 and palavra[-1] in "saeo":
+        palavra = palavra[:-1]
+    return palavra
+
+def termos_do_topico(topico: str) -> list:
+    """Radicais das palavras relevantes do tópico, já com os sinônimos unificados."""
+    return [_raiz(SINONIMOS.get(palavra, palavra)) for palavra in normalizar_topico(topico).split()
+            if palavra not in PALAVRAS_VAZIAS]
+
+def fragmentos(topico: str) -> set:
+    """Trigramas de caracteres de cada termo (tolera variações de grafia) mais os termos inteiros."""
+    resultado = set()
+    for termo in termos_do_topico(topico):
+        resultado.add(termo)
+        marcado = f" {termo} "
+        resultado.update(marcado[indice:indice + 3] for indice in range(len(marcado) - 2))
+    return resultado
+
+def _hashes(fragmento: str) -> array:
+    """NUM_PERMUTACOES hashes independentes de 32 bits do fragmento, numa única chamada ao SHAKE-128."""
+    return array("I", hashlib.shake_128(fragmento.encode("utf-8")).digest(4 * NUM_PERMUTACOES))
+
+def assinatura_minhash(topico: str) -> array:
+    """Para cada uma das funções de hash, o menor valor entre os fragmentos do tópico."""
+    return array("I", map(min, zip(*map(_hashes, fragmentos(topico) or {""}))))
+
+def semelhanca(assinatura_a: array, assinatura_b: array) -> float:
+    """Estimativa da semelhança de Jaccard entre os dois tópicos."""
+    return sum(1 for a, b in zip(assinatura_a, assinatura_b) if a == b) / NUM_PERMUTACOES
+
+def chaves_das_faixas(assinatura: array) -> list:
+    """Uma chave inteira (64 bits com sinal, como o SQLite guarda) para cada faixa da assinatura."""
+    chaves = []
+    for faixa, inicio in enumerate(range(0, NUM_PERMUTACOES, LINHAS_POR_FAIXA)):
+        trecho = bytes([faixa]) + assinatura[inicio:inicio + LINHAS_POR_FAIXA].tobytes()
+        chaves.append(int.from_bytes(hashlib.blake2b(trecho, digest_size=8).digest(), "big", signed=True))
+    return chaves
+
+@dataclass(slots=True)
+class GeracaoParecida:
+    id: str
+    topico: str
+    criada_em: float
+    semelhanca: float
+
+class HistoricoGeracoes:
+    def __init__(self, caminho: str = ".historico_juripost.db", semelhanca_minima: float = 0.6, dias: float = 30):
+        """
+        Guarda as gerações em `caminho` (SQLite). `parecidas` considera as gerações dos últimos `dias`
+        com semelhança estimada de pelo menos `semelhanca_minima` (0 a 1).
+        """
+        self.semelhanca_minima = semelhanca_minima
+        self.dias = dias
+        self._trava = threading.Lock()
+        # Uma conexão compartilhada pelas threads do processo, sempre usada sob a trava
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        with self._conexao:
+            # WAL permite ler enquanto outra thread ou processo grava; com ele, synchronous=NORMAL não arrisca o banco
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._conexao.executescript("""
+                CREATE TABLE IF NOT EXISTS geracoes (
+                    id TEXT PRIMARY KEY, topico TEXT NOT NULL, user_id TEXT, criada_em REAL NOT NULL,
+                    assinatura BLOB NOT NULL, resultados TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS geracoes_criada_em ON geracoes (criada_em);
+                CREATE TABLE IF NOT EXISTS faixas (chave INTEGER NOT NULL, id TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS faixas_chave ON faixas (chave);
+                CREATE INDEX IF NOT EXISTS faixas_id ON faixas (id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS geracoes_fts USING fts5 (
+                    topico, texto, tokenize = 'unicode61 remove_diacritics 2'
+                );
+            """)
+
+    def registrar(self, id_geracao: str, topico: str, resultados: dict, user_id: str = None, criada_em: float = None):
+        """Grava uma geração concluída (substitui a anterior com o mesmo id)."""
+        assinatura = assinatura_minhash(topico)
+        # O texto pesquisável é o post final (de cada variante, se houver) e a legenda
+        partes = [resultados.get("post_final", ""), resultados.get("legenda_post", "")]
+        for variante in resultados.get("variantes", []):
+            partes += [variante.get("post_final", ""), variante.get("legenda_post", "")]
+        with self._trava, self._conexao:
+            anterior = self._conexao.execute("SELECT rowid FROM geracoes WHERE id = ?", (id_geracao,)).fetchone()
+            if anterior:
+                self._conexao.execute("DELETE FROM faixas WHERE id = ?", (id_geracao,))
+                self._conexao.execute("DELETE FROM geracoes_fts WHERE rowid = ?", anterior)
+                self._conexao.execute("DELETE FROM geracoes WHERE rowid = ?", anterior)
+            cursor = self._conexao.execute(
+                "INSERT INTO geracoes VALUES (?, ?, ?, ?, ?, ?)",
+                (id_geracao, topico, user_id, criada_em or time.time(), assinatura.tobytes(),
+                 json.dumps(resultados, ensure_ascii=False)),
+            )
+            self._conexao.executemany("INSERT INTO faixas VALUES (?, ?)",
+                                      [(chave, id_geracao) for chave in chaves_das_faixas(assinatura)])
+            # O texto pesquisável usa o mesmo rowid da geração, para ligar as duas tabelas sem busca
+            self._conexao.execute("INSERT INTO geracoes_fts (rowid, topico, texto) VALUES (?, ?, ?)",
+                                  (cursor.lastrowid, topico, "\n".join(parte for parte in partes if parte)))
+
+    def parecidas(self, topico: str, limite: int = 3) -> list:
+        """Gerações recentes com tema parecido, da mais para a menos parecida."""
+        assinatura = assinatura_minhash(topico)
+        chaves = chaves_das_faixas(assinatura)
+        with self._trava:
+            linhas = self._conexao.execute(
+                f"""SELECT id, topico, criada_em, assinatura FROM geracoes
+                    WHERE id IN (SELECT id FROM faixas WHERE chave IN ({",".join("?" * len(chaves))}))
+                    AND criada_em >= ? ORDER BY criada_em DESC LIMIT 200""",
+                (*chaves, time.time() - self.dias * 86400),
+            ).fetchall()
+        encontradas = []
+        for id_geracao, topico_anterior, criada_em, bruta in linhas:
+            valor = semelhanca(assinatura, array("I", bruta))
+            if valor >= self.semelhanca_minima:
+                encontradas.append(GeracaoParecida(id_geracao, topico_anterior, criada_em, round(valor, 2)))
+        encontradas.sort(key=lambda geracao: (-geracao.semelhanca, -geracao.criada_em))
+        return encontradas[:limite]
+
+    def obter(self, id_geracao: str) -> dict:
+        """Resultados gravados da geração, ou None."""
+        with self._trava:
+            linha = self._conexao.execute("SELECT resultados FROM geracoes WHERE id = ?", (id_geracao,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def buscar(self, consulta: str, limite: int = 10) -> list:
+        """Busca de texto completo no tópico e no post. Retorna [(id, tópico, criada_em, trecho)]."""
+        termos = " ".join(f'"{termo}"' for termo in normalizar_topico(consulta).split())
+        if not termos:
+            return []
+        with self._trava:
+            return self._conexao.execute(
+                """SELECT g.id, g.topico, g.criada_em, snippet(geracoes_fts, 1, '**', '**', '…', 12)
+                   FROM geracoes_fts f JOIN geracoes g ON g.rowid = f.rowid
+                   WHERE geracoes_fts MATCH ? ORDER BY rank LIMIT ?""",
+                (termos, limite),
+            ).fetchall()
+
+    def total(self) -> int:
+        with self._trava:
+            return self._conexao.execute("SELECT COUNT(*) FROM geracoes").fetchone()[0]
+
+def criar_historico():
+    """Histórico configurado por JURIPOST_HISTORICO_DB, JURIPOST_SEMELHANCA_MINIMA e JURIPOST_HISTORICO_DIAS (ou None)."""
+    caminho = os.environ.get("JURIPOST_HISTORICO_DB", ".historico_juripost.db")
+    if not caminho: # Vazio desativa o histórico
+        return None
+    return HistoricoGeracoes(
+        caminho,
+        semelhanca_minima=float(os.environ.get("JURIPOST_SEMELHANCA_MINIMA", "0.6")),
+        dias=float(os.environ.get("JURIPOST_HISTORICO_DIAS", "30")),
+    )
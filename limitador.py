@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+
+# --- Limite de Requisições e Retentativas ---
+# Todas as chamadas de agentes do processo (de todos os usuários) passam por um balde
+# de tokens por modelo, para não estourar a cota do Gemini. Quando a API responde que
+# a cota acabou (429), a taxa daquele modelo é reduzida pela metade e volta a subir
+# aos poucos a cada sucesso. Erros temporários são repetidos com espera exponencial
+# e aleatória (jitter); os demais erros sobem imediatamente.
+
+# Códigos HTTP que indicam erro temporário
+CODIGOS_RETENTAVEIS = {408, 429, 500, 502, 503, 504}
+
+def codigo_do_erro(erro: Exception):
+    """Código HTTP do erro, quando a exceção informa (google.genai usa `code`; outras libs, `status_code`)."""
+    for atributo in ("code", "status_code", "status"):
+        valor = getattr(erro, atributo, None)
+        if isinstance(valor, int):
+            return valor
+    return None
+
+def erro_de_cota(erro: Exception) -> bool:
+    return codigo_do_erro(erro) == 429 or "RESOURCE_EXHAUSTED" in str(erro)
+
+def erro_retentavel(erro: Exception) -> bool:
+    """Só erros temporários (cota, indisponibilidade, rede) valem uma nova tentativa."""
+    if isinstance(erro, (ConnectionError, TimeoutError)):
+        return True
+    if codigo_do_erro(erro) in CODIGOS_RETENTAVEIS:
+        return True
+    mensagem = str(erro)
+    return any(marcador in mensagem for marcador in ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED"))
+
+def erro_de_modelo(erro: Exception) -> bool:
+    """Falhas que outro modelo pode contornar: as temporárias e o modelo inexistente ou desativado (404)."""
+    return erro_retentavel(erro) or codigo_do_erro(erro) == 404
+
+class BaldeDeTokens:
+    def __init__(self, por_minuto: float, capacidade: float = None):
+        """
+        Libera até `por_minuto` chamadas por minuto, com rajadas de até `capacidade` chamadas
+        (padrão: o equivalente a 10 segundos da taxa, no mínimo 1).
+        """
+        self.taxa_base = por_minuto / 60.0
+        self.taxa = self.taxa_base
+        self.capacidade = capacidade if capacidade is not None else max(self.taxa_base * 10, 1.0)
+        self._tokens = self.capacidade
+        self._atualizado_em = time.monotonic()
+        self._trava = threading.Lock()
+
+    def _reabastecer(self):
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado_em) * self.taxa)
+        self._atualizado_em = agora
+
+    def adquirir(self):
+        """Bloqueia até haver um token disponível e o consome."""
+        while True:
+            with self._trava:
+                self._reabastecer()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+    def reduzir(self):
+        """A API recusou por cota: corta a taxa pela metade (até 10% da original)."""
+        with self._trava:
+            self._reabastecer()
+            self.taxa = max(self.taxa / 2, self.taxa_base * 0.1)
+
+    def recuperar(self):
+        """Sucesso: devolve a taxa aos poucos (5% da original por chamada) até o valor configurado."""
+        with self._trava:
+            if self.taxa < self.taxa_base:
+                self._reabastecer()
+                self.taxa = min(self.taxa + self.taxa_base * 0.05, self.taxa_base)
+
+class LimitadorModelos:
+    def __init__(self, limites_por_minuto: dict = None, limite_padrao: float = 60):
+        """`limites_por_minuto` mapeia modelo -> chamadas por minuto; os demais modelos usam `limite_padrao`."""
+        self.limites_por_minuto = dict(limites_por_minuto or {})
+        self.limite_padrao = limite_padrao
+        self._baldes = {}
+        self._trava = threading.Lock()
+
+    def balde(self, modelo: str) -> BaldeDeTokens:
+        with self._trava:
+            if modelo not in self._baldes:
+                self._baldes[modelo] = BaldeDeTokens(self.limites_por_minuto.get(modelo, self.limite_padrao))
+            return self._baldes[modelo]
+
+    def adquirir(self, modelo: str):
+        self.balde(modelo).adquirir()
+
+    def registrar_sucesso(self, modelo: str):
+        self.balde(modelo).recuperar()
+
+    def registrar_erro(self, modelo: str, erro: Exception):
+        if erro_de_cota(erro):
+            self.balde(modelo).reduzir()
+
+def ler_limites(texto: str) -> dict:
+    """Converte 'modelo=15,outro-modelo=10' em {'modelo': 15.0, 'outro-modelo': 10.0}."""
+    limites = {}
+    for item in (texto or "").split(","):
+        if "=" in item:
+            modelo, valor = item.split("=", 1)
+            limites[modelo.strip()] = float(valor)
+    return limites
+
+def executar_com_retentativas(funcao, max_tentativas: int = 4, espera_base: float = 1.0, espera_maxima: float = 30.0,
+                              ao_falhar=None):
+    """
+    Executa `funcao()` e repete em caso de erro retentável, esperando um tempo aleatório entre
+    zero e espera_base * 2^n (limitado a espera_maxima). `ao_falhar(tentativa, erro)` é chamado a
+    cada falha, antes da espera. Erros não retentáveis, ou a última falha, são relançados.
+    """
+    for tentativa in range(1, max_tentativas + 1):
+        try:
+            return funcao()
+        except Exception as erro:
+            if ao_falhar is not None:
+                ao_falhar(tentativa, erro)
+            if tentativa == max_tentativas or not erro_retentavel(erro):
+                raise
+            time.sleep(random.uniform(0, min(espera_maxima, espera_base * 2 ** (tentativa - 1))))
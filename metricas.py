@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+# --- Métricas de Chamadas e Etapas ---
+# Cada chamada de agente (call_agent) e cada etapa do pipeline gera um registro com
+# tempos, tamanhos, tokens e erros. Os registros ficam em memória (com limite) e
+# podem ser exportados em JSON Lines ou no formato de texto do Prometheus.
+
+@dataclass
+class RegistroChamada:
+    request_id: str
+    etapa: str
+    agente: str
+    modelo: str
+    inicio: float # Horário (epoch) em que a chamada começou
+    duracao_s: float = 0.0
+    primeiro_evento_s: float = None # Tempo até o primeiro evento do modelo
+    eventos: int = 0
+    caracteres_entrada: int = 0
+    caracteres_saida: int = 0
+    tokens_entrada: int = 0
+    tokens_saida: int = 0
+    tokens_total: int = 0
+    tentativas: int = 1
+    cache: bool = False
+    duplicada: bool = False # Uma cópia da chamada foi disparada por demora (ver duplicatas.py)
+    duplicata_venceu: bool = False
+    # Por que a leitura da resposta parou antes do fim do fluxo: "fim" (última linha esperada) ou "limite" (de tokens)
+    interrompida: str = None
+    erro: str = None
+    tipo: str = field(default="chamada", init=False)
+
+@dataclass
+class RegistroEtapa:
+    request_id: str
+    etapa: str
+    inicio: float
+    espera_s: float = 0.0 # Tempo na fila do pool antes de começar
+    duracao_s: float = 0.0
+    refeita_por_formato: int = 0 # Vezes que a etapa foi refeita porque a resposta fugiu do formato
+    # Tamanho estimado das respostas de outras etapas recebidas, antes e depois da compactação (ver orcamento.py)
+    tokens_entrada_antes: int = 0
+    tokens_entrada_depois: int = 0
+    erro: str = None
+    tipo: str = field(default="etapa", init=False)
+
+class MedicaoChamada:
+    """Acompanha uma chamada em andamento; usada como `with coletor.medir_chamada(...) as medicao:`."""
+
+    def __init__(self, coletor, registro: RegistroChamada):
+        self._coletor = coletor
+        self.registro = registro
+        self._relogio = None
+
+    def __enter__(self):
+        self._relogio = time.perf_counter()
+        return self
+
+    def registrar_evento(self, event):
+        """Conta o evento e soma os tokens informados pelo modelo (quando houver)."""
+        if self.registro.eventos == 0:
+            self.registro.primeiro_evento_s = time.perf_counter() - self._relogio
+        self.registro.eventos += 1
+        uso = getattr(event, "usage_metadata", None)
+        # Eventos parciais repetem o uso acumulado; só os completos são somados
+        if uso is not None and not getattr(event, "partial", False):
+            self.registro.tokens_entrada += uso.prompt_token_count or 0
+            self.registro.tokens_saida += uso.candidates_token_count or 0
+            self.registro.tokens_total += uso.total_token_count or 0
+
+    def registrar_saida(self, texto: str, cache: bool = False):
+        self.registro.caracteres_saida = len(texto or "")
+        self.registro.cache = cache
+
+    def __exit__(self, tipo_erro, erro, rastreamento):
+        self.registro.duracao_s = time.perf_counter() - self._relogio
+        if erro is not None:
+            self.registro.erro = f"{tipo_erro.__name__}: {erro}"
+        self._coletor.adicionar(self.registro)
+        return False
+
+class MedicaoEtapa:
+    """Mede uma etapa do pipeline; criada no momento em que a etapa entra na fila."""
+
+    def __init__(self, coletor, registro: RegistroEtapa):
+        self._coletor = coletor
+        self.registro = registro
+        self._enfileirada = time.perf_counter()
+        self._relogio = None
+
+    def __enter__(self):
+        self._relogio = time.perf_counter()
+        self.registro.espera_s = self._relogio - self._enfileirada
+        return self
+
+    def __exit__(self, tipo_erro, erro, rastreamento):
+        self.registro.duracao_s = time.perf_counter() - self._relogio
+        if erro is not None:
+            self.registro.erro = f"{tipo_erro.__name__}: {erro}"
+        self._coletor.adicionar(self.registro)
+        return False
+
+class ColetorMetricas:
+    def __init__(self, max_registros: int = 10000, arquivo_jsonl: str = None):
+        """
+        Guarda até `max_registros` registros em memória (os mais antigos são descartados).
+        Se `arquivo_jsonl` for informado, cada registro também é acrescentado a esse arquivo.
+        """
+        self._registros = deque(maxlen=max_registros)
+        self._trava = threading.Lock()
+        self.arquivo_jsonl = arquivo_jsonl
+
+    def medir_chamada(self, request_id: str, etapa: str, agente: str, modelo: str, entrada: str) -> MedicaoChamada:
+        registro = RegistroChamada(request_id=request_id, etapa=etapa, agente=agente, modelo=modelo,
+                                   inicio=time.time(), caracteres_entrada=len(entrada or ""))
+        return MedicaoChamada(self, registro)
+
+    def medir_etapa(self, request_id: str, etapa: str) -> MedicaoEtapa:
+        return MedicaoEtapa(self, RegistroEtapa(request_id=request_id, etapa=etapa, inicio=time.time()))
+
+    def adicionar(self, registro):
+        with self._trava:
+            self._registros.append(registro)
+            if self.arquivo_jsonl:
+                with open(self.arquivo_jsonl, "a", encoding="utf-8") as arquivo:
+                    arquivo.write(json.dumps(asdict(registro), ensure_ascii=False) + "\n")
+
+    def registros(self, request_id: str = None) -> list:
+        with self._trava:
+            return [registro for registro in self._registros if request_id is None or registro.request_id == request_id]
+
+    def resumo_por_etapa(self, request_id: str) -> list:
+        """
+        Resumo de uma geração: para cada etapa, a duração, o tempo em fila, o número de
+        chamadas, tokens, acertos de cache, quantas vezes foi refeita por erro de formato e os
+        tokens recebidos de outras etapas antes e depois da compactação.
+        Ordenado pelo início da etapa.
+        """
+        registros = self.registros(request_id)
+        etapas = {}
+        for registro in registros:
+            if isinstance(registro, RegistroEtapa):
+                etapas[registro.etapa] = {
+                    "etapa": registro.etapa, "inicio": registro.inicio, "duracao_s": registro.duracao_s,
+                    "espera_s": registro.espera_s, "chamadas": 0, "tokens_total": 0, "cache": 0,
+                    "refeita_por_formato": registro.refeita_por_formato, "erro": registro.erro,
+                    "tokens_entrada_antes": registro.tokens_entrada_antes, "tokens_entrada_depois": registro.tokens_entrada_depois,
+                }
+        for registro in registros:
+            if isinstance(registro, RegistroChamada) and registro.etapa in etapas:
+                resumo = etapas[registro.etapa]
+                resumo["chamadas"] += 1
+                resumo["tokens_total"] += registro.tokens_total
+                resumo["cache"] += int(registro.cache)
+        return sorted(etapas.values(), key=lambda resumo: resumo["inicio"])
+
+    def texto_jsonl(self) -> str:
+        return "".join(json.dumps(asdict(registro), ensure_ascii=False) + "\n" for registro in self.registros())
+
+    def texto_prometheus(self) -> str:
+        """Agrega os registros no formato de texto de exposição do Prometheus."""
+        chamadas = {}
+        etapas = {}
+        for registro in self.registros():
+            if isinstance(registro, RegistroChamada):
+                rotulos = (registro.agente, registro.modelo, "erro" if registro.erro else "ok", "sim" if registro.cache else "nao")
+                agregado = chamadas.setdefault(rotulos, {"n": 0, "duracao": 0.0, "primeiro": 0.0, "tentativas": 0,
+                                                         "tokens_entrada": 0, "tokens_saida": 0,
+                                                         "duplicadas": 0, "duplicatas_vencedoras": 0, "cortadas": 0})
+                agregado["n"] += 1
+                agregado["duracao"] += registro.duracao_s
+                agregado["primeiro"] += registro.primeiro_evento_s or 0.0
+                agregado["tentativas"] += registro.tentativas
+                agregado["tokens_entrada"] += registro.tokens_entrada
+                agregado["tokens_saida"] += registro.tokens_saida
+                agregado["duplicadas"] += int(registro.duplicada)
+                agregado["duplicatas_vencedoras"] += int(registro.duplicata_venceu)
+                agregado["cortadas"] += int(registro.interrompida == "limite")
+            else:
+                rotulos = (registro.etapa, "erro" if registro.erro else "ok")
+                agregado = etapas.setdefault(rotulos, {"n": 0, "duracao": 0.0, "espera": 0.0, "refeitas": 0,
+                                                       "entrada_antes": 0, "entrada_depois": 0})
+                agregado["n"] += 1
+                agregado["entrada_antes"] += registro.tokens_entrada_antes
+                agregado["entrada_depois"] += registro.tokens_entrada_depois
+                agregado["refeitas"] += registro.refeita_por_formato
+                agregado["duracao"] += registro.duracao_s
+                agregado["espera"] += registro.espera_s
+
+        linhas = []
+
+        def metrica(nome, tipo, descricao, valores):
+            linhas.append(f"# HELP {nome} {descricao}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for rotulos, valor in valores:
+                texto_rotulos = ",".join(f'{chave}="{conteudo}"' for chave, conteudo in rotulos.items())
+                linhas.append(f"{nome}{{{texto_rotulos}}} {valor}")
+
+        def rotulos_chamada(chave):
+            agente, modelo, status, cache = chave
+            return {"agente": agente, "modelo": modelo, "status": status, "cache": cache}
+
+        def rotulos_etapa(chave):
+            etapa, status = chave
+            return {"etapa": etapa, "status": status}
+
+        metrica("juripost_chamadas_total", "counter", "Chamadas de agentes.",
+                [(rotulos_chamada(chave), agregado["n"]) for chave, agregado in chamadas.items()])
+        metrica("juripost_chamada_duracao_segundos_total", "counter", "Soma das durações das chamadas de agentes.",
+                [(rotulos_chamada(chave), round(agregado["duracao"], 6)) for chave, agregado in chamadas.items()])
+        metrica("juripost_chamada_primeiro_evento_segundos_total", "counter", "Soma dos tempos até o primeiro evento.",
+                [(rotulos_chamada(chave), round(agregado["primeiro"], 6)) for chave, agregado in chamadas.items()])
+        metrica("juripost_chamada_tentativas_total", "counter", "Tentativas feitas pelas chamadas (inclui retentativas).",
+                [(rotulos_chamada(chave), agregado["tentativas"]) for chave, agregado in chamadas.items()])
+        metrica("juripost_tokens_entrada_total", "counter", "Tokens de entrada informados pelo modelo.",
+                [(rotulos_chamada(chave), agregado["tokens_entrada"]) for chave, agregado in chamadas.items()])
+        metrica("juripost_tokens_saida_total", "counter", "Tokens de saída informados pelo modelo.",
+                [(rotulos_chamada(chave), agregado["tokens_saida"]) for chave, agregado in chamadas.items()])
+        metrica("juripost_chamadas_duplicadas_total", "counter", "Chamadas que dispararam uma cópia por demora.",
+                [(rotulos_chamada(chave), agregado["duplicadas"]) for chave, agregado in chamadas.items()])
+        metrica("juripost_duplicatas_vencedoras_total", "counter", "Cópias que responderam antes da chamada original.",
+                [(rotulos_chamada(chave), agregado["duplicatas_vencedoras"]) for chave, agregado in chamadas.items()])
+        metrica("juripost_chamadas_cortadas_total", "counter", "Chamadas cuja resposta chegou ao limite de tokens de saída.",
+                [(rotulos_chamada(chave), agregado["cortadas"]) for chave, agregado in chamadas.items()])
+        metrica("juripost_etapas_total", "counter", "Etapas do pipeline executadas.",
+                [(rotulos_etapa(chave), agregado["n"]) for chave, agregado in etapas.items()])
+        metrica("juripost_etapa_duracao_segundos_total", "counter", "Soma das durações das etapas.",
+                [(rotulos_etapa(chave), round(agregado["duracao"], 6)) for chave, agregado in etapas.items()])
+        metrica("juripost_etapa_espera_segundos_total", "counter", "Soma dos tempos de espera na fila do pool.",
+                [(rotulos_etapa(chave), round(agregado["espera"], 6)) for chave, agregado in etapas.items()])
+        metrica("juripost_etapa_refeitas_formato_total", "counter", "Etapas refeitas porque a resposta fugiu do formato pedido.",
+                [(rotulos_etapa(chave), agregado["refeitas"]) for chave, agregado in etapas.items()])
+        metrica("juripost_etapa_entrada_tokens_antes_total", "counter",
+                "Tokens estimados das respostas recebidas de outras etapas, antes da compactação.",
+                [(rotulos_etapa(chave), agregado["entrada_antes"]) for chave, agregado in etapas.items()])
+        metrica("juripost_etapa_entrada_tokens_depois_total", "counter",
+                "Tokens estimados das respostas recebidas de outras etapas, depois da compactação e do orçamento.",
+                [(rotulos_etapa(chave), agregado["entrada_depois"]) for chave, agregado in etapas.items()])
+        return "\n".join(linhas) + "\n"
+
+    def exportar_jsonl(self, caminho: str):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            arquivo.write(self.texto_jsonl())
+
+    def exportar_prometheus(self, caminho: str):
+        # O node_exporter (textfile collector) lê o arquivo a qualquer momento, então a troca é atômica
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(self.texto_prometheus())
+        os.replace(temporario, caminho)
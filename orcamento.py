@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from saidas import MARCADOR_REVISAO
+
+# --- Orçamento de Tokens entre Etapas ---
+# Cada etapa recebe a resposta completa da etapa anterior: o planejador recebe toda a busca,
+# redator e reels recebem todo o plano, legenda e imagem recebem todo o post final. Antes de
+# repassar essas respostas, o orquestrador as compacta: tira as frases de cortesia com que o
+# modelo abre ou fecha a resposta ("Claro! Aqui está..."), a nota do revisor, linhas e títulos
+# repetidos, separadores de Markdown e espaços sobrando. Se a entrada ainda passar do orçamento
+# de tokens da etapa, os últimos parágrafos são cortados. Os tokens são estimados localmente
+# (cerca de 4 caracteres por token no Gemini), sem chamar a API.
+
+CARACTERES_POR_TOKEN = 4
+AVISO_CORTE = "[... conteúdo encurtado para caber no orçamento da etapa ...]"
+
+# Linhas que só abrem ou fecham a resposta do modelo, sem conteúdo (comparadas no início da linha).
+# Só são tiradas das pontas da resposta: no meio do texto, "Claro, isso afeta..." é conteúdo.
+_FRASES_DE_CORTESIA = re.compile(
+    r"^(claro[!,.]|com certeza[!,.]|certo[!,.]|aqui est[aá]|segue(m)? abaixo|"
+    r"espero que (isso|este|esta|estas|estes) (ajude|seja))",
+    re.IGNORECASE,
+)
+# Separadores de Markdown: linhas horizontais e a linha de alinhamento das tabelas
+_SEPARADOR = re.compile(r"^\s*(([-*_]\s*){3,}|\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?)\s*$")
+
+def estimar_tokens(texto: str) -> int:
+    return (len(texto or "") + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+def _cortesia(linha: str) -> bool:
+    return bool(_FRASES_DE_CORTESIA.match(linha.strip().lstrip("*#_ ")))
+
+def compactar(texto: str) -> str:
+    """Versão enxuta de uma resposta de agente para ser repassada a outro agente."""
+    originais = texto.splitlines()
+    # Frases de cortesia só no começo e no fim da resposta (linhas vazias entre elas não contam)
+    inicio, fim = 0, len(originais)
+    while inicio < fim and (not originais[inicio].strip() or _cortesia(originais[inicio])):
+        inicio += 1
+    while fim > inicio and (not originais[fim - 1].strip() or _cortesia(originais[fim - 1])):
+        fim -= 1
+    linhas = []
+    vistas = set()
+    for linha in originais[inicio:fim]:
+        linha = re.sub(r"[ \t]+", " ", linha).strip()
+        if not linha:
+            if linhas and linhas[-1]:
+                linhas.append("")
+            continue
+        if _SEPARADOR.match(linha) or linha.startswith(MARCADOR_REVISAO):
+            continue
+        linha = re.sub(r"^#+\s+", "", linha).replace("**", "").replace("__", "")
+        # Títulos e linhas repetidos (comuns quando o modelo resume o que já disse) só ficam na primeira vez
+        chave = re.sub(r"[^\w]+", " ", linha).strip().lower()
+        if len(chave) > 3 and chave in vistas:
+            continue
+        vistas.add(chave)
+        linhas.append(linha)
+    return "\n".join(linhas).strip()
+
+def cortar_ao_orcamento(texto: str, max_tokens: int) -> str:
+    """Mantém os parágrafos iniciais que cabem em `max_tokens` e avisa o agente do corte."""
+    if estimar_tokens(texto) <= max_tokens:
+        return texto
+    limite = max_tokens * CARACTERES_POR_TOKEN - len(AVISO_CORTE) - 2
+    mantidos = []
+    tamanho = 0
+    for paragrafo in texto.split("\n"):
+        if tamanho + len(paragrafo) + 1 > limite:
+            break
+        mantidos.append(paragrafo)
+        tamanho += len(paragrafo) + 1
+    if not mantidos:
+        # Um único parágrafo enorme: corta no último espaço antes do limite
+        mantidos = [texto[:max(limite, 0)].rsplit(" ", 1)[0]]
+    return "\n".join(mantidos).rstrip() + "\n\n" + AVISO_CORTE
+
+def preparar_entrada(texto: str, max_tokens: int = None):
+    """Compacta e aplica o orçamento. Retorna (texto, tokens antes, tokens depois)."""
+    antes = estimar_tokens(texto)
+    compactado = compactar(texto)
+    if max_tokens:
+        compactado = cortar_ao_orcamento(compactado, max_tokens)
+    return compactado, antes, estimar_tokens(compactado)
+
+def ler_orcamentos(texto: str) -> dict:
+    """Converte 'plano_de_post=2000,legenda_post=800' em {'plano_de_post': 2000, 'legenda_post': 800}."""
+    orcamentos = {}
+    for item in (texto or "").split(","):
+        if "=" in item:
+            etapa, valor = (parte.strip() for parte in item.split("=", 1))
+            orcamentos[etapa] = int(valor)
+    return orcamentos
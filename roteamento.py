@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+# --- Roteamento de Modelos ---
+# Cada agente tem uma rota: o modelo principal e, em ordem, os modelos de reserva. Se o
+# modelo falhar (depois das retentativas), a chamada segue para o próximo da rota. O
+# roteador acompanha, durante a execução, a latência e a taxa de erros de cada agente em cada
+# modelo (médias móveis exponenciais): um modelo com muitos erros vai para o fim da rota daquele
+# agente, sem afastar o modelo dos outros agentes, e rotas marcadas como "por latência" usam
+# primeiro o modelo mais rápido. A taxa de erros também cai com o tempo, para que um modelo
+# afastado volte a ser tentado. Só contam os erros do modelo (ver limitador.erro_de_modelo).
+
+@dataclass
+class Rota:
+    modelos: list
+    # True ordena os modelos saudáveis pela latência observada (troca qualidade por velocidade)
+    por_latencia: bool = False
+
+@dataclass
+class _Estatistica:
+    latencia_s: dict = field(default_factory=dict) # agente -> média móvel da duração
+    taxa_erros: dict = field(default_factory=dict) # agente -> média móvel dos erros (1 = erro, 0 = sucesso)
+    atualizada_em: dict = field(default_factory=dict) # agente -> time.monotonic() da última atualização da taxa
+
+class RoteadorModelos:
+    def __init__(self, rotas: dict, limite_erros: float = 0.5, peso: float = 0.2, meia_vida_erros_s: float = 60.0):
+        """
+        `rotas` mapeia nome do agente -> Rota. Um modelo cuja taxa de erros no agente (média móvel com
+        `peso` para a observação mais recente) passa de `limite_erros` é usado só depois dos demais.
+        Sem novas observações, a taxa cai pela metade a cada `meia_vida_erros_s` segundos.
+        """
+        self.rotas = rotas
+        self.limite_erros = limite_erros
+        self.peso = peso
+        self.meia_vida_erros_s = meia_vida_erros_s
+        self._estatisticas = {}
+        self._trava = threading.Lock()
+
+    def _estatistica(self, modelo: str) -> _Estatistica:
+        return self._estatisticas.setdefault(modelo, _Estatistica())
+
+    def _taxa_erros(self, estatistica: _Estatistica, agente: str) -> float:
+        """Taxa de erros atual do agente no modelo, já descontado o tempo desde a última observação."""
+        if agente not in estatistica.taxa_erros:
+            return 0.0
+        decorrido = time.monotonic() - estatistica.atualizada_em[agente]
+        return estatistica.taxa_erros[agente] * 0.5 ** (decorrido / self.meia_vida_erros_s)
+
+    def _atualizar_erros(self, estatistica: _Estatistica, agente: str, observacao: float):
+        taxa = self._taxa_erros(estatistica, agente)
+        estatistica.taxa_erros[agente] = taxa + self.peso * (observacao - taxa)
+        estatistica.atualizada_em[agente] = time.monotonic()
+
+    def registrar_sucesso(self, agente: str, modelo: str, duracao_s: float):
+        with self._trava:
+            estatistica = self._estatistica(modelo)
+            anterior = estatistica.latencia_s.get(agente)
+            estatistica.latencia_s[agente] = duracao_s if anterior is None else anterior + self.peso * (duracao_s - anterior)
+            self._atualizar_erros(estatistica, agente, 0.0)
+
+    def registrar_erro(self, agente: str, modelo: str):
+        with self._trava:
+            self._atualizar_erros(self._estatistica(modelo), agente, 1.0)
+
+    def ordenar(self, agente: str, modelo_padrao: str = None) -> list:
+        """Modelos a tentar para o agente, na ordem de preferência atual."""
+        rota = self.rotas.get(agente)
+        if rota is None:
+            return [modelo_padrao] if modelo_padrao else []
+        with self._trava:
+            saudaveis = [modelo for modelo in rota.modelos
+                         if self._taxa_erros(self._estatistica(modelo), agente) <= self.limite_erros]
+            if rota.por_latencia:
+                # Modelos ainda sem medição entram na frente, para serem medidos ao menos uma vez
+                saudaveis.sort(key=lambda modelo: self._estatistica(modelo).latencia_s.get(agente, 0.0))
+        return saudaveis + [modelo for modelo in rota.modelos if modelo not in saudaveis]
+
+    def resumo(self) -> list:
+        """Estatísticas atuais por modelo (para exibir ou exportar)."""
+        with self._trava:
+            return [
+                {"modelo": modelo,
+                 "taxa_erros": {agente: round(self._taxa_erros(estatistica, agente), 3) for agente in estatistica.taxa_erros},
+                 "latencia_s": {agente: round(valor, 3) for agente, valor in estatistica.latencia_s.items()}}
+                for modelo, estatistica in self._estatisticas.items()
+            ]
+
+def ler_rotas(texto: str) -> dict:
+    """Converte 'agente_legenda=gemini-2.0-flash-lite>gemini-2.0-flash;agente_imagem=gemini-2.0-flash' em {nome: Rota}."""
+    rotas = {}
+    for item in (texto or "").split(";"):
+        if "=" in item:
+            agente, modelos = item.split("=", 1)
+            rotas[agente.strip()] = Rota([modelo.strip() for modelo in modelos.split(">") if modelo.strip()])
+    return rotas
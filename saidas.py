@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+import re
+from dataclasses import dataclass, field
+
+# --- Saídas Estruturadas dos Agentes ---
+# Os agentes respondem em texto livre, mas as instruções exigem formatos bem definidos.
+# As funções `interpretar_*` transformam cada resposta num objeto compacto e verificam
+# o formato pedido; se ele não foi seguido, lançam ErroFormato e o orquestrador refaz
+# só aquela etapa. O app usa esses objetos já prontos, sem reprocessar o texto a cada rerun.
+
+MARCADOR_REVISAO = "Post revisado e pronto para publicar!"
+DISCLAIMER_LEGENDA = "Este post tem caráter informativo e não substitui uma consulta jurídica especializada."
+# Número de hashtags pedido na instrução do agente_legenda
+HASHTAGS_LEGENDA = (5, 6)
+
+# Rótulos que os agentes colocam no texto e que não devem ir para a versão copiada
+_ROTULOS_PARA_REMOVER = ("Título Sugerido:", "Corpo do Post:", "Chamada Sutil para Ação:", "Hashtags:", "Assunto:")
+
+class ErroFormato(ValueError):
+    """A resposta do agente não seguiu o formato exigido pela instrução."""
+
+@dataclass(slots=True)
+class PostFinal:
+    texto: str # Post revisado, sem a nota de revisão
+    nota_revisao: str
+    texto_para_copiar: str
+
+@dataclass(slots=True)
+class Legenda:
+    corpo: str
+    hashtags: list
+    disclaimer: str
+    texto: str # Legenda completa, pronta para colar
+
+@dataclass(slots=True)
+class SlideReels:
+    numero: int
+    duracao: str
+    texto: str
+    fundo: str
+    animacao: str
+
+@dataclass(slots=True)
+class Reels:
+    titulo: str
+    slides: list = field(default_factory=list)
+    legenda: str = ""
+    hashtags: list = field(default_factory=list)
+    texto_para_copiar: str = ""
+
+def limpar_texto_para_copiar(texto: str) -> str:
+    """
+    Remove marcadores de Markdown (negrito, itálico, títulos), rótulos como "Título Sugerido:"
+    e linhas vazias, mantendo uma linha por parágrafo.
+    """
+    linhas_limpas = []
+    for linha in texto.splitlines():
+        linha = linha.strip().replace('**', '').replace('*', '')
+        # Só remove o '#' de títulos ("## Título"), preservando hashtags no início da linha
+        linha = re.sub(r"^#+\s+", "", linha)
+        for rotulo in _ROTULOS_PARA_REMOVER:
+            if linha.startswith(rotulo):
+                linha = linha.replace(rotulo, "", 1).strip()
+        if linha:
+            linhas_limpas.append(linha)
+    return '\n'.join(linhas_limpas).strip()
+
+def fim_da_resposta(texto: str, marcador: str):
+    """Posição logo após a linha que contém `marcador`, se ela já terminou (None enquanto não terminou)."""
+    inicio = texto.find(marcador)
+    if inicio < 0:
+        return None
+    fim_da_linha = texto.find("\n", inicio + len(marcador))
+    return None if fim_da_linha < 0 else fim_da_linha
+
+def extrair_hashtags(texto: str) -> list:
+    return re.findall(r"#\w+", texto)
+
+def interpretar_post_final(texto: str) -> PostFinal:
+    """Separa o post revisado da nota final do revisor ('Post revisado e pronto para publicar! (...)')."""
+    if MARCADOR_REVISAO not in texto:
+        raise ErroFormato(f"o revisor não incluiu a nota final '{MARCADOR_REVISAO}'")
+    corpo, nota = texto.rsplit(MARCADOR_REVISAO, 1)
+    corpo = corpo.strip()
+    if not corpo:
+        raise ErroFormato("o revisor devolveu apenas a nota, sem o texto do post")
+    return PostFinal(texto=corpo, nota_revisao=f"{MARCADOR_REVISAO} {nota.strip()}".strip(), texto_para_copiar=limpar_texto_para_copiar(corpo))
+
+def interpretar_legenda(texto: str) -> Legenda:
+    """Confere a legenda: corpo, bloco de 5 a 6 hashtags e o disclaimer obrigatório como última linha."""
+    linhas = [linha.strip() for linha in texto.strip().splitlines() if linha.strip()]
+    if not linhas or linhas[-1].strip('*_ ') != DISCLAIMER_LEGENDA:
+        raise ErroFormato("a última linha da legenda não é o disclaimer obrigatório")
+    hashtags = extrair_hashtags(texto)
+    minimo, maximo = HASHTAGS_LEGENDA
+    if not minimo <= len(hashtags) <= maximo:
+        raise ErroFormato(f"a legenda tem {len(hashtags)} hashtags (o esperado é entre {minimo} e {maximo})")
+    # O corpo são as linhas antes do bloco de hashtags
+    corpo = [linha for linha in linhas[:-1] if not linha.startswith("#")]
+    if not corpo:
+        raise ErroFormato("a legenda não tem corpo de texto")
+    return Legenda(corpo="\n".join(corpo), hashtags=hashtags, disclaimer=DISCLAIMER_LEGENDA, texto="\n".join(linhas))
+
+# Linha da tabela de slides: "1 | 0–5s | Texto | Fundo | Animação"
+_LINHA_SLIDE = re.compile(r"^\|?\s*(\d+)\s*\|([^|]*)\|([^|]*)\|([^|]*)\|([^|]*)\|?\s*$")
+
+def interpretar_reels(texto: str) -> Reels:
+    """Lê o roteiro de Reels: título, tabela de 6 a 8 slides, legenda e hashtags."""
+    titulo = ""
+    slides = []
+    secao = None
+    legenda = []
+    hashtags = []
+    for linha in texto.splitlines():
+        linha_limpa = linha.strip().replace('**', '')
+        if not linha_limpa:
+            continue
+        if "Reels:" in linha_limpa and not titulo:
+            titulo = linha_limpa.split("Reels:", 1)[1].strip()
+            continue
+        correspondencia = _LINHA_SLIDE.match(linha_limpa)
+        if correspondencia:
+            numero, duracao, texto_slide, fundo, animacao = (parte.strip() for parte in correspondencia.groups())
+            slides.append(SlideReels(int(numero), duracao, texto_slide, fundo, animacao))
+            continue
+        # Seções depois da tabela, identificadas pelos títulos do exemplo da instrução
+        minusculas = linha_limpa.lower()
+        if "legenda" in minusculas and len(linha_limpa) < 40:
+            secao = "legenda"
+        elif "hashtags" in minusculas and len(linha_limpa) < 40:
+            secao = "hashtags"
+        elif ("paleta" in minusculas or "música" in minusculas or "musica" in minusculas) and len(linha_limpa) < 40:
+            secao = None
+        elif secao == "legenda":
+            legenda.append(linha_limpa)
+        elif secao == "hashtags":
+            hashtags.extend(extrair_hashtags(linha_limpa))
+
+    if not 6 <= len(slides) <= 8:
+        raise ErroFormato(f"o roteiro tem {len(slides)} slides na tabela (o esperado é entre 6 e 8)")
+    for slide in slides:
+        if not (slide.duracao and slide.texto and slide.fundo and slide.animacao):
+            raise ErroFormato(f"o slide {slide.numero} não tem tempo, texto, fundo e animação")
+    if not legenda:
+        raise ErroFormato("o roteiro não traz a legenda do Reels")
+    if not 5 <= len(hashtags) <= 8:
+        raise ErroFormato(f"o roteiro tem {len(hashtags)} hashtags (o esperado é entre 5 e 8)")
+    return Reels(titulo=titulo, slides=slides, legenda="\n".join(legenda), hashtags=hashtags,
+                 texto_para_copiar=limpar_texto_para_copiar(texto))
+
+# Etapas do pipeline cuja saída tem formato verificável
+INTERPRETADORES = {
+    'reels_conteudo_completo': interpretar_reels,
+    'post_final': interpretar_post_final,
+    'legenda_post': interpretar_legenda,
+}
+
+def interpretar_resultados(resultados: dict) -> dict:
+    """
+    Interpreta de uma vez as etapas com formato conhecido. Etapas ausentes ou fora do
+    formato ficam de fora do dicionário (quem exibe cai no texto bruto).
+    """
+    estruturados = {}
+    for chave, interpretar in INTERPRETADORES.items():
+        if resultados.get(chave):
+            try:
+                estruturados[chave] = interpretar(resultados[chave])
+            except ErroFormato:
+                pass
+    return estruturados
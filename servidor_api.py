@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+API HTTP do JuriPost, sem a interface do Streamlit.
+
+Roda num servidor assíncrono (aiohttp, com keep-alive) e usa o mesmo gerenciador de
+tarefas do app: cada geração roda em segundo plano e o cliente acompanha as etapas por
+Server-Sent Events, recebendo o resultado de cada uma assim que ela termina. Cada réplica
+é independente, então várias podem ficar atrás de um balanceador de carga (o cliente
+acompanha a geração na mesma réplica em que a criou).
+
+Rotas:
+    POST /geracoes                 {"topico": "...", "user_id": "...", "usar_cache": true, "variantes": 1}
+                                   (a resposta lista em "parecidas" as gerações recentes de tema parecido)
+    GET  /geracoes/{id}            estado atual da geração (e os resultados, quando concluída)
+    GET  /geracoes/{id}/eventos    SSE: um evento "etapa" por etapa concluída e um evento "fim"
+    GET  /saude                    verificação de saúde para o balanceador
+    GET  /metricas                 métricas no formato de texto do Prometheus
+
+Uso:
+    python servidor_api.py --host 0.0.0.0 --porta 8080
+    curl -X POST localhost:8080/geracoes -d '{"topico": "Nacionalidade portuguesa"}'
+    curl -N localhost:8080/geracoes/<id>/eventos
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from aiohttp import web
+
+# Intervalo entre as consultas ao estado da tarefa e entre os comentários que mantêm a conexão SSE viva
+INTERVALO_EVENTOS_S = 0.2
+INTERVALO_PING_S = 15.0
+MAX_VARIANTES = 4
+
+CHAVE_GERENCIADOR = web.AppKey("gerenciador", object)
+
+def _erro(status: int, mensagem: str) -> web.Response:
+    return web.json_response({"erro": mensagem}, status=status)
+
+def _estado(tarefa) -> dict:
+    estado = {
+        "id": tarefa.id,
+        "topico": tarefa.topico,
+        "status": tarefa.status,
+        "progresso": round(tarefa.progresso, 3),
+        "concluidas": tarefa.concluidas,
+        "criada_em": tarefa.criada_em,
+        "concluida_em": tarefa.concluida_em,
+        "eventos": f"/geracoes/{tarefa.id}/eventos",
+    }
+    if tarefa.erro:
+        estado["erro"] = tarefa.erro
+    if tarefa.resultados is not None:
+        estado["resultados"] = tarefa.resultados
+    return estado
+
+# --- Rotas ---
+async def criar_geracao(request: web.Request) -> web.Response:
+    try:
+        dados = await request.json()
+    except ValueError:
+        return _erro(400, "O corpo da requisição deve ser um objeto JSON.")
+    if not isinstance(dados, dict) or not str(dados.get("topico") or "").strip():
+        return _erro(400, "Você esqueceu de informar o tópico.")
+    variantes = dados.get("variantes", 1)
+    if not isinstance(variantes, int) or not 1 <= variantes <= MAX_VARIANTES:
+        return _erro(400, f"'variantes' deve ser um número inteiro entre 1 e {MAX_VARIANTES}.")
+    usar_cache = dados.get("usar_cache", True)
+    if not isinstance(usar_cache, bool):
+        return _erro(400, "'usar_cache' deve ser true ou false.")
+
+    gerenciador = request.app[CHAVE_GERENCIADOR]
+    topico = str(dados["topico"]).strip()
+    parecidas = gerenciador.historico.parecidas(topico) if gerenciador.historico is not None else []
+    id_tarefa = gerenciador.enviar(
+        topico,
+        user_id=str(dados.get("user_id") or "api"),
+        usar_cache=usar_cache,
+        variantes=variantes,
+    )
+    estado = _estado(gerenciador.obter(id_tarefa))
+    estado["parecidas"] = [{"id": geracao.id, "topico": geracao.topico, "criada_em": geracao.criada_em,
+                            "semelhanca": geracao.semelhanca} for geracao in parecidas]
+    return web.json_response(estado, status=202, headers={"Location": f"/geracoes/{id_tarefa}"})
+
+async def obter_geracao(request: web.Request) -> web.Response:
+    gerenciador = request.app[CHAVE_GERENCIADOR]
+    tarefa = gerenciador.obter(request.match_info["id"])
+    if tarefa is not None:
+        return web.json_response(_estado(tarefa))
+    # Gerações antigas, já fora da memória do gerenciador, continuam no histórico
+    resultados = gerenciador.historico.obter(request.match_info["id"]) if gerenciador.historico is not None else None
+    if resultados is None:
+        return _erro(404, "Geração não encontrada.")
+    return web.json_response({"id": request.match_info["id"], "status": "concluida", "resultados": resultados})
+
+async def _enviar_evento(resposta: web.StreamResponse, evento: str, dados: dict, id_evento=None):
+    linhas = [f"event: {evento}"]
+    if id_evento is not None:
+        linhas.append(f"id: {id_evento}")
+    linhas.append(f"data: {json.dumps(dados, ensure_ascii=False)}")
+    await resposta.write(("\n".join(linhas) + "\n\n").encode("utf-8"))
+
+async def eventos_geracao(request: web.Request) -> web.StreamResponse:
+    """
+    Transmite cada etapa concluída (evento "etapa", com id = posição da etapa) e, no fim, o evento "fim".
+    Um cliente que reconecta com o cabeçalho Last-Event-ID recebe só as etapas seguintes.
+    """
+    gerenciador = request.app[CHAVE_GERENCIADOR]
+    id_tarefa = request.match_info["id"]
+    if gerenciador.obter(id_tarefa) is None:
+        return _erro(404, "Geração não encontrada.")
+    try:
+        enviadas = int(request.headers.get("Last-Event-ID", "-1")) + 1
+    except ValueError:
+        enviadas = 0
+
+    resposta = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                           "X-Accel-Buffering": "no"})
+    await resposta.prepare(request)
+    versao = None
+    ultimo_envio = time.monotonic()
+    try:
+        while True:
+            tarefa = gerenciador.obter(id_tarefa)
+            if tarefa.versao != versao:
+                versao = tarefa.versao
+                for indice in range(enviadas, len(tarefa.concluidas)):
+                    chave = tarefa.concluidas[indice]
+                    await _enviar_evento(resposta, "etapa", {"etapa": chave, "texto": tarefa.etapas.get(chave, "")}, indice)
+                    ultimo_envio = time.monotonic()
+                enviadas = max(enviadas, len(tarefa.concluidas))
+                if not tarefa.ativa:
+                    await _enviar_evento(resposta, "fim", {"status": tarefa.status, "erro": tarefa.erro})
+                    break
+            if time.monotonic() - ultimo_envio > INTERVALO_PING_S:
+                await resposta.write(b": ping\n\n")
+                ultimo_envio = time.monotonic()
+            await asyncio.sleep(INTERVALO_EVENTOS_S)
+    except ConnectionResetError:
+        pass # O cliente desconectou; a geração continua e pode ser acompanhada de novo
+    return resposta
+
+async def saude(request: web.Request) -> web.Response:
+    from chatbot_core import estado_sessoes
+
+    ativas = sum(1 for tarefa in request.app[CHAVE_GERENCIADOR].listar() if tarefa.ativa)
+    return web.json_response({"status": "ok", "geracoes_ativas": ativas, "sessoes": estado_sessoes()})
+
+async def metricas(request: web.Request) -> web.Response:
+    from chatbot_core import coletor_metricas
+
+    return web.Response(text=coletor_metricas.texto_prometheus(), content_type="text/plain")
+
+def criar_app(gerenciador=None) -> web.Application:
+    """Aplicação aiohttp com as rotas da API; sem `gerenciador`, usa tarefas.criar_gerenciador()."""
+    if gerenciador is None:
+        from tarefas import criar_gerenciador
+        gerenciador = criar_gerenciador()
+    app = web.Application()
+    app[CHAVE_GERENCIADOR] = gerenciador
+    app.add_routes([
+        web.post("/geracoes", criar_geracao),
+        web.get("/geracoes/{id}", obter_geracao),
+        web.get("/geracoes/{id}/eventos", eventos_geracao),
+        web.get("/saude", saude),
+        web.get("/metricas", metricas),
+    ])
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP do JuriPost (gerações em segundo plano com eventos SSE).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--keepalive", type=float, default=75.0, help="Segundos que uma conexão ociosa fica aberta.")
+    args = parser.parse_args(argv)
+
+    web.run_app(criar_app(), host=args.host, port=args.porta, keepalive_timeout=args.keepalive)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
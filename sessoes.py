@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import OrderedDict
+
+from google.adk.sessions import InMemorySessionService
+
+# --- Sessões do ADK com Limite de Memória ---
+# Cada chamada de agente roda numa sessão própria do ADK, que guarda o histórico da conversa
+# (a entrada e a resposta, de vários kB). O backend apaga a sessão ao fim da chamada, mas
+# uma chamada abandonada no meio (cópia por demora que perdeu, erro do modelo) pode deixar a
+# sessão para trás, e o InMemorySessionService também mantém um dicionário vazio para cada
+# usuário que já passou por ele. Num servidor que fica no ar por dias isso só cresce.
+# Este serviço, compartilhado por todos os Runners, limita o número de sessões e o tamanho
+# estimado dos históricos: passando do limite, descarta as sessões usadas há mais tempo.
+# Este módulo importa o ADK e só é carregado quando o primeiro Runner é criado.
+
+# Custo aproximado de uma sessão e de um evento além do texto (objetos, ids, metadados)
+_BYTES_POR_SESSAO = 2048
+_BYTES_POR_EVENTO = 1024
+
+def _tamanho_evento(evento) -> int:
+    conteudo = getattr(evento, "content", None)
+    partes = getattr(conteudo, "parts", None) or []
+    return _BYTES_POR_EVENTO + sum(len(parte.text or "") for parte in partes if hasattr(parte, "text"))
+
+class ServicoSessoesLimitado(InMemorySessionService):
+    def __init__(self, max_sessoes: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        """Guarda no máximo `max_sessoes` sessões e cerca de `max_bytes` de histórico, descartando as menos usadas."""
+        super().__init__()
+        self.max_sessoes = max_sessoes
+        self.max_bytes = max_bytes
+        # (app, usuário, sessão) -> bytes estimados, da menos para a mais recentemente usada
+        self._uso = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.descartadas = 0
+
+    async def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        sessao = await super().create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        with self._trava:
+            self._uso[(app_name, user_id, sessao.id)] = _BYTES_POR_SESSAO
+            self._bytes += _BYTES_POR_SESSAO
+            self._aplicar_limites()
+        return sessao
+
+    async def append_event(self, session, event):
+        evento = await super().append_event(session=session, event=event)
+        chave = (session.app_name, session.user_id, session.id)
+        with self._trava:
+            if chave in self._uso and not getattr(event, "partial", False):
+                tamanho = _tamanho_evento(event)
+                self._uso[chave] += tamanho
+                self._bytes += tamanho
+                self._uso.move_to_end(chave)
+                self._aplicar_limites()
+        return evento
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        with self._trava:
+            self._remover((app_name, user_id, session_id))
+
+    def _aplicar_limites(self):
+        # A sessão mais recente nunca é descartada: é a da chamada que acabou de começar ou de responder
+        while len(self._uso) > 1 and (len(self._uso) > self.max_sessoes or self._bytes > self.max_bytes):
+            self._remover(next(iter(self._uso)))
+            self.descartadas += 1
+
+    def _remover(self, chave: tuple):
+        app_name, user_id, session_id = chave
+        self._bytes -= self._uso.pop(chave, 0)
+        sessoes_usuario = self.sessions.get(app_name, {}).get(user_id)
+        if sessoes_usuario is None:
+            return
+        sessoes_usuario.pop(session_id, None)
+        # Sem sessões, o usuário e o app também saem dos dicionários do ADK
+        if not sessoes_usuario:
+            del self.sessions[app_name][user_id]
+            self.user_state.get(app_name, {}).pop(user_id, None)
+        if not self.sessions[app_name]:
+            del self.sessions[app_name]
+
+    def tamanho(self) -> dict:
+        """Sessões guardadas, bytes estimados dos históricos e sessões já descartadas pelo limite."""
+        with self._trava:
+            return {"sessoes": len(self._uso), "bytes": self._bytes, "descartadas": self.descartadas}
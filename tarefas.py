@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+
+from chatbot_core import (ETAPAS_DAS_VARIANTES, ETAPAS_DO_PIPELINE, ContextoRequisicao, etapas_dependentes, gerar_post_completo,
+                          gerar_variantes, regenerar_etapa)
+from historico import criar_historico
+
+# --- Gerações em Segundo Plano ---
+# Cada geração de post vira uma tarefa com id próprio, executada num pool de threads do
+# processo. O progresso de cada etapa (inclusive o texto parcial em streaming) fica guardado
+# na tarefa, e a interface só consulta esse estado: a página não fica presa durante a geração,
+# o usuário pode enfileirar vários tópicos, e um rerun ou uma reconexão não perdem o trabalho.
+# Com um diretório configurado, as tarefas também são gravadas em disco e sobrevivem a um
+# reinício do processo (as que estavam em andamento são marcadas como interrompidas).
+# A regeneração de uma etapa de um post já pronto também é uma tarefa: as etapas mantidas
+# já entram concluídas, e só a etapa pedida e as que dependem dela rodam.
+
+NA_FILA = "na_fila"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+@dataclass
+class Tarefa:
+    id: str
+    topico: str
+    user_id: str
+    request_id: str
+    usar_cache: bool = True
+    # Mais de uma variante gera várias versões do post (ver chatbot_core.gerar_variantes)
+    variantes: int = 1
+    # Na regeneração, a etapa refeita e os resultados do post de origem (ver chatbot_core.regenerar_etapa)
+    etapa_regenerada: str = None
+    resultados_anteriores: dict = None
+    status: str = NA_FILA
+    criada_em: float = field(default_factory=time.time)
+    iniciada_em: float = None
+    concluida_em: float = None
+    # Texto de cada etapa (parcial enquanto a etapa roda) e etapas já concluídas, na ordem em que terminaram
+    etapas: dict = field(default_factory=dict)
+    concluidas: list = field(default_factory=list)
+    resultados: dict = None
+    erro: str = None
+    # Aumenta a cada atualização; quem acompanha a tarefa sabe se algo mudou
+    versao: int = 0
+
+    @property
+    def ativa(self) -> bool:
+        return self.status in (NA_FILA, EXECUTANDO)
+
+    @property
+    def total_etapas(self) -> int:
+        return len(ETAPAS_DO_PIPELINE) + (self.variantes - 1) * len(ETAPAS_DAS_VARIANTES)
+
+    @property
+    def progresso(self) -> float:
+        return len(self.concluidas) / self.total_etapas
+
+class GerenciadorTarefas:
+    def __init__(self, max_simultaneas: int = 2, diretorio: str = None, max_tarefas: int = 200, gerar=gerar_post_completo,
+                 historico=None):
+        """
+        Roda até `max_simultaneas` gerações ao mesmo tempo; as demais esperam na fila.
+        Guarda em memória as `max_tarefas` mais recentes (as mais antigas já terminadas são descartadas).
+        `diretorio`, se informado, guarda cada tarefa em <diretorio>/<id>.json.
+        `gerar` é a função de geração, com a assinatura de gerar_post_completo.
+        `historico` (historico.HistoricoGeracoes), se informado, recebe cada geração concluída.
+        """
+        self.diretorio = diretorio
+        self.historico = historico
+        self.max_tarefas = max_tarefas
+        self._gerar = gerar
+        self._tarefas = OrderedDict()
+        self._trava = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_simultaneas, thread_name_prefix="juripost-tarefa")
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            self._carregar()
+
+    # --- Consulta ---
+    def obter(self, id_tarefa: str) -> Tarefa:
+        """Cópia do estado atual da tarefa (ou None), segura para ler enquanto a geração continua."""
+        with self._trava:
+            tarefa = self._tarefas.get(id_tarefa)
+            return self._copia(tarefa) if tarefa is not None else None
+
+    def listar(self, user_id: str = None) -> list:
+        """Tarefas (cópias) do usuário, ou de todos, da mais antiga para a mais recente."""
+        with self._trava:
+            return [self._copia(tarefa) for tarefa in self._tarefas.values() if user_id is None or tarefa.user_id == user_id]
+
+    @staticmethod
+    def _copia(tarefa: Tarefa) -> Tarefa:
+        return replace(tarefa, etapas=dict(tarefa.etapas), concluidas=list(tarefa.concluidas),
+                       resultados=dict(tarefa.resultados) if tarefa.resultados is not None else None)
+
+    # --- Envio e Execução ---
+    def enviar(self, topico: str, user_id: str = "anonimo", usar_cache: bool = True, variantes: int = 1) -> str:
+        """Coloca a geração de um post (ou de `variantes` versões dele) na fila e retorna o id da tarefa."""
+        id_tarefa = uuid.uuid4().hex
+        tarefa = Tarefa(id=id_tarefa, topico=topico, user_id=user_id, request_id=id_tarefa, usar_cache=usar_cache,
+                        variantes=variantes)
+        with self._trava:
+            self._tarefas[id_tarefa] = tarefa
+            self._descartar_antigas()
+        self._salvar(tarefa)
+        self._executor.submit(self._executar, tarefa)
+        return id_tarefa
+
+    def enviar_regeneracao(self, topico: str, resultados: dict, etapa: str, user_id: str = "anonimo") -> str:
+        """Coloca na fila a regeneração de `etapa` (e das que dependem dela) de um post pronto e retorna o id da tarefa."""
+        id_tarefa = uuid.uuid4().hex
+        invalidadas = etapas_dependentes(etapa)
+        mantidas = [chave for chave in ETAPAS_DO_PIPELINE if chave in resultados and chave not in invalidadas]
+        tarefa = Tarefa(id=id_tarefa, topico=topico, user_id=user_id, request_id=id_tarefa, usar_cache=False,
+                        etapa_regenerada=etapa, resultados_anteriores=dict(resultados),
+                        etapas={chave: resultados[chave] for chave in mantidas}, concluidas=mantidas)
+        with self._trava:
+            self._tarefas[id_tarefa] = tarefa
+            self._descartar_antigas()
+        self._salvar(tarefa)
+        self._executor.submit(self._executar, tarefa)
+        return id_tarefa
+
+    def _executar(self, tarefa: Tarefa):
+        self._atualizar(tarefa, status=EXECUTANDO, iniciada_em=time.time())
+        contexto = ContextoRequisicao(user_id=tarefa.user_id, request_id=tarefa.request_id, usar_cache=tarefa.usar_cache)
+        ao_atualizar_etapa = lambda *evento: self._registrar_etapa(tarefa, *evento)
+        try:
+            if tarefa.etapa_regenerada:
+                resultados = regenerar_etapa(tarefa.topico, tarefa.resultados_anteriores, tarefa.etapa_regenerada,
+                                             contexto=contexto, ao_atualizar_etapa=ao_atualizar_etapa)
+            elif tarefa.variantes > 1:
+                resultados = gerar_variantes(tarefa.topico, tarefa.variantes, contexto=contexto, ao_atualizar_etapa=ao_atualizar_etapa)
+            else:
+                resultados = self._gerar(tarefa.topico, contexto=contexto, ao_atualizar_etapa=ao_atualizar_etapa)
+        except Exception as erro:
+            self._atualizar(tarefa, status=ERRO, erro=f"Ocorreu um erro inesperado: {erro}", concluida_em=time.time())
+        else:
+            if "erro" in resultados:
+                self._atualizar(tarefa, status=ERRO, erro=resultados["erro"], concluida_em=time.time())
+            else:
+                self._atualizar(tarefa, status=CONCLUIDA, resultados=resultados, concluida_em=time.time())
+                if self.historico is not None:
+                    self.historico.registrar(tarefa.id, tarefa.topico, resultados, user_id=tarefa.user_id)
+        self._salvar(tarefa)
+
+    def _registrar_etapa(self, tarefa: Tarefa, chave: str, texto: str, concluida: bool):
+        with self._trava:
+            tarefa.etapas[chave] = texto
+            if concluida and chave not in tarefa.concluidas:
+                tarefa.concluidas.append(chave)
+            tarefa.versao += 1
+
+    def _atualizar(self, tarefa: Tarefa, **campos):
+        with self._trava:
+            for nome, valor in campos.items():
+                setattr(tarefa, nome, valor)
+            tarefa.versao += 1
+
+    def _descartar_antigas(self):
+        """Mantém no máximo `max_tarefas` em memória, descartando primeiro as mais antigas já terminadas."""
+        excedentes = len(self._tarefas) - self.max_tarefas
+        for id_tarefa in [id_tarefa for id_tarefa, tarefa in self._tarefas.items() if not tarefa.ativa][:max(excedentes, 0)]:
+            del self._tarefas[id_tarefa]
+            if self.diretorio:
+                try:
+                    os.remove(os.path.join(self.diretorio, f"{id_tarefa}.json"))
+                except OSError:
+                    pass
+
+    # --- Persistência ---
+    def _salvar(self, tarefa: Tarefa):
+        if not self.diretorio:
+            return
+        with self._trava:
+            dados = asdict(tarefa)
+        caminho = os.path.join(self.diretorio, f"{tarefa.id}.json")
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    def _carregar(self):
+        """Lê as tarefas gravadas; as que não terminaram foram interrompidas por um reinício do processo."""
+        tarefas = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.diretorio, nome), encoding="utf-8") as arquivo:
+                    tarefa = Tarefa(**json.load(arquivo))
+            except (OSError, ValueError, TypeError):
+                continue # Arquivo incompleto ou de outra versão
+            if tarefa.ativa:
+                tarefa.status = ERRO
+                tarefa.erro = "A geração foi interrompida (o servidor foi reiniciado). Envie o tópico novamente."
+            tarefas.append(tarefa)
+        for tarefa in sorted(tarefas, key=lambda tarefa: tarefa.criada_em)[-self.max_tarefas:]:
+            self._tarefas[tarefa.id] = tarefa
+
+def criar_gerenciador() -> GerenciadorTarefas:
+    """
+    Gerenciador configurado pelas variáveis JURIPOST_TAREFAS_SIMULTANEAS e JURIPOST_TAREFAS_DIR,
+    com o histórico de historico.criar_historico().
+    """
+    return GerenciadorTarefas(
+        max_simultaneas=int(os.environ.get("JURIPOST_TAREFAS_SIMULTANEAS", "2")),
+        # Vazio desativa a gravação em disco
+        diretorio=os.environ.get("JURIPOST_TAREFAS_DIR", ".tarefas_juripost") or None,
+        historico=criar_historico(),
+    )
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# O chatbot_core lê a configuração ao ser importado: os testes rodam com o backend simulado,
+# sem cache em disco, sem limite de requisições e sem gravar métricas ou auditoria em arquivo
+os.environ.update(JURIPOST_BACKEND="stub", JURIPOST_CACHE_DIR="", JURIPOST_LIMITE_RPM_PADRAO="1000000",
+                  JURIPOST_LIMITES_RPM="", JURIPOST_METRICAS_JSONL="", JURIPOST_AUDITORIA_JSONL="")
+
+@pytest.fixture
+def backend_simulado(monkeypatch):
+    """Um BackendStub sem latência no lugar do backend do chatbot_core, restaurado ao fim do teste."""
+    import chatbot_core as core
+    from backend_stub import BackendStub, Latencia
+
+    backend = BackendStub(latencia=Latencia("fixa", 0, 0))
+    monkeypatch.setattr(core, "_backend", backend)
+    return backend
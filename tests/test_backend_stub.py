@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Roda num processo próprio, com qualquer importação de google.* falhando como se os pacotes não existissem
+_SCRIPT = """
+import importlib.abc, json, sys
+
+class SemGoogle(importlib.abc.MetaPathFinder):
+    def find_spec(self, nome, caminho, alvo=None):
+        if nome == "google" or nome.startswith("google."):
+            raise ModuleNotFoundError(f"No module named {nome!r}", name=nome)
+        return None
+
+sys.meta_path.insert(0, SemGoogle())
+import chatbot_core as core
+from backend_stub import BackendStub, Latencia
+
+core.definir_backend(BackendStub(latencia=Latencia("fixa", 0.01, 0)))
+core.preparar_agentes()
+resultados = core.gerar_post_completo("Nacionalidade portuguesa para bisnetos")
+print(json.dumps({"resultados": resultados, "sdks": sorted(m for m in sys.modules if m.startswith("google.adk") or m.startswith("google.genai"))}))
+"""
+
+class TestPipelineSimulado(unittest.TestCase):
+    def test_pipeline_sem_pacotes_do_google(self):
+        ambiente = dict(os.environ, JURIPOST_BACKEND="stub", JURIPOST_CACHE_DIR="", JURIPOST_LIMITE_RPM_PADRAO="1000000",
+                        JURIPOST_LIMITES_RPM="", JURIPOST_METRICAS_JSONL="", JURIPOST_AUDITORIA_JSONL="")
+        ambiente.pop("GOOGLE_API_KEY", None)
+        processo = subprocess.run([sys.executable, "-c", _SCRIPT], cwd=RAIZ, env=ambiente,
+                                  capture_output=True, text=True, timeout=120)
+        self.assertEqual(processo.returncode, 0, processo.stderr)
+        saida = json.loads(processo.stdout.strip().splitlines()[-1])
+        resultados = saida["resultados"]
+        self.assertNotIn("erro", resultados)
+        for etapa in ("lancamentos_buscados", "plano_de_post", "reels_conteudo_completo", "rascunho_de_post",
+                      "post_final", "legenda_post", "imagem_gerada_prompt"):
+            self.assertTrue(resultados.get(etapa), etapa)
+        self.assertEqual(saida["sdks"], [])
+
+if __name__ == "__main__":
+    unittest.main()
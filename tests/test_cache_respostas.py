@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from cache_respostas import CacheRespostas
+
+def test_memoria_descarta_a_menos_usada():
+    cache = CacheRespostas(diretorio=None, max_itens_memoria=2)
+    cache.guardar("a", "resposta a")
+    cache.guardar("b", "resposta b")
+    assert cache.obter("a") == "resposta a" # "a" passa a ser a mais recente
+    cache.guardar("c", "resposta c")
+    assert cache.obter("b") is None
+    assert cache.obter("a") == "resposta a"
+    assert cache.obter("c") == "resposta c"
+
+def test_disco_remove_as_mais_antigas_ate_noventa_por_cento(tmp_path):
+    diretorio = str(tmp_path)
+    texto = "x" * 300
+    cache = CacheRespostas(diretorio=diretorio, max_itens_memoria=1, max_bytes_disco=1000)
+    for indice, chave in enumerate(("a", "b", "c"), start=1):
+        cache.guardar(chave, texto)
+        # Último uso em ordem: "a" é o mais antigo
+        os.utime(os.path.join(diretorio, f"{chave}.txt"), (indice * 100, indice * 100))
+
+    # Ler do disco marca a resposta como usada agora: "b" passa a ser a mais antiga
+    assert CacheRespostas(diretorio=diretorio).obter("a") == texto
+
+    # 1200 bytes passam do limite de 1000: sai só "b", e o total volta a 900 (90% do limite)
+    cache.guardar("d", texto)
+    assert sorted(os.listdir(diretorio)) == ["a.txt", "c.txt", "d.txt"]
+    assert cache._bytes_disco == 900
+
+    # Uma instância nova (outro processo) ainda encontra no disco as que ficaram
+    outra = CacheRespostas(diretorio=diretorio)
+    assert outra.obter("b") is None
+    assert [outra.obter(chave) for chave in ("a", "c", "d")] == [texto] * 3
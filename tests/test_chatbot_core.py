@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import types
+
+import pytest
+
+import cache_respostas
+import chatbot_core as core
+from cache_respostas import CacheBusca
+from roteamento import RoteadorModelos, Rota
+
+def test_busca_refeita_quando_a_janela_muda(backend_simulado, monkeypatch):
+    relogio = types.SimpleNamespace(agora=1_000_000.0)
+    monkeypatch.setattr(cache_respostas, "time", types.SimpleNamespace(time=lambda: relogio.agora))
+    monkeypatch.setattr(core, "cache_busca", CacheBusca(janela_horas=1))
+
+    core.agente_buscador("Usucapião extrajudicial", "18/10/2026")
+    core.agente_buscador("Usucapião extrajudicial", "18/10/2026")
+    assert backend_simulado.chamadas == 1
+
+    # Mesma data de hoje (mesma chave no cache de respostas), mas uma nova janela da busca
+    relogio.agora += 3600
+    core.agente_buscador("Usucapião extrajudicial", "18/10/2026")
+    assert backend_simulado.chamadas == 2
+
+class _Erro503(Exception):
+    code = 503
+
+@pytest.mark.parametrize("erro, afasta", [(ValueError("bug nosso"), False), (_Erro503("UNAVAILABLE"), True)])
+def test_so_erros_do_modelo_afastam_o_modelo_da_rota(backend_simulado, monkeypatch, erro, afasta):
+    rotas = {"agente_planejador": Rota(["modelo-a", "modelo-b"]), "agente_legenda": Rota(["modelo-a", "modelo-b"])}
+    roteador = RoteadorModelos(rotas, peso=1.0)
+    monkeypatch.setattr(core, "roteador_modelos", roteador)
+    monkeypatch.setattr(core, "MAX_TENTATIVAS", 1)
+
+    executar = backend_simulado.executar
+    def falhar_no_modelo_a(agent, *argumentos):
+        if agent.model == "modelo-a":
+            raise erro
+        return executar(agent, *argumentos)
+    monkeypatch.setattr(backend_simulado, "executar", falhar_no_modelo_a)
+
+    agente = core._agente("agente_planejador", modelo="modelo-a")
+    if afasta:
+        assert core.call_agent(agente, "Tópico: X") # Respondida pelo modelo de reserva
+    else:
+        with pytest.raises(ValueError):
+            core.call_agent(agente, "Tópico: X")
+    assert roteador.ordenar("agente_planejador")[0] == ("modelo-b" if afasta else "modelo-a")
+    # O erro de um agente não afasta o modelo dos outros
+    assert roteador.ordenar("agente_legenda")[0] == "modelo-a"
+
+def test_conformidade_auditada_mesmo_com_formato_quebrado():
+    # Sem a nota do revisor (formato) e com uma chamada de captação (conformidade)
+    resposta = "Usucapião em cartório ficou mais simples. Ligue agora!\n\n#Usucapiao #Imoveis #Direito"
+    contexto = core.ContextoRequisicao(etapa="post_final")
+
+    motivo = core._motivo_recusa("post_final", resposta, contexto, ultima=False)
+    assert core.MARCADOR_REVISAO in motivo and "ligue agora" in motivo.lower()
+
+    core._motivo_recusa("post_final", resposta, contexto, ultima=True)
+    acoes = [registro.acao for registro in core.auditoria_conformidade.registros(contexto.request_id)]
+    assert acoes == ["refeita", "mantida com violações"]
+
+def test_variantes_com_ajustes_de_menos(backend_simulado):
+    resultados = core.gerar_variantes("Usucapião extrajudicial", 3, temperaturas=[0.7])
+    assert "temperaturas" in resultados["erro"]
+    assert backend_simulado.chamadas == 0
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from conformidade import HASHTAGS_RASCUNHO, normalizar, procurar_expressoes_proibidas, verificar_legenda, verificar_rascunho
+from saidas import DISCLAIMER_LEGENDA, HASHTAGS_LEGENDA
+
+HASHTAGS = ["#Usucapiao", "#Imoveis", "#Direito", "#Cartorio", "#Advocacia", "#Propriedade", "#Registro", "#Posse", "#Lei"]
+CORPO = "A usucapião extrajudicial permite regularizar o imóvel direto no cartório, sem processo judicial."
+
+def _hashtags(quantidade: int) -> str:
+    return " ".join(HASHTAGS[:quantidade])
+
+def _regras(violacoes: list) -> list:
+    return [violacao.regra for violacao in violacoes]
+
+# --- Expressões proibidas ---
+def test_normalizar_tira_acentos_maiusculas_e_markdown():
+    assert normalizar("**Agende** uma   CONSULTA _já_") == "agende uma consulta ja"
+
+@pytest.mark.parametrize("texto", [
+    "Agende uma CONSULTA hoje mesmo.",
+    "**Agende** uma _consulta_ conosco.",
+    "Dúvidas? Ágende   uma\nconsulta!",
+    "Ligue já para o escritório.",
+])
+def test_expressao_proibida_com_acentos_maiusculas_e_markdown(texto):
+    assert _regras(procurar_expressoes_proibidas(texto)) == ["chamada direta para ação"]
+
+def test_expressao_proibida_so_como_palavra_inteira():
+    # "contratempo" contém "contrat", mas não a expressão "contrate"
+    assert procurar_expressoes_proibidas("Um contratempo no registro não impede a usucapião.") == []
+
+def test_cada_expressao_aparece_uma_vez():
+    violacoes = procurar_expressoes_proibidas("Entre em contato. Consulta grátis! Entre em contato de novo.")
+    assert _regras(violacoes) == ["chamada direta para ação", "oferta de serviço ou vantagem"]
+
+# --- Rascunho ---
+def test_rascunho_conforme():
+    assert verificar_rascunho(f"{CORPO}\n\n{_hashtags(3)}") == []
+
+@pytest.mark.parametrize("quantidade, conforme", [
+    (HASHTAGS_RASCUNHO[0] - 1, False), (HASHTAGS_RASCUNHO[0], True), (HASHTAGS_RASCUNHO[1], True), (HASHTAGS_RASCUNHO[1] + 1, False),
+])
+def test_limites_de_hashtags_do_rascunho(quantidade, conforme):
+    violacoes = verificar_rascunho(f"{CORPO}\n\n{_hashtags(quantidade)}")
+    assert _regras(violacoes) == ([] if conforme else ["número de hashtags"])
+
+def test_rascunho_conforme_dispensa_o_revisor(backend_simulado):
+    import chatbot_core as core
+
+    rascunho = f"**Título Sugerido:** Usucapião em cartório\n\n{CORPO}\n\n{_hashtags(3)}"
+    contexto = core.ContextoRequisicao(etapa="post_final")
+    post = core.agente_revisor("Usucapião extrajudicial", rascunho, contexto)
+    assert backend_simulado.chamadas == 0
+    assert post.startswith(rascunho) and core.MARCADOR_REVISAO in post
+    assert [registro.acao for registro in core.auditoria_conformidade.registros(contexto.request_id)] == ["revisor dispensado"]
+
+def test_rascunho_com_violacao_vai_ao_revisor(backend_simulado):
+    import chatbot_core as core
+
+    rascunho = f"{CORPO} Agende uma consulta!\n\n{_hashtags(3)}"
+    contexto = core.ContextoRequisicao(etapa="post_final")
+    core.agente_revisor("Usucapião extrajudicial", rascunho, contexto)
+    assert backend_simulado.chamadas == 1
+    assert [registro.acao for registro in core.auditoria_conformidade.registros(contexto.request_id)] == ["enviado ao revisor"]
+
+# --- Legenda ---
+@pytest.mark.parametrize("quantidade, conforme", [
+    (HASHTAGS_LEGENDA[0] - 1, False), (HASHTAGS_LEGENDA[0], True), (HASHTAGS_LEGENDA[1], True), (HASHTAGS_LEGENDA[1] + 1, False),
+])
+def test_limites_de_hashtags_da_legenda(quantidade, conforme):
+    violacoes = verificar_legenda(f"{CORPO}\n\n{_hashtags(quantidade)}\n{DISCLAIMER_LEGENDA}")
+    assert _regras(violacoes) == ([] if conforme else ["número de hashtags"])
+
+def test_legenda_sem_disclaimer():
+    assert _regras(verificar_legenda(f"{CORPO}\n\n{_hashtags(5)}")) == ["disclaimer obrigatório"]
+
+def test_disclaimer_reconhecido_com_markdown_e_sem_acentos():
+    disclaimer = "*Este post tem carater informativo e nao substitui uma consulta juridica especializada.*"
+    assert verificar_legenda(f"{CORPO}\n\n{_hashtags(5)}\n{disclaimer}") == []
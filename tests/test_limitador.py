@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import types
+
+import pytest
+
+import limitador
+from limitador import BaldeDeTokens, LimitadorModelos, executar_com_retentativas
+
+class ErroHTTP(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Relógio falso: `sleep` só avança o tempo e guarda cada espera."""
+    relogio = types.SimpleNamespace(agora=0.0, esperas=[])
+
+    def dormir(segundos):
+        relogio.esperas.append(segundos)
+        relogio.agora += segundos
+
+    monkeypatch.setattr(limitador, "time", types.SimpleNamespace(monotonic=lambda: relogio.agora, sleep=dormir))
+    # Sem sorteio: a espera é sempre o máximo do intervalo
+    monkeypatch.setattr(limitador.random, "uniform", lambda minimo, maximo: maximo)
+    return relogio
+
+def _falhando(*erros):
+    """Função que lança os erros na ordem e depois responde "ok", contando as chamadas."""
+    pendentes = list(erros)
+
+    def funcao():
+        funcao.chamadas += 1
+        if pendentes:
+            raise pendentes.pop(0)
+        return "ok"
+    funcao.chamadas = 0
+    return funcao
+
+# --- Retentativas ---
+@pytest.mark.parametrize("codigo", [408, 429, 500, 502, 503, 504])
+def test_erros_temporarios_sao_repetidos(relogio, codigo):
+    funcao = _falhando(ErroHTTP(codigo), ErroHTTP(codigo))
+    assert executar_com_retentativas(funcao, max_tentativas=4) == "ok"
+    assert funcao.chamadas == 3
+    assert relogio.esperas == [1.0, 2.0]
+
+@pytest.mark.parametrize("erro", [ErroHTTP(400), ErroHTTP(401), ErroHTTP(403), ValueError("bug")])
+def test_erros_definitivos_sobem_na_hora(relogio, erro):
+    funcao = _falhando(erro)
+    with pytest.raises(type(erro)):
+        executar_com_retentativas(funcao)
+    assert funcao.chamadas == 1
+    assert relogio.esperas == []
+
+def test_erros_de_rede_e_mensagens_da_api_sao_repetidos(relogio):
+    funcao = _falhando(ConnectionError(), TimeoutError(), Exception("503 UNAVAILABLE"), Exception("RESOURCE_EXHAUSTED"))
+    assert executar_com_retentativas(funcao, max_tentativas=5) == "ok"
+    assert funcao.chamadas == 5
+
+def test_espera_exponencial_limitada_e_ultima_falha_relancada(relogio):
+    funcao = _falhando(*[ErroHTTP(503)] * 6)
+    falhas = []
+    with pytest.raises(ErroHTTP):
+        executar_com_retentativas(funcao, max_tentativas=6, espera_base=1.0, espera_maxima=5.0,
+                                  ao_falhar=lambda tentativa, erro: falhas.append(tentativa))
+    assert funcao.chamadas == 6
+    assert falhas == [1, 2, 3, 4, 5, 6]
+    assert relogio.esperas == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+# --- Balde de tokens ---
+def test_balde_libera_a_rajada_e_depois_espera_a_taxa(relogio):
+    balde = BaldeDeTokens(por_minuto=60, capacidade=2)
+    balde.adquirir()
+    balde.adquirir()
+    assert relogio.esperas == []
+    balde.adquirir()
+    assert relogio.esperas == [pytest.approx(1.0)]
+
+def test_cota_corta_a_taxa_pela_metade_ate_dez_por_cento(relogio):
+    balde = BaldeDeTokens(por_minuto=60)
+    taxas = []
+    for _ in range(5):
+        balde.reduzir()
+        taxas.append(balde.taxa)
+    assert taxas == pytest.approx([0.5, 0.25, 0.125, 0.1, 0.1])
+
+def test_taxa_volta_aos_poucos_a_cada_sucesso(relogio):
+    balde = BaldeDeTokens(por_minuto=60)
+    balde.reduzir()
+    balde.recuperar()
+    assert balde.taxa == pytest.approx(0.55)
+    for _ in range(20):
+        balde.recuperar()
+    assert balde.taxa == pytest.approx(1.0)
+
+def test_limitador_so_reduz_a_taxa_em_erro_de_cota(relogio):
+    limitador_modelos = LimitadorModelos(limites_por_minuto={"modelo-a": 60}, limite_padrao=30)
+    limitador_modelos.registrar_erro("modelo-a", ErroHTTP(503))
+    assert limitador_modelos.balde("modelo-a").taxa == pytest.approx(1.0)
+    limitador_modelos.registrar_erro("modelo-a", ErroHTTP(429))
+    assert limitador_modelos.balde("modelo-a").taxa == pytest.approx(0.5)
+    # Os outros modelos não são afetados e usam o limite padrão
+    assert limitador_modelos.balde("modelo-b").taxa == pytest.approx(0.5)
+    limitador_modelos.registrar_erro("modelo-b", Exception("429 RESOURCE_EXHAUSTED"))
+    assert limitador_modelos.balde("modelo-b").taxa == pytest.approx(0.25)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from saidas import (DISCLAIMER_LEGENDA, MARCADOR_REVISAO, ErroFormato, interpretar_legenda, interpretar_post_final,
+                    interpretar_reels)
+
+CORPO_LEGENDA = "Bisnetos de portugueses podem chegar à cidadania em cascata. ⚖️"
+HASHTAGS = ["#Nacionalidade", "#Portugal", "#Cidadania", "#Bisnetos", "#Direito", "#Advocacia", "#Europa", "#Familia"]
+
+def _legenda(quantidade_hashtags: int, ultima_linha: str = DISCLAIMER_LEGENDA, corpo: str = CORPO_LEGENDA) -> str:
+    return f"{corpo}\n\n{' '.join(HASHTAGS[:quantidade_hashtags])}\n{ultima_linha}"
+
+def _reels(quantidade_slides: int, quantidade_hashtags: int = 6, legenda: str = "Entenda a cidadania em cascata.") -> str:
+    tabela = "\n".join(f"| {numero} | {numero * 5 - 5}–{numero * 5}s | Texto {numero} | Fundo {numero} | Fade |"
+                       for numero in range(1, quantidade_slides + 1))
+    return (f"**Roteiro de Reels:** Cidadania para bisnetos\n\n| Slide | Tempo | Texto | Fundo | Animação |\n|---|---|---|---|---|\n"
+            f"{tabela}\n\n**Legenda:**\n{legenda}\n\n**Hashtags:**\n{' '.join(HASHTAGS[:quantidade_hashtags])}\n\n"
+            "**Paleta de cores:** vinho e dourado\n**Música:** piano suave")
+
+# --- Post final ---
+def test_post_final_separa_texto_e_nota():
+    post = interpretar_post_final(f"**Título Sugerido:** Cidadania\nCorpo do post.\n\n{MARCADOR_REVISAO} (sem ajustes)")
+    assert post.texto == "**Título Sugerido:** Cidadania\nCorpo do post."
+    assert post.nota_revisao == f"{MARCADOR_REVISAO} (sem ajustes)"
+    assert post.texto_para_copiar == "Cidadania\nCorpo do post."
+
+@pytest.mark.parametrize("texto, motivo", [
+    ("Corpo do post sem a nota.", "nota final"),
+    (f"  \n{MARCADOR_REVISAO}", "apenas a nota"),
+])
+def test_post_final_fora_do_formato(texto, motivo):
+    with pytest.raises(ErroFormato, match=motivo):
+        interpretar_post_final(texto)
+
+# --- Legenda ---
+@pytest.mark.parametrize("quantidade", [5, 6])
+def test_legenda_no_formato(quantidade):
+    legenda = interpretar_legenda(_legenda(quantidade, ultima_linha=f"**{DISCLAIMER_LEGENDA}**"))
+    assert legenda.corpo == CORPO_LEGENDA
+    assert legenda.hashtags == HASHTAGS[:quantidade]
+    assert legenda.disclaimer == DISCLAIMER_LEGENDA
+
+@pytest.mark.parametrize("texto, motivo", [
+    (_legenda(5, ultima_linha="Siga o perfil!"), "disclaimer"),
+    (f"{DISCLAIMER_LEGENDA}\n{_legenda(5)}\nSiga o perfil!", "disclaimer"),
+    (_legenda(4), "4 hashtags"),
+    (_legenda(7), "7 hashtags"),
+    (_legenda(5, corpo=""), "corpo"),
+])
+def test_legenda_fora_do_formato(texto, motivo):
+    with pytest.raises(ErroFormato, match=motivo):
+        interpretar_legenda(texto)
+
+# --- Reels ---
+@pytest.mark.parametrize("quantidade", [6, 8])
+def test_reels_no_formato(quantidade):
+    reels = interpretar_reels(_reels(quantidade))
+    assert reels.titulo == "Cidadania para bisnetos"
+    assert [slide.numero for slide in reels.slides] == list(range(1, quantidade + 1))
+    assert reels.slides[0].duracao == "0–5s" and reels.slides[0].animacao == "Fade"
+    assert reels.legenda == "Entenda a cidadania em cascata."
+    assert reels.hashtags == HASHTAGS[:6]
+
+@pytest.mark.parametrize("texto, motivo", [
+    (_reels(5), "5 slides"),
+    (_reels(9), "9 slides"),
+    (_reels(6).replace("| Texto 3 |", "|  |"), "slide 3"),
+    (_reels(6, legenda=""), "legenda"),
+    (_reels(6, quantidade_hashtags=4), "4 hashtags"),
+])
+def test_reels_fora_do_formato(texto, motivo):
+    with pytest.raises(ErroFormato, match=motivo):
+        interpretar_reels(texto)